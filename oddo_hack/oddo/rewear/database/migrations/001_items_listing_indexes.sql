@@ -0,0 +1,4 @@
+-- Keyset pagination indexes for the catalog and user item lists
+ALTER TABLE items
+    ADD INDEX idx_status_created (status, created_at, id),
+    ADD INDEX idx_owner_created (owner_id, created_at, id);
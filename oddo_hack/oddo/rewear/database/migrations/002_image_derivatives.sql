@@ -0,0 +1,6 @@
+-- Resized copies of item and profile images
+ALTER TABLE users
+    ADD COLUMN profile_image_derivatives JSON AFTER profile_image;
+
+ALTER TABLE item_images
+    ADD COLUMN derivatives JSON AFTER is_primary;
@@ -0,0 +1,4 @@
+-- Perceptual hashes for duplicate detection
+ALTER TABLE item_images
+    ADD COLUMN phash CHAR(16) AFTER derivatives,
+    ADD INDEX idx_phash (phash);
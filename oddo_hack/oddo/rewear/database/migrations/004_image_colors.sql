@@ -0,0 +1,9 @@
+-- Dominant colours of item and catalog images
+ALTER TABLE item_images
+    ADD COLUMN colors JSON AFTER phash,
+    ADD COLUMN color_histogram JSON AFTER colors;
+
+ALTER TABLE catalog_image_hashes
+    ADD COLUMN dominant_color VARCHAR(20) AFTER mtime_ns,
+    ADD COLUMN colors JSON AFTER dominant_color,
+    ADD INDEX idx_dominant_color (dominant_color);
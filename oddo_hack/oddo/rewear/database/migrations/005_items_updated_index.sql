@@ -0,0 +1,3 @@
+-- Lets the in-memory indexes find items changed by other processes
+ALTER TABLE items
+    ADD INDEX idx_updated_at (updated_at);
@@ -6,6 +6,7 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash VARCHAR(255) NOT NULL,
     gender VARCHAR(20),
     profile_image VARCHAR(255),
+    profile_image_derivatives JSON,
     city VARCHAR(100),
     address VARCHAR(255),
     bio TEXT,
@@ -39,19 +40,99 @@ CREATE TABLE IF NOT EXISTS items (
     INDEX idx_status (status),
     INDEX idx_owner (owner_id),
     INDEX idx_featured (is_featured),
+    INDEX idx_status_created (status, created_at, id),
+    INDEX idx_owner_created (owner_id, created_at, id),
+    INDEX idx_updated_at (updated_at),
     FULLTEXT INDEX idx_search (title, description, tags)
 );
 
+-- Tags dictionary
+CREATE TABLE IF NOT EXISTS tags (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50) NOT NULL UNIQUE
+);
+
+-- Item to tag association
+CREATE TABLE IF NOT EXISTS item_tags (
+    item_id CHAR(36) NOT NULL,
+    tag_id INT NOT NULL,
+    PRIMARY KEY (item_id, tag_id),
+    FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+    FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE,
+    INDEX idx_item_tags_tag (tag_id, item_id)
+);
+
+-- Searchable colours of each item's primary image
+CREATE TABLE IF NOT EXISTS item_colors (
+    item_id CHAR(36) NOT NULL,
+    color VARCHAR(20) NOT NULL,
+    weight SMALLINT NOT NULL,
+    PRIMARY KEY (item_id, color),
+    FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+    INDEX idx_item_colors_color (color, item_id)
+);
+
+-- Materialized facet counts for approved items
+CREATE TABLE IF NOT EXISTS item_facet_counts (
+    facet VARCHAR(20) NOT NULL,
+    value VARCHAR(50) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (facet, value)
+);
+
+-- Content-addressed uploads with reference counts
+CREATE TABLE IF NOT EXISTS stored_files (
+    path VARCHAR(255) PRIMARY KEY,
+    digest CHAR(64) NOT NULL,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_digest (digest)
+);
+
+-- Resumable chunked uploads
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id CHAR(36) PRIMARY KEY,
+    user_id CHAR(36) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    total_size BIGINT NOT NULL,
+    received BIGINT NOT NULL DEFAULT 0,
+    status VARCHAR(20) DEFAULT 'open',
+    file_path VARCHAR(255),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_user_id (user_id)
+);
+
 -- Item images table
 CREATE TABLE IF NOT EXISTS item_images (
     id CHAR(36) PRIMARY KEY,
     item_id CHAR(36) NOT NULL,
     file_path VARCHAR(255) NOT NULL,
     is_primary BOOLEAN DEFAULT FALSE,
+    derivatives JSON,
+    phash CHAR(16),
+    colors JSON,
+    color_histogram JSON,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
     INDEX idx_item_id (item_id),
-    INDEX idx_is_primary (is_primary)
+    INDEX idx_is_primary (is_primary),
+    INDEX idx_phash (phash)
+);
+
+-- Perceptual hashes of scanned catalog images
+CREATE TABLE IF NOT EXISTS catalog_image_hashes (
+    path VARCHAR(512) PRIMARY KEY,
+    phash CHAR(16) NOT NULL,
+    file_size BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    dominant_color VARCHAR(20),
+    colors JSON,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_phash (phash),
+    INDEX idx_dominant_color (dominant_color)
 );
 
 -- Swaps table
@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+import zipfile
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from config.database import db
 from models.user import User
-from models.item import Item
+from models.item import Item, ItemImage
+from utils.serializers import serialize_items
+from utils.search import apply_item_search, SEARCH_MODES
 from auth.jwt_handler import admin_required
+from utils.events import notify_items_changed
+from utils.cache import catalog_cache
+from utils.derivatives import derivative_pipeline
+from utils.resize_cache import resize_cache
+from utils.image_hash import duplicate_index, find_duplicates, MAX_RADIUS
+from utils.scan_index import scan_index
+from utils.bulk_import import import_items, detect_format, IMPORT_FORMATS, IMPORT_STATUSES
+from utils.export import export_rows, EXPORT_TABLES, EXPORT_FORMATS, EXPORT_MIMETYPES
 import logging
 
 logger = logging.getLogger(__name__)
@@ -123,30 +134,36 @@ def get_items():
         limit = request.args.get('limit', 10, type=int)
         status = request.args.get('status')
         search = request.args.get('search')
+        search_mode = request.args.get('search_mode')
+        
+        if search_mode and search_mode not in SEARCH_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_mode. Must be one of: {', '.join(SEARCH_MODES)}"
+            }), 400
         
         # Base query
         query = Item.query
+        relevance = None
         
         # Apply filters if provided
         if status and status != 'all':
             query = query.filter_by(status=status)
         
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Item.title.like(search_term)) | 
-                (Item.description.like(search_term)) |
-                (Item.tags.like(search_term))
-            )
+        if search and search.strip():
+            query, relevance = apply_item_search(query, search.strip(), search_mode)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Item.created_at.desc())
+        # Order by relevance for full-text searches, then creation date (newest first)
+        if relevance is not None:
+            query = query.order_by(relevance.desc(), Item.created_at.desc())
+        else:
+            query = query.order_by(Item.created_at.desc())
         
         # Paginate results
         items_paginated = query.paginate(page=page, per_page=limit, error_out=False)
         
         # Create response data
-        items_data = [item.to_dict(include_owner=True) for item in items_paginated.items]
+        items_data = serialize_items(items_paginated.items, include_owner=True)
         
         return jsonify({
             'status': 'success',
@@ -195,6 +212,7 @@ def update_item_status(item_id):
         # Update status
         item.status = status
         db.session.commit()
+        notify_items_changed(current_app._get_current_object(), item)
         
         logger.info(f"Item {item.title} status updated to {status}")
         
@@ -239,6 +257,7 @@ def toggle_item_featured(item_id):
         # Toggle featured status
         item.is_featured = not item.is_featured
         db.session.commit()
+        notify_items_changed(current_app._get_current_object(), item)
         
         logger.info(f"Item {item.title} featured status changed to {item.is_featured}")
         
@@ -257,4 +276,204 @@ def toggle_item_featured(item_id):
         return jsonify({
             'status': 'error',
             'message': 'An error occurred while updating item featured status'
+        }), 500
+
+@admin_bp.route('/items/import', methods=['POST'])
+@jwt_required()
+@admin_required
+def import_items_endpoint():
+    """
+    Bulk import items from a CSV or NDJSON file and a zip archive of images.
+    Uploads are limited by MAX_CONTENT_LENGTH; use 'flask import-items'
+    for larger catalogs.
+    """
+    try:
+        items_file = request.files.get('items')
+        if not items_file or not items_file.filename:
+            return jsonify({
+                'status': 'error',
+                'message': 'An items file is required'
+            }), 400
+        
+        fmt = request.form.get('format') or detect_format(items_file.filename)
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid format. Must be one of: {', '.join(IMPORT_FORMATS)}"
+            }), 400
+        
+        default_status = request.form.get('status', 'approved')
+        if default_status not in IMPORT_STATUSES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid status. Must be one of: {', '.join(IMPORT_STATUSES)}"
+            }), 400
+        
+        batch_size = request.form.get('batch_size', 500, type=int)
+        images_file = request.files.get('images')
+        
+        def log_progress(report):
+            logger.info(f"Bulk import progress: {report.imported} imported, {report.failed} failed")
+        
+        report = import_items(
+            current_app._get_current_object(),
+            items_file.stream,
+            fmt,
+            owner_id=get_jwt_identity(),
+            images_archive=images_file.stream if images_file and images_file.filename else None,
+            batch_size=batch_size,
+            default_status=default_status,
+            progress=log_progress
+        )
+        
+        message = f"Imported {report['imported']} items"
+        if report['error']:
+            message += f"; stopped early: {report['error']}"
+        
+        return jsonify({
+            'status': 'success',
+            'message': message,
+            'data': report
+        }), 200
+    
+    except zipfile.BadZipFile:
+        return jsonify({
+            'status': 'error',
+            'message': 'Images must be a zip archive'
+        }), 400
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Import items error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while importing items'
+        }), 500
+
+@admin_bp.route('/export/<table>', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_table(table):
+    """Stream items, users or swaps as NDJSON or CSV"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        status = request.args.get('status')
+        
+        if table not in EXPORT_TABLES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid table. Must be one of: {', '.join(EXPORT_TABLES)}"
+            }), 404
+        
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
+        
+        logger.info(f"Export of {table} as {fmt} started")
+        
+        # No Content-Length, so the body is sent with chunked transfer encoding
+        return Response(
+            stream_with_context(export_rows(table, fmt, status=status)),
+            mimetype=EXPORT_MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'}
+        )
+    
+    except Exception as e:
+        logger.error(f"Export table error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while exporting data'
+        }), 500
+
+@admin_bp.route('/duplicates', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_duplicates():
+    """
+    Find near-duplicate images by perceptual hash. With image_id or item_id
+    those images are checked, otherwise the images of a page of items
+    with the given status (pending by default).
+    """
+    try:
+        image_id = request.args.get('image_id')
+        item_id = request.args.get('item_id')
+        status = request.args.get('status', 'pending')
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', 10, type=int)
+        radius = request.args.get('radius', current_app.config.get('DUPLICATE_RADIUS', 6), type=int)
+        
+        if not 0 <= radius <= MAX_RADIUS:
+            return jsonify({
+                'status': 'error',
+                'message': f"radius must be between 0 and {MAX_RADIUS}"
+            }), 400
+        
+        pagination = None
+        if image_id or item_id:
+            query = ItemImage.query.filter_by(id=image_id) if image_id else ItemImage.query.filter_by(item_id=item_id)
+            images = query.all()
+            if not images:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Image not found'
+                }), 404
+        else:
+            items_paginated = Item.query.filter_by(status=status).order_by(
+                Item.created_at.desc()
+            ).paginate(page=page, per_page=limit, error_out=False)
+            item_ids = [item.id for item in items_paginated.items]
+            images = ItemImage.query.filter(ItemImage.item_id.in_(item_ids)).all() if item_ids else []
+            pagination = {
+                'page': page,
+                'limit': limit,
+                'total': items_paginated.total,
+                'pages': items_paginated.pages
+            }
+        
+        duplicates = find_duplicates(
+            images, radius=radius,
+            use_index=current_app.config.get('DUPLICATE_INDEX_ENABLED', False)
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'duplicates': duplicates,
+                'radius': radius,
+                'unhashed': sum(1 for image in images if image.phash is None),
+                'pagination': pagination
+            }
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Get duplicates error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while finding duplicates'
+        }), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    """Get in-process cache and index metrics"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'catalog_cache': catalog_cache.stats(),
+                'image_pipeline': derivative_pipeline.stats(),
+                'image_resize': resize_cache.stats(),
+                'duplicate_index': duplicate_index.stats(),
+                'scan_index': scan_index.stats()
+            }
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Get metrics error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while fetching metrics'
         }), 500
\ No newline at end of file
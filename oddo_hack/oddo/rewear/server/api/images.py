@@ -1,8 +1,14 @@
 # File: rewear/server/api/images.py
 
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, send_file
 import os
-from utils.image_processor import ImageProcessor
+from PIL import UnidentifiedImageError
+from utils.scan_index import scan_index
+from utils.filename_metadata import get_metadata_extractor
+from utils.colors import nearest_color, catalog_filenames_by_color, COLOR_NAMES
+from utils.pagination import encode_offset_cursor, decode_offset_cursor, InvalidCursorError
+from utils.resize_cache import resize_cache, bucket_size, RESIZE_FORMATS, RESIZE_SIZES
+from utils.static_files import resolve_upload, is_immutable, set_cache_headers
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,15 +19,8 @@ images_bp = Blueprint('images', __name__)
 def get_categories():
     """Get all image categories"""
     try:
-        # Initialize the image processor with the uploads directory
-        images_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'Bewakoof')
-        processor = ImageProcessor(images_dir)
-        
-        # Scan the directory
-        processor.scan_directory()
-        
-        # Get categories
-        categories = processor.get_categories()
+        # Served from the scan index, which rescans only changed directories
+        categories = scan_index.get_categories()
         
         return jsonify({
             'status': 'success',
@@ -39,26 +38,115 @@ def get_categories():
 
 @images_bp.route('/category/<path:category_path>', methods=['GET'])
 def get_images_by_category(category_path):
-    """Get images for a specific category"""
+    """Get images for a specific category, a page at a time if offset, limit or cursor is given"""
     try:
-        # Initialize the image processor with the uploads directory
-        images_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'Bewakoof')
-        processor = ImageProcessor(images_dir)
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args['limit']) if 'limit' in request.args else None
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'offset and limit must be integers'
+            }), 400
+        
+        cursor = request.args.get('cursor')
+        max_limit = current_app.config.get('IMAGE_PAGE_MAX_LIMIT', 500)
+        
+        # Filters on the metadata extracted from filenames, e.g. ?color=black&fit=slim
+        filters = {
+            field: request.args[field].strip().lower()
+            for field in get_metadata_extractor().fields
+            if request.args.get(field, '').strip()
+        }
+        
+        # Colour measured from the pixels by "flask analyze-colors", a
+        # palette name or hex code
+        dominant_color = request.args.get('dominant_color', '').strip()
+        if dominant_color:
+            dominant_color = nearest_color(dominant_color)
+            if dominant_color is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Invalid dominant_color. Must be a hex code or one of: {', '.join(COLOR_NAMES)}"
+                }), 400
+        
+        after = None
+        if cursor:
+            offset, after, params = decode_offset_cursor(cursor)
+            cursor_filters = params.get('filters', {})
+            cursor_color = params.get('dominant_color')
+            if (not isinstance(params.get('limit'), int)
+                    or not isinstance(cursor_filters, dict)
+                    or not all(isinstance(value, str) for value in cursor_filters.values())
+                    or cursor_color not in (None,) + COLOR_NAMES):
+                raise InvalidCursorError('Invalid cursor')
+            
+            # A cursor continues the listing it was issued for; a limit or
+            # filters sent with it must be the same
+            if ((limit is not None and limit != params['limit'])
+                    or ((filters or dominant_color) and (filters, dominant_color or None) != (cursor_filters, cursor_color))):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'The cursor belongs to a listing with a different limit or filters'
+                }), 400
+            limit = params['limit']
+            filters = cursor_filters
+            dominant_color = cursor_color
+        
+        if offset < 0 or (limit is not None and not 1 <= limit <= max_limit):
+            return jsonify({
+                'status': 'error',
+                'message': f"offset must be 0 or more and limit between 1 and {max_limit}"
+            }), 400
+        
+        # Without paging parameters the whole category is returned, as before
+        paged = limit is not None or bool(cursor) or 'offset' in request.args
+        if paged and limit is None:
+            limit = current_app.config.get('IMAGE_PAGE_DEFAULT_LIMIT', 100)
         
-        # Scan the directory
-        processor.scan_directory()
+        # Served from the scan index, which rescans only changed directories
+        processor = scan_index.get_processor()
+        filenames = catalog_filenames_by_color(category_path, dominant_color) if dominant_color else None
+        images, total, offset = processor.find_images(
+            category_path, filters, offset, limit if paged else None, after, filenames
+        )
+        category = processor.get_category(category_path)
         
-        # Get images for the specified category
-        images = processor.get_images_by_category(category_path)
+        data = {
+            'category': category_path,
+            'images': images,
+            'image_count': category['image_count'] if category else 0,
+            'total_images': category['total_images'] if category else 0
+        }
+        if paged:
+            next_offset = offset + len(images)
+            has_more = next_offset < total
+            next_cursor = None
+            if has_more:
+                next_cursor = encode_offset_cursor(next_offset, images[-1]['filename'], {
+                    'limit': limit,
+                    'filters': filters,
+                    'dominant_color': dominant_color or None
+                })
+            data['pagination'] = {
+                'offset': offset,
+                'limit': limit,
+                'total': total,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'category': category_path,
-                'images': images
-            }
+            'data': data
         }), 200
     
+    except InvalidCursorError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid cursor'
+        }), 400
+    
     except Exception as e:
         logger.error(f"Error getting images for category {category_path}: {str(e)}")
         return jsonify({
@@ -68,24 +156,23 @@ def get_images_by_category(category_path):
 
 @images_bp.route('/scan', methods=['POST'])
 def scan_images():
-    """Scan the image directory and export the structure to a JSON file"""
+    """Scan the image directory and export the structure to an index file"""
     try:
-        # Initialize the image processor with the uploads directory
-        images_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'Bewakoof')
-        processor = ImageProcessor(images_dir)
+        # Revalidate the whole scan index now instead of waiting for the interval
+        processor = scan_index.refresh()
+        data = processor.image_data
         
-        # Scan the directory
-        data = processor.scan_directory()
-        
-        # Export to JSON file
-        json_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'image_data.json')
-        processor.export_to_json(json_path)
+        # Export to a compact index that other processes can open lazily
+        index_path = current_app.config.get('IMAGE_INDEX_FILE') or os.path.join(
+            current_app.config['UPLOAD_FOLDER'], 'image_index.sqlite'
+        )
+        processor.export_index(index_path)
         
         return jsonify({
             'status': 'success',
             'message': 'Image directories scanned successfully',
             'data': {
-                'json_path': json_path,
+                'index_path': index_path,
                 'categories': len(processor.get_categories()),
                 'total_images': processor._count_images(data)
             }
@@ -96,4 +183,75 @@ def scan_images():
         return jsonify({
             'status': 'error',
             'message': 'Failed to scan image directories'
+        }), 500
+
+@images_bp.route('/resize', methods=['GET'])
+def get_resized_image():
+    """
+    Get a copy of an uploaded image that fits in w x h pixels, with w and
+    h rounded up to the next of RESIZE_SIZES. Variants are created on
+    first request and kept in a disk cache.
+    """
+    try:
+        path = request.args.get('path', '')
+        width = request.args.get('w', type=int)
+        height = request.args.get('h', type=int)
+        fmt = request.args.get('fmt', 'webp').lower()
+        if fmt == 'jpg':
+            fmt = 'jpeg'
+        
+        if fmt not in RESIZE_FORMATS:
+            return jsonify({
+                'status': 'error',
+                'message': f"fmt must be one of: {', '.join(RESIZE_FORMATS)}"
+            }), 400
+        
+        dimensions = [value for value in (width, height) if value is not None]
+        if not dimensions or any(value <= 0 for value in dimensions):
+            return jsonify({
+                'status': 'error',
+                'message': 'w or h is required and must be positive'
+            }), 400
+        
+        # Only configured sizes are rendered, so arbitrary w/h values
+        # cannot fill the cache with one variant per pixel
+        sizes = current_app.config.get('RESIZE_SIZES', RESIZE_SIZES)
+        width = bucket_size(width, sizes)
+        height = bucket_size(height, sizes)
+        
+        # Accept the /uploads/... paths returned by the API
+        relative = path.split('/uploads/', 1)[-1].lstrip('/')
+        source = resolve_upload(current_app.config['UPLOAD_FOLDER'], relative)
+        if source is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Image not found'
+            }), 404
+        
+        max_age = current_app.config.get('UPLOADS_MAX_AGE', 3600)
+        for attempt in range(2):
+            cached = resize_cache.get(source, width, height, fmt)
+            try:
+                response = send_file(
+                    cached, mimetype=RESIZE_FORMATS[fmt][2], conditional=True, max_age=max_age
+                )
+                break
+            except FileNotFoundError:
+                # Evicted between the lookup and the send
+                if attempt:
+                    raise
+        
+        return set_cache_headers(response, is_immutable(relative), max_age)
+    
+    except UnidentifiedImageError:
+        return jsonify({
+            'status': 'error',
+            'message': 'File is not an image'
+        }), 415
+    
+    except Exception as e:
+        logger.error(f"Error resizing image {request.args.get('path')}: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Failed to resize image'
         }), 500
\ No newline at end of file
@@ -1,11 +1,24 @@
-import os
-import uuid
+import math
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 from config.database import db
 from models.user import User
-from models.item import Item, ItemImage
+from models.item import Item, ItemImage, ITEM_CATEGORIES
+from utils.serializers import serialize_items, parse_fields, item_load_options, InvalidFieldsError
+from utils.pagination import keyset_paginate, InvalidCursorError
+from utils.search import apply_item_search, SEARCH_MODES
+from utils.search_index import search_index, revalidate_search_index
+from utils.similarity import similarity_index, revalidate_similarity_index
+from utils.events import notify_items_changed
+from utils.cache import catalog_cache
+from utils.tags import set_item_tags, filter_by_tags
+from utils.colors import nearest_color, filter_by_color, COLOR_NAMES
+from utils.facets import compute_facets, materialized_facets, FACET_MODES
+from utils.http_cache import compute_etag, listing_etag, not_modified, add_etag
+from utils.derivatives import derivative_pipeline, process_item_images
+from utils.storage import store_uploads, add_references, discard_uploads
+from utils.upload_sessions import claim_uploads, UploadSessionError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,43 +34,68 @@ def get_items():
         limit = request.args.get('limit', 10, type=int)
         category = request.args.get('category')
         search = request.args.get('search')
+        search_mode = request.args.get('search_mode')
+        cursor = request.args.get('cursor')
+        tags = [tag for tag in request.args.getlist('tag') if tag.strip()]
+        color = request.args.get('color')
+        fields = parse_fields(request.args.get('fields'))
         
-        # Base query - only approved items
-        query = Item.query.filter_by(status='approved')
-        
-        # Apply filters if provided
-        if category:
-            query = query.filter_by(category=category)
+        if search_mode and search_mode not in SEARCH_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_mode. Must be one of: {', '.join(SEARCH_MODES)}"
+            }), 400
         
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Item.title.like(search_term)) | 
-                (Item.description.like(search_term)) |
-                (Item.tags.like(search_term))
+        # Colour names or hex codes, snapped to the nearest palette colour
+        if color:
+            color = nearest_color(color)
+            if color is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Invalid color. Must be a hex code or one of: {', '.join(COLOR_NAMES)}"
+                }), 400
+        
+        if search is not None:
+            search = search.strip() or None
+        
+        def load():
+            data = _get_items_data(page, limit, category, search, search_mode, cursor, tags, fields, color)
+            return data, listing_etag('items', data['items'], data['pagination'])
+        
+        # Only the first pages are worth caching; deep cursors are not
+        if cursor:
+            data, etag = load()
+        else:
+            key = catalog_cache.make_key(
+                'items', page=page, limit=limit, category=category,
+                search=search, search_mode=search_mode, cursor=cursor,
+                tags=tuple(sorted(tag.lower() for tag in tags)) or None,
+                fields=tuple(sorted(fields)) if fields else None,
+                color=color or None
             )
+            data, etag = catalog_cache.get_or_compute(key, load)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Item.created_at.desc())
+        response = not_modified(etag)
+        if response:
+            return response
         
-        # Paginate results
-        items_paginated = query.paginate(page=page, per_page=limit, error_out=False)
-        
-        # Create response data
-        items_data = [item.to_dict(include_owner=True) for item in items_paginated.items]
-        
-        return jsonify({
+        response = jsonify({
             'status': 'success',
-            'data': {
-                'items': items_data,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': items_paginated.total,
-                    'pages': items_paginated.pages
-                }
-            }
-        }), 200
+            'data': data
+        })
+        return add_etag(response, etag), 200
+    
+    except InvalidCursorError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid cursor'
+        }), 400
+    
+    except InvalidFieldsError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown field: {e}"
+        }), 400
     
     except Exception as e:
         logger.error(f"Get items error: {str(e)}")
@@ -66,23 +104,138 @@ def get_items():
             'message': 'An error occurred while fetching items'
         }), 500
 
+def _get_items_data(page, limit, category, search, search_mode, cursor, tags=(), fields=None, color=None):
+    """Build the response data for one page of the public catalog"""
+    # Ranked search from the in-memory index, when enabled
+    use_index = (
+        search
+        and not tags
+        and not color
+        and cursor is None
+        and search_mode in (None, 'index')
+        and current_app.config.get('SEARCH_INDEX_ENABLED')
+    )
+    if use_index:
+        return _search_index_page(search, category, page, limit, fields)
+    
+    # Base query - only approved items, with only the requested columns
+    query = Item.query.filter_by(status='approved').options(*item_load_options(fields))
+    relevance = None
+    
+    # Apply filters if provided
+    if category:
+        query = query.filter_by(category=category)
+    
+    if tags:
+        query = filter_by_tags(query, tags)
+    
+    if color:
+        query = filter_by_color(query, color)
+    
+    if search:
+        query, relevance = apply_item_search(query, search, search_mode)
+    
+    # Cursor mode: keyset pagination without OFFSET or COUNT(*)
+    if cursor is not None:
+        items, next_cursor = keyset_paginate(query, Item, cursor, limit)
+        
+        return {
+            'items': serialize_items(items, include_owner=True, fields=fields),
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+        }
+    
+    # Order by relevance for full-text searches, then creation date (newest first)
+    if relevance is not None:
+        query = query.order_by(relevance.desc(), Item.created_at.desc())
+    else:
+        query = query.order_by(Item.created_at.desc())
+    
+    # Paginate results
+    items_paginated = query.paginate(page=page, per_page=limit, error_out=False)
+    
+    return {
+        'items': serialize_items(items_paginated.items, include_owner=True, fields=fields),
+        'pagination': {
+            'page': page,
+            'limit': limit,
+            'total': items_paginated.total,
+            'pages': items_paginated.pages
+        }
+    }
+
+def _search_index_page(search, category, page, limit, fields=None):
+    """Build one page of catalog search results from the in-memory index"""
+    page = max(page, 1)
+    limit = max(limit, 1)
+    
+    # Items changed by other worker processes are only seen through the database
+    revalidate_search_index(current_app.config.get('SEARCH_INDEX_REVALIDATE_SECONDS', 10))
+    
+    ranked, total = search_index.search(
+        search, category=category, offset=(page - 1) * limit, limit=limit
+    )
+    page_ids = [item_id for item_id, _ in ranked]
+    
+    # Load the page in one query and restore ranking order
+    items_by_id = {}
+    if page_ids:
+        items_by_id = {
+            item.id: item for item in Item.query.filter(
+                Item.id.in_(page_ids),
+                Item.status == 'approved'
+            ).options(*item_load_options(fields)).all()
+        }
+    items = [items_by_id[item_id] for item_id in page_ids if item_id in items_by_id]
+    
+    return {
+        'items': serialize_items(items, include_owner=True, fields=fields),
+        'pagination': {
+            'page': page,
+            'limit': limit,
+            'total': total,
+            'pages': math.ceil(total / limit)
+        }
+    }
+
 @items_bp.route('/featured', methods=['GET'])
 def get_featured_items():
     """Get featured items"""
     try:
-        # Get featured items (limited to 5)
-        featured_items = Item.query.filter_by(
-            status='approved', 
-            is_featured=True
-        ).order_by(Item.created_at.desc()).limit(5).all()
+        fields = parse_fields(request.args.get('fields'))
+        
+        def load():
+            # Get featured items (limited to 5)
+            featured_items = Item.query.filter_by(
+                status='approved', 
+                is_featured=True
+            ).options(*item_load_options(fields)).order_by(Item.created_at.desc()).limit(5).all()
+            
+            items_data = serialize_items(featured_items, include_owner=True, fields=fields)
+            return items_data, listing_etag('featured', items_data)
         
         # Create response data
-        items_data = [item.to_dict(include_owner=True) for item in featured_items]
+        key = catalog_cache.make_key('featured', fields=tuple(sorted(fields)) if fields else None)
+        items_data, etag = catalog_cache.get_or_compute(key, load)
         
-        return jsonify({
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        response = jsonify({
             'status': 'success',
             'data': items_data
-        }), 200
+        })
+        return add_etag(response, etag), 200
+    
+    except InvalidFieldsError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown field: {e}"
+        }), 400
     
     except Exception as e:
         logger.error(f"Get featured items error: {str(e)}")
@@ -97,19 +250,7 @@ def get_categories():
     try:
         # These are the predefined categories for now
         # In a real app, this would come from a database table
-        categories = [
-            {'id': 'shirts', 'name': 'Shirts'},
-            {'id': 'tshirts', 'name': 'T-Shirts'},
-            {'id': 'pants', 'name': 'Pants'},
-            {'id': 'jeans', 'name': 'Jeans'},
-            {'id': 'dresses', 'name': 'Dresses'},
-            {'id': 'skirts', 'name': 'Skirts'},
-            {'id': 'jackets', 'name': 'Jackets'},
-            {'id': 'hoodies', 'name': 'Hoodies'},
-            {'id': 'sweaters', 'name': 'Sweaters'},
-            {'id': 'shoes', 'name': 'Shoes'},
-            {'id': 'accessories', 'name': 'Accessories'}
-        ]
+        categories = [{'id': category_id, 'name': name} for category_id, name in ITEM_CATEGORIES]
         
         return jsonify({
             'status': 'success',
@@ -123,10 +264,155 @@ def get_categories():
             'message': 'An error occurred while fetching categories'
         }), 500
 
+@items_bp.route('/facets', methods=['GET'])
+def get_item_facets():
+    """Get approved item counts per category, size and condition"""
+    try:
+        category = request.args.get('category')
+        search = request.args.get('search')
+        search_mode = request.args.get('search_mode')
+        mode = request.args.get('mode', 'live')
+        tags = [tag for tag in request.args.getlist('tag') if tag.strip()]
+        
+        if search_mode and search_mode not in SEARCH_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid search_mode. Must be one of: {', '.join(SEARCH_MODES)}"
+            }), 400
+        
+        if mode not in FACET_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Invalid mode. Must be one of: {', '.join(FACET_MODES)}"
+            }), 400
+        
+        if search is not None:
+            search = search.strip() or None
+        
+        # Materialized counters only cover the unfiltered catalog
+        if mode == 'materialized' and (category or search or tags):
+            mode = 'live'
+        
+        def load():
+            if mode == 'materialized':
+                return materialized_facets()
+            
+            query = Item.query.filter_by(status='approved')
+            if category:
+                query = query.filter_by(category=category)
+            if tags:
+                query = filter_by_tags(query, tags)
+            if search:
+                query, _ = apply_item_search(query, search, search_mode)
+            return compute_facets(query)
+        
+        key = catalog_cache.make_key(
+            'facets', mode=mode, category=category, search=search,
+            search_mode=search_mode,
+            tags=tuple(sorted(tag.lower() for tag in tags)) or None
+        )
+        facets = catalog_cache.get_or_compute(key, load)
+        
+        return jsonify({
+            'status': 'success',
+            'data': dict(facets, mode=mode)
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Get item facets error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while fetching facets'
+        }), 500
+
+@items_bp.route('/batch', methods=['GET'])
+def get_items_batch():
+    """Get several items by ID, in request order"""
+    try:
+        # Accept ?ids=a,b,c as well as repeated ?ids=a&ids=b
+        item_ids = list(dict.fromkeys(
+            item_id.strip()
+            for value in request.args.getlist('ids')
+            for item_id in value.split(',')
+            if item_id.strip()
+        ))
+        fields = parse_fields(request.args.get('fields'))
+        
+        if not item_ids:
+            return jsonify({
+                'status': 'error',
+                'message': 'ids is required'
+            }), 400
+        
+        max_ids = current_app.config.get('ITEM_BATCH_MAX_IDS', 200)
+        if len(item_ids) > max_ids:
+            return jsonify({
+                'status': 'error',
+                'message': f"At most {max_ids} ids can be requested at once"
+            }), 400
+        
+        # One query for the items, then one each for images and owners
+        found = Item.query.filter(Item.id.in_(item_ids)).options(*item_load_options(fields)).all()
+        data_by_id = {
+            item_data['id']: item_data
+            for item_data in serialize_items(found, include_owner=True, fields=fields)
+        }
+        
+        # Missing items keep their position as null and are listed in 'missing'
+        items_data = [data_by_id.get(item_id) for item_id in item_ids]
+        missing = [item_id for item_id in item_ids if item_id not in data_by_id]
+        
+        etag = listing_etag(
+            'batch', [item_data for item_data in items_data if item_data],
+            {'missing': ','.join(missing)}
+        )
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        response = jsonify({
+            'status': 'success',
+            'data': {
+                'items': items_data,
+                'missing': missing
+            }
+        })
+        return add_etag(response, etag), 200
+    
+    except InvalidFieldsError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown field: {e}"
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"Get items batch error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while fetching items'
+        }), 500
+
 @items_bp.route('/<item_id>', methods=['GET'])
 def get_item_by_id(item_id):
     """Get item by ID"""
     try:
+        # Look up only the version columns so unchanged items can be
+        # answered with 304 before the full row and images are loaded
+        version = db.session.query(Item.updated_at, User.updated_at).outerjoin(
+            User, User.id == Item.owner_id
+        ).filter(Item.id == item_id).first()
+        
+        if not version:
+            return jsonify({
+                'status': 'error',
+                'message': 'Item not found'
+            }), 404
+        
+        etag = compute_etag('item', item_id, *version)
+        response = not_modified(etag)
+        if response:
+            return response
+        
         item = Item.query.get(item_id)
         
         if not item:
@@ -135,10 +421,11 @@ def get_item_by_id(item_id):
                 'message': 'Item not found'
             }), 404
         
-        return jsonify({
+        response = jsonify({
             'status': 'success',
             'data': item.to_dict(include_owner=True)
-        }), 200
+        })
+        return add_etag(response, etag), 200
     
     except Exception as e:
         logger.error(f"Get item by ID error: {str(e)}")
@@ -151,6 +438,29 @@ def get_item_by_id(item_id):
 def get_similar_items(item_id):
     """Get similar items based on category and tags"""
     try:
+        # Precomputed neighbours of approved items, when enabled
+        neighbor_ids = None
+        if current_app.config.get('SIMILARITY_INDEX_ENABLED'):
+            # Items changed by other worker processes are only seen through the database
+            revalidate_similarity_index(current_app.config.get('SIMILARITY_INDEX_REVALIDATE_SECONDS', 10))
+            neighbor_ids = similarity_index.neighbors(item_id, limit=4)
+        
+        if neighbor_ids is not None:
+            items_by_id = {}
+            if neighbor_ids:
+                items_by_id = {
+                    item.id: item for item in Item.query.filter(
+                        Item.id.in_(neighbor_ids),
+                        Item.status == 'approved'
+                    ).all()
+                }
+            similar_items = [items_by_id[i] for i in neighbor_ids if i in items_by_id]
+            
+            return jsonify({
+                'status': 'success',
+                'data': serialize_items(similar_items, include_owner=True)
+            }), 200
+        
         item = Item.query.get(item_id)
         
         if not item:
@@ -183,7 +493,7 @@ def get_similar_items(item_id):
                 similar_items.extend(tag_items)
         
         # Create response data
-        items_data = [item.to_dict(include_owner=True) for item in similar_items]
+        items_data = serialize_items(similar_items, include_owner=True)
         
         return jsonify({
             'status': 'success',
@@ -201,6 +511,7 @@ def get_similar_items(item_id):
 @jwt_required()
 def create_item():
     """Create a new item"""
+    stored = []
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -249,9 +560,18 @@ def create_item():
         db.session.add(new_item)
         db.session.flush()  # Get the ID without committing
         
-        # Check if images are provided
-        images = request.files.getlist('images[]')
-        if not images or not images[0].filename:
+        # Keep the normalized tag table in sync with the tags string
+        set_item_tags(new_item.id, tags)
+        
+        # Check if images are provided, as files or completed resumable uploads
+        images = [file for file in request.files.getlist('images[]') if file.filename]
+        upload_ids = [
+            upload_id.strip()
+            for value in request.form.getlist('upload_ids[]') + request.form.getlist('upload_ids')
+            for upload_id in value.split(',')
+            if upload_id.strip()
+        ]
+        if not images and not upload_ids:
             db.session.rollback()
             return jsonify({
                 'status': 'error',
@@ -259,31 +579,44 @@ def create_item():
             }), 400
         
         # Process images
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'items')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        for index, file in enumerate(images):
-            if file and allowed_file(file.filename):
-                # Generate unique filename
-                filename = secure_filename(file.filename)
-                ext = filename.rsplit('.', 1)[1].lower()
-                new_filename = f"{uuid.uuid4().hex}.{ext}"
-                
-                # Save the file
-                file_path = os.path.join(upload_folder, new_filename)
-                file.save(file_path)
-                
-                # Create image record
-                relative_path = f"/uploads/items/{new_filename}"
-                new_image = ItemImage(
-                    item_id=new_item.id,
-                    file_path=relative_path,
-                    is_primary=(index == 0)  # First image is primary
-                )
-                
-                db.session.add(new_image)
+        accepted = [
+            (index, file) for index, file in enumerate(images)
+            if file and allowed_file(file.filename)
+        ]
+        
+        # Hash and write the files concurrently; identical files are stored once
+        stored = store_uploads(
+            [(file.stream, secure_filename(file.filename).rsplit('.', 1)[1]) for _, file in accepted],
+            current_app.config['UPLOAD_FOLDER'],
+            'items',
+            max_workers=current_app.config.get('STORAGE_WRITE_WORKERS', 4)
+        )
+        add_references(stored)
+        
+        file_paths = [(index, upload.path) for (index, _), upload in zip(accepted, stored)]
+        
+        # Uploaded files come first; the session's file reference moves to the image
+        file_paths.extend(
+            (len(images) + index, path)
+            for index, path in enumerate(claim_uploads(current_user_id, upload_ids))
+        )
+        
+        for index, file_path in file_paths:
+            # Create image record
+            new_image = ItemImage(
+                item_id=new_item.id,
+                file_path=file_path,
+                is_primary=(index == 0)  # First image is primary
+            )
+            
+            db.session.add(new_image)
         
         db.session.commit()
+        app = current_app._get_current_object()
+        notify_items_changed(app, new_item)
+        
+        # Resized copies are made after the response is sent
+        derivative_pipeline.submit(app, process_item_images, new_item.id)
         
         logger.info(f"Item '{new_item.title}' created by user {user.username}")
         
@@ -296,8 +629,17 @@ def create_item():
             }
         }), 201
     
+    except UploadSessionError as e:
+        db.session.rollback()
+        discard_uploads(current_app.config['UPLOAD_FOLDER'], stored)
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), e.status_code
+    
     except Exception as e:
         db.session.rollback()
+        discard_uploads(current_app.config['UPLOAD_FOLDER'], stored)
         logger.error(f"Create item error: {str(e)}")
         return jsonify({
             'status': 'error',
@@ -314,16 +656,33 @@ def get_user_items():
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
+        cursor = request.args.get('cursor')
+        
+        query = Item.query.filter_by(owner_id=current_user_id)
+        
+        # Cursor mode: keyset pagination without OFFSET or COUNT(*)
+        if cursor is not None:
+            items, next_cursor = keyset_paginate(query, Item, cursor, limit)
+            
+            return jsonify({
+                'status': 'success',
+                'data': {
+                    'items': serialize_items(items),
+                    'pagination': {
+                        'limit': limit,
+                        'next_cursor': next_cursor,
+                        'has_more': next_cursor is not None
+                    }
+                }
+            }), 200
         
         # Get user items with pagination
-        items_paginated = Item.query.filter_by(
-            owner_id=current_user_id
-        ).order_by(Item.created_at.desc()).paginate(
+        items_paginated = query.order_by(Item.created_at.desc()).paginate(
             page=page, per_page=limit, error_out=False
         )
         
         # Create response data
-        items_data = [item.to_dict() for item in items_paginated.items]
+        items_data = serialize_items(items_paginated.items)
         
         return jsonify({
             'status': 'success',
@@ -338,6 +697,12 @@ def get_user_items():
             }
         }), 200
     
+    except InvalidCursorError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid cursor'
+        }), 400
+    
     except Exception as e:
         logger.error(f"Get user items error: {str(e)}")
         return jsonify({
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, current_app
+from utils.static_files import resolve_upload, send_upload
+import logging
+
+logger = logging.getLogger(__name__)
+
+media_bp = Blueprint('media', __name__)
+
+@media_bp.route('/<path:path>', methods=['GET'])
+def serve_upload(path):
+    """Serve an uploaded file, with range requests and long-lived caching"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if resolve_upload(upload_folder, path) is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'File not found'
+        }), 404
+    
+    return send_upload(
+        upload_folder, path,
+        mode=current_app.config.get('UPLOADS_SERVE_MODE', 'sendfile'),
+        accel_prefix=current_app.config.get('UPLOADS_ACCEL_PREFIX', '/internal-uploads/'),
+        max_age=current_app.config.get('UPLOADS_MAX_AGE', 3600)
+    )
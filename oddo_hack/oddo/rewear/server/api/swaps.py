@@ -1,10 +1,13 @@
 # In rewear/server/api/swaps.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from config.database import db
 from models.user import User
 from models.item import Item
 from models.swap import Swap
+from utils.events import notify_items_changed
+from utils.http_cache import compute_etag, not_modified, add_etag
+from sqlalchemy.orm import aliased
 import logging
 
 logger = logging.getLogger(__name__)
@@ -170,26 +173,44 @@ def get_swap_by_id(swap_id):
     try:
         current_user_id = get_jwt_identity()
         
-        # Find the swap
-        swap = Swap.query.get(swap_id)
+        # Look up the participants and the version of every row embedded
+        # in the response, so unchanged swaps get a 304 without loading them
+        version = _swap_version(swap_id)
         
-        if not swap:
+        if not version:
             return jsonify({
                 'status': 'error',
                 'message': 'Swap not found'
             }), 404
         
+        requester_id, provider_id = version[0], version[1]
+        
         # Check if user is involved in the swap
-        if swap.requester_id != current_user_id and swap.provider_id != current_user_id:
+        if requester_id != current_user_id and provider_id != current_user_id:
             return jsonify({
                 'status': 'error',
                 'message': 'Unauthorized to view this swap'
             }), 403
         
-        return jsonify({
+        etag = compute_etag('swap', swap_id, *version)
+        response = not_modified(etag, private=True)
+        if response:
+            return response
+        
+        # Find the swap
+        swap = Swap.query.get(swap_id)
+        
+        if not swap:
+            return jsonify({
+                'status': 'error',
+                'message': 'Swap not found'
+            }), 404
+        
+        response = jsonify({
             'status': 'success',
             'data': swap.to_dict()
-        }), 200
+        })
+        return add_etag(response, etag, private=True), 200
     
     except Exception as e:
         logger.error(f"Get swap by ID error: {str(e)}")
@@ -198,6 +219,31 @@ def get_swap_by_id(swap_id):
             'message': 'An error occurred while fetching swap'
         }), 500
 
+def _swap_version(swap_id):
+    """Get the participant ids and updated_at of every row shown in a swap"""
+    requester = aliased(User)
+    provider = aliased(User)
+    requester_item = aliased(Item)
+    provider_item = aliased(Item)
+    
+    return db.session.query(
+        Swap.requester_id,
+        Swap.provider_id,
+        Swap.updated_at,
+        requester.updated_at,
+        provider.updated_at,
+        requester_item.updated_at,
+        provider_item.updated_at
+    ).outerjoin(
+        requester, requester.id == Swap.requester_id
+    ).outerjoin(
+        provider, provider.id == Swap.provider_id
+    ).outerjoin(
+        requester_item, requester_item.id == Swap.requester_item_id
+    ).outerjoin(
+        provider_item, provider_item.id == Swap.provider_item_id
+    ).filter(Swap.id == swap_id).first()
+
 @swaps_bp.route('/<swap_id>/respond', methods=['PUT'])
 @jwt_required()
 def respond_to_swap(swap_id):
@@ -237,6 +283,7 @@ def respond_to_swap(swap_id):
             }), 400
         
         # Update swap status
+        changed_items = []
         if data['response'] == 'accept':
             swap.status = 'accepted'
             
@@ -247,6 +294,7 @@ def respond_to_swap(swap_id):
             if requester_item and provider_item:
                 requester_item.status = 'swapped'
                 provider_item.status = 'swapped'
+                changed_items = [requester_item, provider_item]
             
             logger.info(f"Swap {swap_id} accepted by {current_user_id}")
         else:
@@ -254,6 +302,7 @@ def respond_to_swap(swap_id):
             logger.info(f"Swap {swap_id} rejected by {current_user_id}")
         
         db.session.commit()
+        notify_items_changed(current_app._get_current_object(), *changed_items)
         
         return jsonify({
             'status': 'success',
@@ -0,0 +1,211 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+from config.database import db
+from models.upload_session import UploadSession
+from utils.upload_sessions import (
+    UploadSessionError, create_part_file, receive_chunk, append_chunk, finalize_upload
+)
+from utils.storage import discard_uploads
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+def _get_own_upload(upload_id, user_id, lock=False):
+    """Load an upload session of the current user, optionally locking the row"""
+    query = UploadSession.query.filter_by(id=upload_id, user_id=user_id)
+    if lock:
+        # Refresh a session already loaded by this request
+        query = query.with_for_update().populate_existing()
+    return query.first()
+
+@uploads_bp.route('', methods=['POST'])
+@jwt_required()
+def create_upload():
+    """Start a resumable upload of one image"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        filename = secure_filename(data.get('filename') or '')
+        size = data.get('size')
+        
+        if not filename or not isinstance(size, int) or size <= 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'filename and a positive size are required'
+            }), 400
+        
+        if not allowed_file(filename):
+            return jsonify({
+                'status': 'error',
+                'message': 'File type not allowed'
+            }), 400
+        
+        max_size = current_app.config.get('UPLOAD_SESSION_MAX_SIZE')
+        if size > max_size:
+            return jsonify({
+                'status': 'error',
+                'message': f"File is larger than {max_size} bytes"
+            }), 413
+        
+        upload = UploadSession(
+            user_id=current_user_id,
+            filename=filename,
+            total_size=size
+        )
+        db.session.add(upload)
+        db.session.flush()
+        
+        create_part_file(current_app.config['UPLOAD_FOLDER'], upload.id)
+        db.session.commit()
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Upload started',
+            'data': upload.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Create upload error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while starting upload'
+        }), 500
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Get the state of an upload, including the offset to resume from"""
+    try:
+        upload = _get_own_upload(upload_id, get_jwt_identity())
+        if not upload:
+            return jsonify({
+                'status': 'error',
+                'message': 'Upload not found'
+            }), 404
+        
+        return jsonify({
+            'status': 'success',
+            'data': upload.to_dict()
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Get upload error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while fetching upload'
+        }), 500
+
+@uploads_bp.route('/<upload_id>', methods=['PUT'])
+@jwt_required()
+def put_chunk(upload_id):
+    """
+    Append a chunk to an upload. The raw request body is the chunk and
+    ?offset= is its position, which must equal the current offset.
+    """
+    try:
+        offset = request.args.get('offset', type=int)
+        if offset is None or offset < 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'A non-negative offset is required'
+            }), 400
+        
+        upload = _get_own_upload(upload_id, get_jwt_identity())
+        if not upload:
+            return jsonify({
+                'status': 'error',
+                'message': 'Upload not found'
+            }), 404
+        
+        # Receive the body first; the row lock, which serializes concurrent
+        # chunks for the same upload, is only held to append it
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        chunk_path = receive_chunk(upload_folder, upload, request.stream, offset)
+        try:
+            upload = _get_own_upload(upload_id, get_jwt_identity(), lock=True)
+            if not upload:
+                raise UploadSessionError('Upload not found', 404)
+            append_chunk(upload_folder, upload, chunk_path, offset)
+            db.session.commit()
+        finally:
+            os.remove(chunk_path)
+        
+        return jsonify({
+            'status': 'success',
+            'data': upload.to_dict()
+        }), 200
+    
+    except UploadSessionError as e:
+        db.session.rollback()
+        upload = _get_own_upload(upload_id, get_jwt_identity())
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'data': upload.to_dict() if upload else None
+        }), e.status_code
+    
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f"Chunks can be at most {current_app.config['MAX_CONTENT_LENGTH']} bytes"
+        }), 413
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Upload chunk error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while uploading chunk'
+        }), 500
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """Finish an upload once every byte has been received"""
+    stored = None
+    try:
+        upload = _get_own_upload(upload_id, get_jwt_identity(), lock=True)
+        if not upload:
+            return jsonify({
+                'status': 'error',
+                'message': 'Upload not found'
+            }), 404
+        
+        stored = finalize_upload(current_app.config['UPLOAD_FOLDER'], upload)
+        db.session.commit()
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Upload complete',
+            'data': upload.to_dict()
+        }), 200
+    
+    except UploadSessionError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), e.status_code
+    
+    except Exception as e:
+        db.session.rollback()
+        if stored is not None:
+            discard_uploads(current_app.config['UPLOAD_FOLDER'], [stored])
+        logger.error(f"Complete upload error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while completing upload'
+        }), 500
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
@@ -1,11 +1,12 @@
-import os
-import uuid
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 from config.database import db
 from models.user import User
 from auth.jwt_handler import generate_tokens
+from utils.http_cache import compute_etag, not_modified, add_etag
+from utils.derivatives import derivative_pipeline, process_profile_image
+from utils.storage import store_stream, add_references, release_file, delete_file, discard_uploads
 import logging
 
 logger = logging.getLogger(__name__)
@@ -91,6 +92,17 @@ def get_profile():
     """Get current user profile"""
     try:
         current_user_id = get_jwt_identity()
+        
+        # Answer unchanged profiles with 304 from the version column alone
+        updated_at = db.session.query(User.updated_at).filter(
+            User.id == current_user_id
+        ).scalar()
+        if updated_at:
+            etag = compute_etag('user', current_user_id, updated_at)
+            response = not_modified(etag, private=True)
+            if response:
+                return response
+        
         user = User.query.get(current_user_id)
         
         if not user:
@@ -99,12 +111,14 @@ def get_profile():
                 'message': 'User not found'
             }), 404
         
-        return jsonify({
+        response = jsonify({
             'status': 'success',
             'data': {
                 'user': user.to_dict()
             }
-        }), 200
+        })
+        etag = compute_etag('user', user.id, user.updated_at)
+        return add_etag(response, etag, private=True), 200
     
     except Exception as e:
         logger.error(f"Get profile error: {str(e)}")
@@ -174,6 +188,7 @@ def update_profile():
 @jwt_required()
 def upload_profile_image():
     """Upload profile image"""
+    upload = None
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -207,24 +222,41 @@ def upload_profile_image():
                 'message': 'File type not allowed'
             }), 400
         
-        # Generate unique filename
+        # Store the file by content hash
         filename = secure_filename(file.filename)
         ext = filename.rsplit('.', 1)[1].lower()
-        new_filename = f"{uuid.uuid4().hex}.{ext}"
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        upload = store_stream(file.stream, upload_folder, 'profile_images', ext)
+        relative_path = upload.path
         
-        # Create upload directory if it doesn't exist
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profile_images')
-        os.makedirs(upload_folder, exist_ok=True)
+        if relative_path == user.profile_image:
+            discard_uploads(upload_folder, [upload])
+            return jsonify({
+                'status': 'success',
+                'message': 'Profile image uploaded successfully',
+                'data': {
+                    'image_url': relative_path
+                }
+            }), 200
         
-        # Save the file
-        file_path = os.path.join(upload_folder, new_filename)
-        file.save(file_path)
+        # Move the reference from the old image to the new one
+        old_image = user.profile_image
+        add_references([upload])
+        unreferenced = release_file(old_image) if old_image else False
         
         # Update user's profile image path
-        relative_path = f"/uploads/profile_images/{new_filename}"
         user.profile_image = relative_path
+        user.profile_image_derivatives = None
         db.session.commit()
         
+        if unreferenced:
+            delete_file(upload_folder, old_image)
+        
+        # Resized copies are made after the response is sent
+        derivative_pipeline.submit(
+            current_app._get_current_object(), process_profile_image, user.id, relative_path
+        )
+        
         return jsonify({
             'status': 'success',
             'message': 'Profile image uploaded successfully',
@@ -235,6 +267,8 @@ def upload_profile_image():
     
     except Exception as e:
         db.session.rollback()
+        if upload is not None:
+            discard_uploads(current_app.config['UPLOAD_FOLDER'], [upload])
         logger.error(f"Profile image upload error: {str(e)}")
         return jsonify({
             'status': 'error',
@@ -46,6 +46,8 @@ from api.users import users_bp
 from api.items import items_bp
 from api.swaps import swaps_bp
 from api.admin import admin_bp
+from api.uploads import uploads_bp
+from api.media import media_bp
 
 # Register blueprints
 app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -53,6 +55,12 @@ app.register_blueprint(items_bp, url_prefix='/api/items')
 app.register_blueprint(swaps_bp, url_prefix='/api/swaps')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(images_bp, url_prefix='/api/images')
+app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
+app.register_blueprint(media_bp, url_prefix='/uploads')
+
+# Register CLI commands
+from commands import register_commands
+register_commands(app)
 
 # JWT error handlers
 @jwt.expired_token_loader
@@ -114,6 +122,26 @@ def create_tables():
 with app.app_context():
     db.create_all()
 
+# Build in-memory indexes once the tables exist
+from utils.search_index import init_search_index
+from utils.similarity import init_similarity_index
+from utils.cache import init_catalog_cache
+from utils.facets import init_facet_counts
+from utils.derivatives import init_derivative_pipeline
+from utils.resize_cache import init_resize_cache
+from utils.image_hash import init_duplicate_index
+from utils.filename_metadata import init_metadata_extractor
+from utils.scan_index import init_scan_index
+init_search_index(app)
+init_similarity_index(app)
+init_catalog_cache(app)
+init_facet_counts(app)
+init_derivative_pipeline(app)
+init_resize_cache(app)
+init_duplicate_index(app)
+init_metadata_extractor(app)
+init_scan_index(app)
+
 
 if __name__ == '__main__':
     with app.app_context():
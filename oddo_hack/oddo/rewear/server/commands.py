@@ -0,0 +1,193 @@
+# File: rewear/server/commands.py
+
+import click
+from flask.cli import with_appcontext
+import logging
+
+logger = logging.getLogger(__name__)
+
+@click.command('backfill-tags')
+@click.option('--batch-size', default=500, show_default=True, help='Items per transaction')
+@with_appcontext
+def backfill_tags_command(batch_size):
+    """Populate the item_tags table from the items.tags column"""
+    from utils.tags import backfill_item_tags
+    
+    processed = backfill_item_tags(batch_size=batch_size)
+    click.echo(f"Backfilled tags for {processed} items")
+
+@click.command('rebuild-facet-counts')
+@with_appcontext
+def rebuild_facet_counts_command():
+    """Recompute the item_facet_counts table from the items table"""
+    from utils.facets import rebuild_facet_counts
+    
+    facets = rebuild_facet_counts()
+    click.echo(f"Rebuilt facet counts for {facets['total']} approved items")
+
+@click.command('import-items')
+@click.argument('items_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--images', 'images_archive', type=click.Path(exists=True, dir_okay=False),
+              help='Zip archive with the images named in the items file')
+@click.option('--owner', required=True, help='Email of the user owning rows without an owner_id')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format, detected from the file extension by default')
+@click.option('--status', default='approved', show_default=True,
+              type=click.Choice(['pending', 'approved']), help='Status of rows without a status')
+@click.option('--batch-size', default=500, show_default=True, help='Items per transaction')
+@with_appcontext
+def import_items_command(items_file, images_archive, owner, fmt, status, batch_size):
+    """Bulk import items from a CSV or NDJSON file"""
+    from flask import current_app
+    from models.user import User
+    from utils.bulk_import import import_items, detect_format
+    
+    user = User.query.filter_by(email=owner).first()
+    if not user:
+        raise click.ClickException(f"No user with email {owner}")
+    
+    fmt = fmt or detect_format(items_file)
+    if not fmt:
+        raise click.ClickException('Cannot detect the format, use --format')
+    
+    def show_progress(report):
+        click.echo(f"{report.imported} imported, {report.failed} failed")
+    
+    with open(items_file, 'rb') as stream:
+        report = import_items(
+            current_app._get_current_object(), stream, fmt, user.id,
+            images_archive=images_archive, batch_size=batch_size,
+            default_status=status, progress=show_progress
+        )
+    
+    for error in report['errors']:
+        click.echo(f"Row {error['row']}: {error['message']}", err=True)
+    if report['error']:
+        click.echo(f"Stopped early: {report['error']}", err=True)
+    click.echo(
+        f"Imported {report['imported']} of {report['rows']} rows in "
+        f"{report['elapsed_seconds']}s ({report['items_per_second']} items/s)"
+    )
+
+@click.command('export')
+@click.argument('table', type=click.Choice(['items', 'users', 'swaps']))
+@click.option('--format', 'fmt', default='ndjson', show_default=True, type=click.Choice(['ndjson', 'csv']))
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='Output file, standard output by default')
+@click.option('--status', help='Only export rows with this status')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip')
+@with_appcontext
+def export_command(table, fmt, output, status, batch_size):
+    """Stream a table as NDJSON or CSV"""
+    from utils.export import export_rows
+    
+    for chunk in export_rows(table, fmt, status=status, batch_size=batch_size):
+        output.write(chunk)
+
+@click.command('generate-derivatives')
+@click.option('--workers', default=4, show_default=True, help='Worker threads')
+@with_appcontext
+def generate_derivatives_command(workers):
+    """Create resized copies for item images that have none yet"""
+    from flask import current_app
+    from config.database import db
+    from models.item import ItemImage
+    from utils.derivatives import DerivativePipeline, process_item_images
+    
+    item_ids = [item_id for (item_id,) in db.session.query(ItemImage.item_id).filter(
+        ItemImage.derivatives.is_(None)
+    ).distinct()]
+    
+    pipeline = DerivativePipeline(max_workers=workers)
+    app = current_app._get_current_object()
+    for item_id in item_ids:
+        pipeline.submit(app, process_item_images, item_id)
+    pipeline.wait()
+    
+    stats = pipeline.stats()
+    click.echo(
+        f"Processed {stats['images_processed']} images of {len(item_ids)} items "
+        f"({stats['failed']} failed)"
+    )
+
+@click.command('cleanup-uploads')
+@click.option('--max-age-hours', type=int, help='Defaults to UPLOAD_SESSION_MAX_AGE_HOURS')
+@with_appcontext
+def cleanup_uploads_command(max_age_hours):
+    """Delete resumable upload sessions that were never used"""
+    from flask import current_app
+    from utils.upload_sessions import cleanup_upload_sessions
+    
+    if max_age_hours is None:
+        max_age_hours = current_app.config.get('UPLOAD_SESSION_MAX_AGE_HOURS', 24)
+    removed = cleanup_upload_sessions(current_app.config['UPLOAD_FOLDER'], max_age_hours)
+    click.echo(f"Removed {removed} expired upload sessions")
+
+@click.command('uploads-nginx-config')
+@click.option('--upstream', default='http://server:5000', show_default=True, help='Address of the app')
+@click.option('--upload-folder', help='Uploads folder as seen by nginx, UPLOAD_FOLDER by default')
+@click.option('--direct/--no-direct', default=True, show_default=True,
+              help='Let nginx serve content-unique files without asking the app')
+@with_appcontext
+def uploads_nginx_config_command(upstream, upload_folder, direct):
+    """Print nginx locations for serving /uploads with X-Accel-Redirect"""
+    from flask import current_app
+    from utils.static_files import nginx_config
+    
+    click.echo(nginx_config(
+        upload_folder or current_app.config['UPLOAD_FOLDER'],
+        upstream,
+        accel_prefix=current_app.config.get('UPLOADS_ACCEL_PREFIX', '/internal-uploads/'),
+        direct=direct
+    ))
+
+@click.command('hash-images')
+@click.option('--catalog/--no-catalog', default=True, show_default=True,
+              help='Also hash the scanned catalog images')
+@click.option('--workers', default=4, show_default=True, help='Worker threads')
+@with_appcontext
+def hash_images_command(catalog, workers):
+    """Compute perceptual hashes for duplicate detection"""
+    from flask import current_app
+    from utils.image_hash import hash_item_images, hash_catalog_images
+    
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    hashed = hash_item_images(upload_folder, max_workers=workers)
+    click.echo(f"Hashed {hashed} item images")
+    
+    if catalog:
+        counts = hash_catalog_images(upload_folder, max_workers=workers)
+        click.echo(
+            f"Hashed {counts['hashed']} catalog images, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+        )
+
+@click.command('analyze-colors')
+@click.option('--catalog/--no-catalog', default=True, show_default=True,
+              help='Also hash and analyze the catalog images')
+@click.option('--workers', default=4, show_default=True, help='Worker threads')
+@with_appcontext
+def analyze_colors_command(catalog, workers):
+    """Extract dominant colours of images for colour search"""
+    from flask import current_app
+    from utils.colors import analyze_item_images, analyze_catalog_images
+    
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    analyzed = analyze_item_images(upload_folder, max_workers=workers)
+    click.echo(f"Analyzed {analyzed} item images")
+    
+    if catalog:
+        analyzed = analyze_catalog_images(upload_folder, max_workers=workers)
+        click.echo(f"Analyzed {analyzed} catalog images")
+
+def register_commands(app):
+    """Register maintenance commands with the Flask CLI"""
+    app.cli.add_command(backfill_tags_command)
+    app.cli.add_command(rebuild_facet_counts_command)
+    app.cli.add_command(import_items_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(generate_derivatives_command)
+    app.cli.add_command(cleanup_uploads_command)
+    app.cli.add_command(uploads_nginx_config_command)
+    app.cli.add_command(hash_images_command)
+    app.cli.add_command(analyze_colors_command)
\ No newline at end of file
@@ -25,6 +25,59 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    STORAGE_WRITE_WORKERS = int(os.getenv('STORAGE_WRITE_WORKERS', 4))  # Concurrent upload writes
+    
+    # Resumable uploads: each chunk is limited by MAX_CONTENT_LENGTH
+    UPLOAD_SESSION_MAX_SIZE = int(os.getenv('UPLOAD_SESSION_MAX_SIZE', 50 * 1024 * 1024))
+    UPLOAD_SESSION_MAX_AGE_HOURS = int(os.getenv('UPLOAD_SESSION_MAX_AGE_HOURS', 24))
+    
+    # Serving of /uploads: 'sendfile' from the app, or 'x-accel' behind nginx
+    UPLOADS_SERVE_MODE = os.getenv('UPLOADS_SERVE_MODE', 'sendfile')
+    UPLOADS_ACCEL_PREFIX = os.getenv('UPLOADS_ACCEL_PREFIX', '/internal-uploads/')
+    UPLOADS_MAX_AGE = int(os.getenv('UPLOADS_MAX_AGE', 3600))  # Files whose names are not content-unique
+    
+    # Resized WebP/JPEG copies of uploads, created by background workers
+    IMAGE_PIPELINE_ENABLED = os.getenv('IMAGE_PIPELINE_ENABLED', 'true').lower() == 'true'
+    IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+    
+    # On-the-fly resizes from GET /api/images/resize, cached on disk with LRU eviction
+    RESIZE_CACHE_DIR = os.getenv('RESIZE_CACHE_DIR')  # Defaults to UPLOAD_FOLDER/cache/resized
+    RESIZE_CACHE_MAX_BYTES = int(os.getenv('RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    # Requested w and h are rounded up to one of these sizes, which bounds the variants per image
+    RESIZE_SIZES = tuple(int(size) for size in os.getenv('RESIZE_SIZES', '80,160,320,480,640,960,1280,1920').split(','))
+    
+    # Scan index of the catalog image tree, revalidated by directory mtime
+    SCAN_INDEX_FILE = os.getenv('SCAN_INDEX_FILE')  # Defaults to UPLOAD_FOLDER/cache/scan_index.json
+    SCAN_INDEX_REVALIDATE_SECONDS = float(os.getenv('SCAN_INDEX_REVALIDATE_SECONDS', 5))
+    IMAGE_SCAN_WORKERS = int(os.getenv('IMAGE_SCAN_WORKERS', 4))  # Threads listing directories
+    IMAGE_METADATA_VOCABULARY_FILE = os.getenv('IMAGE_METADATA_VOCABULARY_FILE')  # JSON, field -> terms
+    IMAGE_INDEX_FILE = os.getenv('IMAGE_INDEX_FILE')  # Defaults to UPLOAD_FOLDER/image_index.sqlite
+    IMAGE_PAGE_DEFAULT_LIMIT = int(os.getenv('IMAGE_PAGE_DEFAULT_LIMIT', 100))  # GET /api/images/category/<path>
+    IMAGE_PAGE_MAX_LIMIT = int(os.getenv('IMAGE_PAGE_MAX_LIMIT', 500))
+    
+    # Search settings
+    # Serve catalog searches from an in-memory BM25 index of approved items
+    SEARCH_INDEX_ENABLED = os.getenv('SEARCH_INDEX_ENABLED', 'false').lower() == 'true'
+    # Seconds between checks for items changed by other worker processes
+    SEARCH_INDEX_REVALIDATE_SECONDS = float(os.getenv('SEARCH_INDEX_REVALIDATE_SECONDS', 10))
+    
+    # Serve /api/items/similar from precomputed nearest neighbours
+    SIMILARITY_INDEX_ENABLED = os.getenv('SIMILARITY_INDEX_ENABLED', 'false').lower() == 'true'
+    SIMILARITY_TOP_K = int(os.getenv('SIMILARITY_TOP_K', 8))
+    # Seconds between checks for items changed by other worker processes
+    SIMILARITY_INDEX_REVALIDATE_SECONDS = float(os.getenv('SIMILARITY_INDEX_REVALIDATE_SECONDS', 10))
+    
+    # Near-duplicate image lookups for moderators, over item and catalog image hashes
+    DUPLICATE_INDEX_ENABLED = os.getenv('DUPLICATE_INDEX_ENABLED', 'false').lower() == 'true'
+    DUPLICATE_RADIUS = int(os.getenv('DUPLICATE_RADIUS', 6))  # Default Hamming distance, in bits
+    
+    # Catalog cache settings
+    CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'true').lower() == 'true'
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 30))  # seconds
+    CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 512))
+    
+    # Maximum number of ids accepted by GET /api/items/batch
+    ITEM_BATCH_MAX_IDS = int(os.getenv('ITEM_BATCH_MAX_IDS', 200))
 
 class DevelopmentConfig(Config):
     """Development configuration."""
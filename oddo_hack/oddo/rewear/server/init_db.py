@@ -1,6 +1,8 @@
 import os
 import pymysql
 import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 
 # Force PyMySQL
 pymysql.install_as_MySQLdb()
@@ -8,6 +10,17 @@ pymysql.install_as_MySQLdb()
 from flask import Flask
 from config.database import db
 
+# ALTER scripts for databases created before a column was added; new
+# tables are created by create_all()
+MIGRATIONS_DIR = os.environ.get(
+    'MIGRATIONS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'migrations')
+)
+
+# MySQL errors meaning a statement was already applied: duplicate
+# column, duplicate key name
+APPLIED_ERRORS = (1060, 1061)
+
 def create_db_tables():
     """Create database tables if they don't exist"""
     print("Creating database connection with PyMySQL...")
@@ -27,11 +40,55 @@ def create_db_tables():
             print("Creating all database tables...")
             db.create_all()
             print("Database tables created successfully!")
+            apply_migrations()
             return True
         except Exception as e:
             print(f"Error creating database tables: {str(e)}")
             return False
 
+def apply_migrations():
+    """
+    Run the scripts in MIGRATIONS_DIR that have not run yet, in filename
+    order. Statements whose column or index already exists are skipped,
+    so tables created from the current models or schema.sql are left as
+    they are.
+    """
+    if not os.path.isdir(MIGRATIONS_DIR):
+        print(f"No migrations found in {MIGRATIONS_DIR}")
+        return
+    
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "name VARCHAR(255) PRIMARY KEY, "
+            "applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = set(connection.execute(text("SELECT name FROM schema_migrations")).scalars())
+    
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not name.endswith('.sql') or name in applied:
+            continue
+        
+        print(f"Applying migration {name}...")
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            lines = [line for line in f if not line.lstrip().startswith('--')]
+        
+        # MySQL commits DDL implicitly, so each statement stands alone
+        with db.engine.connect() as connection:
+            for statement in ''.join(lines).split(';'):
+                if not statement.strip():
+                    continue
+                try:
+                    connection.execute(text(statement))
+                except OperationalError as e:
+                    if e.orig.args[0] not in APPLIED_ERRORS:
+                        raise
+                    print(f"Already applied: {e.orig.args[1]}")
+            connection.execute(
+                text("INSERT INTO schema_migrations (name) VALUES (:name)"), {'name': name}
+            )
+            connection.commit()
+
 if __name__ == "__main__":
     # Wait for database to be ready
     max_retries = 30
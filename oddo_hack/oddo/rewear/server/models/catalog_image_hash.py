@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy.dialects.mysql import CHAR
+from config.database import db
+
+class CatalogImageHash(db.Model):
+    """Perceptual hash and colours of a catalog image scanned from the uploads folder"""
+    __tablename__ = 'catalog_image_hashes'
+    
+    path = db.Column(db.String(512), primary_key=True)  # Relative to UPLOAD_FOLDER, e.g. Bewakoof/<category>/<file>
+    phash = db.Column(CHAR(16), nullable=False, index=True)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    mtime_ns = db.Column(db.BigInteger, nullable=False)  # Rehashed when size or mtime change
+    dominant_color = db.Column(db.String(20), index=True)  # Palette colour name, see utils/colors.py
+    colors = db.Column(db.JSON(none_as_null=True))  # Dominant colours with their share
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert catalog image hash object to dictionary"""
+        return {
+            'path': self.path,
+            'url': f"/uploads/{self.path}",
+            'phash': self.phash,
+            'dominant_color': self.dominant_color,
+            'colors': self.colors,
+            'file_size': self.file_size,
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f"<CatalogImageHash {self.path}>"
\ No newline at end of file
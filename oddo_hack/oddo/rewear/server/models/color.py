@@ -0,0 +1,11 @@
+from sqlalchemy.dialects.mysql import CHAR
+from config.database import db
+
+# Palette colours covering a noticeable share of an item's primary image
+item_colors = db.Table(
+    'item_colors',
+    db.Column('item_id', CHAR(36), db.ForeignKey('items.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('color', db.String(20), primary_key=True),
+    db.Column('weight', db.SmallInteger, nullable=False),  # Share of the image in per mille
+    db.Index('idx_item_colors_color', 'color', 'item_id')
+)
\ No newline at end of file
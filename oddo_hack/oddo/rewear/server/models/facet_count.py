@@ -0,0 +1,19 @@
+from config.database import db
+
+class FacetCount(db.Model):
+    """Materialized count of approved items per facet value"""
+    __tablename__ = 'item_facet_counts'
+    
+    facet = db.Column(db.String(20), primary_key=True)  # category, size, condition
+    value = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        """Convert facet count object to dictionary"""
+        return {
+            'value': self.value,
+            'count': self.count
+        }
+    
+    def __repr__(self):
+        return f"<FacetCount {self.facet}={self.value}: {self.count}>"
\ No newline at end of file
@@ -3,6 +3,23 @@ from datetime import datetime
 from sqlalchemy.dialects.mysql import CHAR
 from config.database import db
 
+# Values offered by the item form, (id, display name) for categories
+ITEM_CATEGORIES = (
+    ('shirts', 'Shirts'),
+    ('tshirts', 'T-Shirts'),
+    ('pants', 'Pants'),
+    ('jeans', 'Jeans'),
+    ('dresses', 'Dresses'),
+    ('skirts', 'Skirts'),
+    ('jackets', 'Jackets'),
+    ('hoodies', 'Hoodies'),
+    ('sweaters', 'Sweaters'),
+    ('shoes', 'Shoes'),
+    ('accessories', 'Accessories')
+)
+ITEM_SIZES = ('XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL')
+ITEM_CONDITIONS = ('New', 'Like New', 'Excellent', 'Good', 'Fair', 'Poor')
+
 class Item(db.Model):
     __tablename__ = 'items'
     
@@ -22,26 +39,39 @@ class Item(db.Model):
     # Relationships
     images = db.relationship('ItemImage', backref='item', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self, include_owner=False):
-        """Convert item object to dictionary"""
-        item_dict = {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'category': self.category,
-            'size': self.size,
-            'condition': self.condition,
-            'tags': self.tags,
-            'status': self.status,
-            'is_featured': self.is_featured,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'images': [image.to_dict() for image in self.images]
-        }
+    # Latest change of any item, read by the in-memory indexes to find changed rows
+    __table_args__ = (db.Index('idx_updated_at', 'updated_at'),)
+    
+    # Fields returned by to_dict(), in response order
+    FIELDS = (
+        'id', 'title', 'description', 'category', 'size', 'condition', 'tags',
+        'status', 'is_featured', 'created_at', 'updated_at', 'images'
+    )
+    
+    def to_dict(self, include_owner=False, fields=None):
+        """
+        Convert item object to dictionary
+        
+        Args:
+            include_owner (bool): Whether to include owner details
+            fields (set): Only include these fields; all fields if None.
+                Columns left out are not touched, so deferred columns
+                are not loaded.
+        """
+        item_dict = {}
+        for field in self.FIELDS:
+            if fields is not None and field not in fields:
+                continue
+            if field == 'images':
+                item_dict[field] = [image.to_dict() for image in self.images]
+            elif field in ('created_at', 'updated_at'):
+                item_dict[field] = getattr(self, field).isoformat()
+            else:
+                item_dict[field] = getattr(self, field)
         
         if include_owner:
-            from models.user import User
-            owner = User.query.get(self.owner_id)
+            # Uses the 'owner' backref so preloaded owners are not re-queried
+            owner = self.owner
             if owner:
                 item_dict['owner'] = {
                     'id': owner.id,
@@ -63,16 +93,31 @@ class ItemImage(db.Model):
     item_id = db.Column(CHAR(36), db.ForeignKey('items.id'), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
     is_primary = db.Column(db.Boolean, default=False)
+    derivatives = db.Column(db.JSON(none_as_null=True))  # Resized copies, filled in by the derivative pipeline
+    phash = db.Column(CHAR(16), index=True)  # 64-bit difference hash in hex, for duplicate detection
+    colors = db.Column(db.JSON(none_as_null=True))  # Dominant palette colours with their share
+    color_histogram = db.Column(db.JSON(none_as_null=True))  # 4x4x4 RGB histogram in per mille
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        """Convert image object to dictionary"""
-        return {
+    def to_dict(self, include_phash=False):
+        """
+        Convert image object to dictionary
+        
+        Args:
+            include_phash (bool): Whether to include the perceptual hash,
+                which is only shown to admins
+        """
+        image_dict = {
             'id': self.id,
             'file_path': self.file_path,
             'is_primary': self.is_primary,
+            'derivatives': self.derivatives,
+            'colors': self.colors,
             'created_at': self.created_at.isoformat()
         }
+        if include_phash:
+            image_dict['phash'] = self.phash
+        return image_dict
     
     def __repr__(self):
         return f"<ItemImage {self.id}>"
\ No newline at end of file
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy.dialects.mysql import CHAR
+from config.database import db
+
+class StoredFile(db.Model):
+    """Content-addressed upload shared by every row that references it"""
+    __tablename__ = 'stored_files'
+    
+    path = db.Column(db.String(255), primary_key=True)  # /uploads/<folder>/<sha256>.<ext>
+    digest = db.Column(CHAR(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert stored file object to dictionary"""
+        return {
+            'path': self.path,
+            'digest': self.digest,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f"<StoredFile {self.path} refs={self.ref_count}>"
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy.dialects.mysql import CHAR
+from config.database import db
+
+# Association between items and normalized tags
+item_tags = db.Table(
+    'item_tags',
+    db.Column('item_id', CHAR(36), db.ForeignKey('items.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_item_tags_tag', 'tag_id', 'item_id')
+)
+
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    
+    def to_dict(self):
+        """Convert tag object to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+    
+    def __repr__(self):
+        return f"<Tag {self.name}>"
\ No newline at end of file
@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime
+from sqlalchemy.dialects.mysql import CHAR
+from config.database import db
+
+class UploadSession(db.Model):
+    """Resumable upload of one image, sent in chunks"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(CHAR(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), default='open')  # open, complete, used
+    file_path = db.Column(db.String(255))  # Stored file, set when complete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert upload session object to dictionary"""
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.total_size,
+            'offset': self.received,
+            'status': self.status,
+            'file_path': self.file_path,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f"<UploadSession {self.id} {self.received}/{self.total_size}>"
\ No newline at end of file
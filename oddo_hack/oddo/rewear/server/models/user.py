@@ -17,6 +17,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     gender = db.Column(db.String(20))
     profile_image = db.Column(db.String(255))
+    profile_image_derivatives = db.Column(db.JSON(none_as_null=True))  # Resized copies of profile_image
     city = db.Column(db.String(100))
     address = db.Column(db.String(255))
     bio = db.Column(db.Text)
@@ -55,6 +56,7 @@ class User(db.Model):
             'email': self.email,
             'gender': self.gender,
             'profile_image': self.profile_image,
+            'profile_image_derivatives': self.profile_image_derivatives,
             'city': self.city,
             'address': self.address,
             'bio': self.bio,
@@ -0,0 +1,400 @@
+# File: rewear/server/utils/bulk_import.py
+
+import csv
+import json
+import os
+import time
+import uuid
+import zipfile
+import zlib
+from datetime import datetime
+from sqlalchemy import insert, select
+from config.database import db
+from models.user import User
+from models.item import Item, ItemImage
+from utils.tags import set_items_tags
+from utils.facets import facet_deltas, apply_facet_deltas
+from utils.events import notify_items_changed
+from utils.derivatives import derivative_pipeline, process_item_images
+from utils.storage import store_stream, add_references, discard_uploads
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Statuses an imported item may start in
+IMPORT_STATUSES = ('pending', 'approved')
+
+# Column limits, matching the items table
+MAX_LENGTHS = {
+    'title': 100,
+    'category': 50,
+    'size': 20,
+    'condition': 20,
+    'tags': 255
+}
+
+REQUIRED_COLUMNS = ('title', 'description', 'category', 'size', 'condition')
+
+# Per-row errors kept in the report; the failed count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+# Raised while reading a corrupt, truncated or unsupported archive member
+ARCHIVE_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError)
+
+class RowError(ValueError):
+    """Raised when an import row is invalid"""
+
+class ReadError(RowError):
+    """The rest of the items file cannot be read, e.g. invalid UTF-8 in a CSV"""
+
+class ImportReport:
+    """Progress and outcome of a bulk import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.error = None
+        self.started = time.perf_counter()
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'message': message})
+
+    def to_dict(self):
+        """Convert report to dictionary"""
+        elapsed = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'error': self.error,
+            'elapsed_seconds': round(elapsed, 3),
+            'items_per_second': round(self.imported / elapsed, 1) if elapsed else 0.0
+        }
+
+def detect_format(filename):
+    """
+    Guess the import format from a file name.
+
+    Args:
+        filename (str): Name of the uploaded or local file
+
+    Returns:
+        str: 'csv' or 'ndjson', or None if unknown
+    """
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    return None
+
+def iter_rows(stream, fmt):
+    """
+    Stream rows from a binary CSV or NDJSON file without reading it whole.
+
+    NDJSON lines are decoded one at a time, so a line that is not UTF-8
+    only fails that row. A CSV record can span lines, so after invalid
+    UTF-8 or a malformed record the rest of the file cannot be read; a
+    ReadError ends the rows.
+
+    Args:
+        stream: Binary file object
+        fmt (str): 'csv' or 'ndjson'
+
+    Yields:
+        tuple: (row number, dict) or (row number, RowError) for unparsable rows
+    """
+    if fmt == 'csv':
+        # Decoded line by line, so rows before an invalid line are still read
+        def lines():
+            for line_number, raw in enumerate(stream, start=1):
+                yield raw.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+
+        row_number = 0
+        try:
+            for row_number, row in enumerate(csv.DictReader(lines()), start=1):
+                yield row_number, row
+        except (UnicodeDecodeError, csv.Error) as e:
+            yield row_number + 1, ReadError(f"Could not read the file after row {row_number}: {e}")
+        return
+
+    for row_number, raw in enumerate(stream, start=1):
+        try:
+            line = raw.decode('utf-8-sig' if row_number == 1 else 'utf-8')
+        except UnicodeDecodeError as e:
+            yield row_number, RowError(f"Invalid UTF-8: {e}")
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, RowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield row_number, RowError('Each line must be a JSON object')
+            continue
+        yield row_number, row
+
+def _split_images(value):
+    """Image names come as a list in NDJSON and '|'-separated in CSV"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('|')
+    return [str(name).strip() for name in value if str(name).strip()]
+
+def validate_row(row, default_owner_id, default_status='approved'):
+    """
+    Validate an import row and turn it into column values.
+
+    Args:
+        row (dict): Parsed CSV or NDJSON row
+        default_owner_id (str): Owner for rows without an owner_id
+        default_status (str): Status for rows without a status
+
+    Returns:
+        tuple: (item values, list of image names)
+
+    Raises:
+        RowError: If the row is invalid
+    """
+    values = {}
+    for column in REQUIRED_COLUMNS:
+        value = row.get(column)
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            raise RowError(f"Missing required field: {column}")
+        values[column] = value
+
+    tags = row.get('tags')
+    if isinstance(tags, list):
+        tags = ', '.join(str(tag) for tag in tags)
+    values['tags'] = str(tags).strip() or None if tags else None
+
+    for column, max_length in MAX_LENGTHS.items():
+        if values[column] and len(values[column]) > max_length:
+            raise RowError(f"{column} must be at most {max_length} characters")
+
+    status = str(row.get('status') or default_status).strip()
+    if status not in IMPORT_STATUSES:
+        raise RowError(f"Invalid status. Must be one of: {', '.join(IMPORT_STATUSES)}")
+    values['status'] = status
+    values['owner_id'] = str(row.get('owner_id') or default_owner_id).strip()
+
+    images = _split_images(row.get('images'))
+    if not images:
+        raise RowError('At least one image is required')
+
+    return values, images
+
+class BulkImporter:
+    """
+    Import items in chunks. Each chunk is inserted with one multi-row
+    INSERT per table and committed in its own transaction, so a failing
+    chunk does not roll back earlier ones.
+    """
+
+    def __init__(self, app, owner_id, images_archive=None, batch_size=500,
+                 default_status='approved', progress=None):
+        """
+        Initialize the importer.
+
+        Args:
+            app: Flask application, used for config and change notifications
+            owner_id (str): Owner of rows without an owner_id column
+            images_archive (zipfile.ZipFile): Archive holding the row images
+            batch_size (int): Rows per transaction
+            default_status (str): Status of rows without a status column
+            progress (callable): Called with the report after every chunk
+        """
+        self.app = app
+        self.owner_id = owner_id
+        self.archive = images_archive
+        self.batch_size = max(batch_size, 1)
+        self.default_status = default_status
+        self.progress = progress
+        self.report = ImportReport()
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.allowed_extensions = app.config['ALLOWED_EXTENSIONS']
+        self._archive_names = set(images_archive.namelist()) if images_archive else set()
+
+    def run(self, rows):
+        """
+        Import all rows.
+
+        Args:
+            rows (iterable): (row number, dict or RowError) tuples from iter_rows()
+
+        Returns:
+            ImportReport: Counts, per-row errors and throughput
+        """
+        chunk = []
+        for row_number, row in rows:
+            self.report.rows += 1
+            if isinstance(row, ReadError):
+                # Rows read so far are still imported and reported
+                self.report.add_error(row_number, str(row))
+                self.report.error = str(row)
+                break
+            if isinstance(row, RowError):
+                self.report.add_error(row_number, str(row))
+                continue
+            try:
+                chunk.append((row_number,) + validate_row(row, self.owner_id, self.default_status))
+            except RowError as e:
+                self.report.add_error(row_number, str(e))
+                continue
+
+            if len(chunk) >= self.batch_size:
+                self._import_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            self._import_chunk(chunk)
+
+        return self.report
+
+    def _check_image(self, name):
+        if name not in self._archive_names:
+            raise RowError(f"Image not found in archive: {name}")
+        if '.' not in name or name.rsplit('.', 1)[1].lower() not in self.allowed_extensions:
+            raise RowError(f"Image type not allowed: {name}")
+
+    def _save_image(self, name):
+        """Stream one archive member into content-addressed storage"""
+        with self.archive.open(name) as source:
+            return store_stream(source, self.upload_folder, 'items', name.rsplit('.', 1)[1])
+
+    def _import_chunk(self, chunk):
+        # Owners are checked with one query per chunk
+        owner_ids = {values['owner_id'] for _, values, _ in chunk}
+        known_owners = set(db.session.execute(
+            select(User.id).where(User.id.in_(owner_ids))
+        ).scalars())
+
+        now = datetime.utcnow()
+        item_rows = []
+        image_rows = []
+        row_numbers = []
+        stored = []
+        for row_number, values, images in chunk:
+            try:
+                if values['owner_id'] not in known_owners:
+                    raise RowError(f"Unknown owner_id: {values['owner_id']}")
+                for name in images:
+                    self._check_image(name)
+            except RowError as e:
+                self.report.add_error(row_number, str(e))
+                continue
+
+            row_stored = []
+            try:
+                for name in images:
+                    try:
+                        row_stored.append(self._save_image(name))
+                    except ARCHIVE_ERRORS as e:
+                        raise RowError(f"Could not read image {name}: {str(e)}")
+            except RowError as e:
+                discard_uploads(self.upload_folder, row_stored)
+                self.report.add_error(row_number, str(e))
+                continue
+
+            item_id = str(uuid.uuid4())
+            row_numbers.append(row_number)
+            item_rows.append(dict(values, id=item_id, is_featured=False, created_at=now, updated_at=now))
+            stored.extend(row_stored)
+            for index, upload in enumerate(row_stored):
+                image_rows.append({
+                    'id': str(uuid.uuid4()),
+                    'item_id': item_id,
+                    'file_path': upload.path,
+                    'is_primary': index == 0,  # First image is primary
+                    'created_at': now
+                })
+
+        if not item_rows:
+            return
+
+        try:
+            db.session.execute(insert(Item.__table__), item_rows)
+            db.session.execute(insert(ItemImage.__table__), image_rows)
+            add_references(stored)
+            set_items_tags({row['id']: row['tags'] for row in item_rows})
+
+            # Core inserts bypass the flush listener that maintains facet counts
+            apply_facet_deltas(db.session.connection(), facet_deltas(
+                (row['category'], row['size'], row['condition'], 1)
+                for row in item_rows if row['status'] == 'approved'
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Files only this chunk referenced are removed, shared ones are kept
+            discard_uploads(self.upload_folder, stored)
+            logger.error(f"Bulk import chunk failed: {str(e)}")
+            for row_number in row_numbers:
+                self.report.add_error(row_number, 'Database error while importing chunk')
+            return
+
+        self.report.imported += len(item_rows)
+
+        # Receivers only read column attributes, so transient items are enough
+        notify_items_changed(self.app, *(Item(**row) for row in item_rows))
+        for row in item_rows:
+            derivative_pipeline.submit(self.app, process_item_images, row['id'])
+
+        if self.progress:
+            self.progress(self.report)
+
+def import_items(app, stream, fmt, owner_id, images_archive=None, batch_size=500,
+                 default_status='approved', progress=None):
+    """
+    Import items from a CSV or NDJSON stream.
+    Must be called inside an application context.
+
+    Columns: title, description, category, size, condition, tags, images,
+    and optionally status and owner_id. images names files in the archive,
+    '|'-separated in CSV or as a list in NDJSON; the first is primary.
+
+    Args:
+        app: Flask application
+        stream: Binary file object with the rows
+        fmt (str): 'csv' or 'ndjson'
+        owner_id (str): Owner of rows without an owner_id column
+        images_archive: Path or binary file object of a zip archive with the images
+        batch_size (int): Rows per transaction
+        default_status (str): Status of rows without a status column
+        progress (callable): Called with the report after every chunk
+
+    Returns:
+        dict: Import report
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    archive = zipfile.ZipFile(images_archive) if images_archive is not None else None
+    try:
+        importer = BulkImporter(
+            app, owner_id, images_archive=archive, batch_size=batch_size,
+            default_status=default_status, progress=progress
+        )
+        report = importer.run(iter_rows(stream, fmt))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    result = report.to_dict()
+    logger.info(
+        f"Bulk import finished: {result['imported']} imported, {result['failed']} failed "
+        f"({result['items_per_second']} items/s)"
+    )
+    return result
@@ -0,0 +1,209 @@
+# File: rewear/server/utils/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key so that only one caller
+    does the work and the others wait for its result.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for an in-flight call for the same key.
+
+        Args:
+            key: Hashable key identifying the work
+            fn (callable): Function producing the result
+
+        Returns:
+            tuple: (result, shared) where shared is True if another caller did the work
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class QueryCache:
+    """
+    Thread-safe in-process cache for query results with TTL expiry,
+    LRU eviction, stampede protection and hit/miss counters.
+
+    Each process keeps its own copy, so with several workers an
+    invalidation only reaches the worker that handled the write; the
+    TTL bounds how stale the other workers can get.
+    """
+
+    def __init__(self, max_entries=512, ttl=30, enabled=True):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of cached results
+            ttl (float): Seconds a result stays fresh
+            enabled (bool): When False every lookup computes the result
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._flight = SingleFlight()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(name, **params):
+        """
+        Build a cache key from a name and normalized query parameters.
+        Parameters that are None are left out, and strings are
+        lowercased with whitespace collapsed.
+
+        Args:
+            name (str): Name of the cached query
+            params: Query parameters
+
+        Returns:
+            tuple: Hashable cache key
+        """
+        normalized = []
+        for param, value in sorted(params.items()):
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = ' '.join(value.lower().split())
+            normalized.append((param, value))
+        return (name, tuple(normalized))
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, computing it on a miss.
+        Concurrent misses for the same key run compute() only once.
+
+        Args:
+            key: Cache key, see make_key()
+            compute (callable): Function producing the result
+
+        Returns:
+            object: Cached or freshly computed result
+        """
+        if not self.enabled:
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            generation = self._generation
+
+        def load():
+            value = compute()
+            with self._lock:
+                # Results computed before an invalidation may already be stale
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._evictions += 1
+            return value
+
+        value, shared = self._flight.do((generation, key), load)
+        if shared:
+            with self._lock:
+                self._coalesced += 1
+        return value
+
+    def invalidate(self):
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidations += 1
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Entry count, hits, misses, hit ratio, evictions and invalidations
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations
+            }
+
+
+# Cache for public catalog listings, configured by init_catalog_cache()
+catalog_cache = QueryCache(enabled=False)
+
+def _on_items_changed(sender, items=(), **extra):
+    catalog_cache.invalidate()
+
+def init_catalog_cache(app):
+    """
+    Configure the catalog cache from the app config and invalidate it
+    whenever items change.
+
+    Args:
+        app: Flask application
+    """
+    from utils.events import items_changed
+
+    catalog_cache.max_entries = app.config.get('CATALOG_CACHE_MAX_ENTRIES', 512)
+    catalog_cache.ttl = app.config.get('CATALOG_CACHE_TTL', 30)
+    catalog_cache.enabled = app.config.get('CATALOG_CACHE_ENABLED', True)
+    catalog_cache.invalidate()
+
+    items_changed.connect(_on_items_changed, weak=False)
@@ -0,0 +1,332 @@
+# File: rewear/server/utils/colors.py
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy import select, delete, insert
+from config.database import db
+from models.item import Item, ItemImage
+from models.color import item_colors
+from models.catalog_image_hash import CatalogImageHash
+from utils.image_hash import upload_file, hash_catalog_images
+from utils.static_files import CATALOG_FOLDER
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Named colours that images are mapped to, with a representative sRGB value
+PALETTE = (
+    ('black', '#1a1a1a'),
+    ('white', '#f5f5f5'),
+    ('grey', '#8c8c8c'),
+    ('navy', '#1f2a4d'),
+    ('blue', '#2f6fd0'),
+    ('red', '#c62828'),
+    ('pink', '#f06292'),
+    ('orange', '#f57c00'),
+    ('yellow', '#fbc02d'),
+    ('green', '#388e3c'),
+    ('purple', '#7b1fa2'),
+    ('brown', '#6d4c41'),
+    ('beige', '#e0d2b4'),
+    ('tan', '#c19a6b')
+)
+
+COLOR_NAMES = tuple(name for name, _ in PALETTE)
+
+COLOR_ALIASES = {'gray': 'grey'}
+
+# Side of the thumbnail the colours are computed from
+SAMPLE_SIZE = 64
+
+# Levels per channel of the stored RGB histogram (4 -> 64 bins)
+HISTOGRAM_LEVELS = 4
+
+# Colours below this share of the foreground are not reported
+MIN_COLOR_FRACTION = 0.05
+
+# Colours below this share of the primary image are not searchable
+MIN_ITEM_COLOR_FRACTION = 0.15
+
+# CIE76 distance under which a pixel counts as background
+BACKGROUND_DISTANCE = 12.0
+
+_HEX_COLOR = re.compile(r'^#?([0-9a-f]{6}|[0-9a-f]{3})$')
+
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041]
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+def _hex_to_rgb(value):
+    value = value.lstrip('#')
+    if len(value) == 3:
+        value = ''.join(digit * 2 for digit in value)
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+def to_lab(rgb):
+    """
+    Convert sRGB colours to CIELAB.
+
+    Args:
+        rgb (ndarray): (N, 3) array of 0-255 values
+
+    Returns:
+        ndarray: (N, 3) float array of L, a, b
+    """
+    linear = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(linear > 0.04045, ((linear + 0.055) / 1.055) ** 2.4, linear / 12.92)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _D65_WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([
+        116 * f[:, 1] - 16,
+        500 * (f[:, 0] - f[:, 1]),
+        200 * (f[:, 1] - f[:, 2])
+    ], axis=1)
+
+_PALETTE_LAB = to_lab([_hex_to_rgb(hex_value) for _, hex_value in PALETTE])
+
+def nearest_color(value):
+    """
+    Map a colour name or hex code to the nearest palette colour.
+
+    Args:
+        value (str): Palette name (e.g. 'navy', 'gray') or hex code (e.g. '#1b2a4a')
+
+    Returns:
+        str: Palette colour name, or None if value is not a colour
+    """
+    value = value.strip().lower()
+    value = COLOR_ALIASES.get(value, value)
+    if value in COLOR_NAMES:
+        return value
+
+    match = _HEX_COLOR.match(value)
+    if not match:
+        return None
+    lab = to_lab([_hex_to_rgb(match.group(1))])
+    distances = ((_PALETTE_LAB - lab) ** 2).sum(axis=1)
+    return COLOR_NAMES[int(distances.argmin())]
+
+def _foreground(rgb, lab, border):
+    """
+    Drop the pixels of a plain background: if most of the border has
+    one colour, pixels close to that colour are left out, unless that
+    would leave almost nothing.
+    """
+    border_lab = lab[border]
+    background = np.median(border_lab, axis=0)
+    near = ((lab - background) ** 2).sum(axis=1) <= BACKGROUND_DISTANCE ** 2
+    if near[border].mean() < 0.6 or near.mean() > 0.9:
+        return rgb, lab
+    return rgb[~near], lab[~near]
+
+def analyze_colors(path, top=3):
+    """
+    Compute the dominant palette colours and a compact RGB histogram of
+    an image. Transparent pixels and a plain studio background are
+    ignored.
+
+    Args:
+        path (str): Image file
+        top (int): Maximum number of dominant colours
+
+    Returns:
+        dict: 'colors', a list of {'name', 'hex', 'fraction'} largest first,
+            and 'histogram', HISTOGRAM_LEVELS**3 bins in per mille
+    """
+    with Image.open(path) as image:
+        image.draft('RGB', (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+        image = ImageOps.exif_transpose(image).convert('RGBA')
+        image.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR)
+        pixels = np.asarray(image)
+
+    height, width = pixels.shape[:2]
+    border = np.zeros((height, width), dtype=bool)
+    border[[0, -1], :] = True
+    border[:, [0, -1]] = True
+
+    opaque = pixels[..., 3] >= 128
+    rgb = pixels[..., :3][opaque]
+    border = border[opaque]
+    if not len(rgb):
+        return {'colors': [], 'histogram': [0] * HISTOGRAM_LEVELS ** 3}
+
+    lab = to_lab(rgb)
+    if border.any():
+        rgb, lab = _foreground(rgb, lab, border)
+
+    # Nearest palette colour of every pixel at once
+    distances = ((lab[:, np.newaxis, :] - _PALETTE_LAB[np.newaxis, :, :]) ** 2).sum(axis=2)
+    shares = np.bincount(distances.argmin(axis=1), minlength=len(PALETTE)) / len(lab)
+    colors = [
+        {'name': PALETTE[index][0], 'hex': PALETTE[index][1], 'fraction': round(float(shares[index]), 3)}
+        for index in np.argsort(-shares, kind='stable')[:top]
+        if shares[index] >= MIN_COLOR_FRACTION
+    ]
+
+    levels = (rgb.astype(np.int32) * HISTOGRAM_LEVELS) // 256
+    bins = (levels[:, 0] * HISTOGRAM_LEVELS + levels[:, 1]) * HISTOGRAM_LEVELS + levels[:, 2]
+    histogram = np.bincount(bins, minlength=HISTOGRAM_LEVELS ** 3) * 1000 // len(rgb)
+
+    return {'colors': colors, 'histogram': histogram.tolist()}
+
+def analyze_files(paths, max_workers=4):
+    """
+    Analyze image files concurrently.
+
+    Args:
+        paths (list): Image files
+        max_workers (int): Worker threads
+
+    Returns:
+        list: analyze_colors() result of each file, or None where the file could not be read
+    """
+    def safe_analyze(path):
+        try:
+            return analyze_colors(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not analyze colours of {path}: {str(e)}")
+            return None
+
+    if max_workers <= 1 or len(paths) <= 1:
+        return [safe_analyze(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-colors') as executor:
+        return list(executor.map(safe_analyze, paths))
+
+def set_item_colors(item_id, colors):
+    """
+    Replace the searchable colours of an item in the current transaction.
+
+    Args:
+        item_id (str): Item ID
+        colors (list): Colours of the item's primary image, from analyze_colors()
+    """
+    db.session.execute(delete(item_colors).where(item_colors.c.item_id == item_id))
+
+    rows = [
+        {'item_id': item_id, 'color': color['name'], 'weight': int(round(color['fraction'] * 1000))}
+        for color in colors or ()
+        if color['fraction'] >= MIN_ITEM_COLOR_FRACTION
+    ]
+    if rows:
+        db.session.execute(insert(item_colors), rows)
+
+def filter_by_color(query, color):
+    """
+    Restrict an Item query to items showing a palette colour.
+    Uses the item_colors (color, item_id) index.
+
+    Args:
+        query: SQLAlchemy query over Item
+        color (str): Palette colour name, see nearest_color()
+
+    Returns:
+        query: Filtered query
+    """
+    return query.filter(Item.id.in_(
+        select(item_colors.c.item_id).where(item_colors.c.color == color)
+    ))
+
+def analyze_item_images(upload_folder, batch_size=200, max_workers=4):
+    """
+    Analyze item images that have no colours yet and refresh the
+    searchable colours of their items.
+    Must be called inside an application context.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        batch_size (int): Images per transaction
+        max_workers (int): Worker threads
+
+    Returns:
+        int: Number of images analyzed
+    """
+    analyzed = 0
+    last_id = ''
+    while True:
+        images = ItemImage.query.filter(
+            ItemImage.colors.is_(None), ItemImage.id > last_id
+        ).order_by(ItemImage.id).limit(batch_size).all()
+        if not images:
+            break
+        last_id = images[-1].id
+
+        results = analyze_files([upload_file(upload_folder, image.file_path) for image in images], max_workers)
+        for image, result in zip(images, results):
+            if result is None:
+                continue
+            image.colors = result['colors']
+            image.color_histogram = result['histogram']
+            if image.is_primary:
+                set_item_colors(image.item_id, result['colors'])
+            analyzed += 1
+        db.session.commit()
+
+    logger.info(f"Analyzed colours of {analyzed} item images")
+    return analyzed
+
+def analyze_catalog_images(upload_folder, batch_size=200, max_workers=4):
+    """
+    Analyze catalog images that have no colours yet. The catalog folder
+    is hashed first, see hash_catalog_images(), so every image has a row
+    and changed files, whose colours are cleared, are analyzed again.
+    Must be called inside an application context.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        batch_size (int): Images per transaction
+        max_workers (int): Worker threads
+
+    Returns:
+        int: Number of images analyzed
+    """
+    hash_catalog_images(upload_folder, max_workers=max_workers)
+
+    analyzed = 0
+    last_path = ''
+    while True:
+        rows = CatalogImageHash.query.filter(
+            CatalogImageHash.colors.is_(None), CatalogImageHash.path > last_path
+        ).order_by(CatalogImageHash.path).limit(batch_size).all()
+        if not rows:
+            break
+        last_path = rows[-1].path
+
+        results = analyze_files([os.path.join(upload_folder, row.path) for row in rows], max_workers)
+        for row, result in zip(rows, results):
+            if result is None:
+                continue
+            row.colors = result['colors']
+            row.dominant_color = result['colors'][0]['name'] if result['colors'] else None
+            analyzed += 1
+        db.session.commit()
+
+    logger.info(f"Analyzed colours of {analyzed} catalog images")
+    return analyzed
+
+def catalog_filenames_by_color(category_path, color):
+    """
+    Filenames of the images directly in a catalog category whose dominant
+    colour is a palette colour. Uses the dominant_color index; images not
+    analyzed yet never match.
+    Must be called inside an application context.
+
+    Args:
+        category_path (str): Path to the category, e.g. Men/T-Shirts
+        color (str): Palette colour name, see nearest_color()
+
+    Returns:
+        set: Filenames, to pass to ImageProcessor.find_images()
+    """
+    prefix = f"{CATALOG_FOLDER}/{category_path.strip('/')}/"
+    rows = db.session.query(CatalogImageHash.path).filter(
+        CatalogImageHash.dominant_color == color,
+        CatalogImageHash.path.startswith(prefix, autoescape=True)
+    )
+    filenames = (path[len(prefix):] for (path,) in rows)
+    return {filename for filename in filenames if '/' not in filename}
@@ -0,0 +1,314 @@
+# File: rewear/server/utils/derivatives.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from PIL import Image, ImageOps
+from config.database import db
+from models.user import User
+from models.item import Item, ItemImage
+from utils.events import notify_items_changed
+from utils.image_hash import dhash, format_hash, parse_hash, upload_file, duplicate_index
+from utils.colors import analyze_colors, set_item_colors
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each derivative, largest first
+DERIVATIVE_SIZES = (
+    ('detail', 1280),
+    ('card', 480),
+    ('thumb', 160)
+)
+
+# Profile pictures are never shown large
+PROFILE_DERIVATIVE_SIZES = (
+    ('card', 480),
+    ('thumb', 160)
+)
+
+# Output formats with their Pillow save options
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True})
+)
+
+# Seconds of completed jobs used for the throughput metric
+THROUGHPUT_WINDOW = 60
+
+def to_rgb(image):
+    """Flatten transparency onto white so the image can be saved as JPEG"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def generate_derivatives(upload_folder, file_path, sizes=DERIVATIVE_SIZES):
+    """
+    Write resized WebP and JPEG copies of an uploaded image.
+
+    The EXIF orientation is applied to the pixels and no metadata (EXIF,
+    GPS, camera details) is written to the derivatives.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        file_path (str): URL path of the original, e.g. /uploads/items/<name>.jpg
+        sizes (tuple): (name, longest edge) pairs, largest first
+
+    Returns:
+        dict: Size name -> {'width', 'height', 'webp', 'jpeg'} with URL paths
+    """
+    relative = file_path.split('/uploads/', 1)[-1].lstrip('/')
+    stem = os.path.splitext(relative)[0]
+    output_dir = os.path.join(upload_folder, 'derivatives', stem)
+    os.makedirs(output_dir, exist_ok=True)
+
+    derivatives = {}
+    with Image.open(os.path.join(upload_folder, relative)) as original:
+        # Let the JPEG decoder downscale while decoding large photos
+        largest = sizes[0][1]
+        original.draft('RGB', (largest, largest))
+        image = to_rgb(ImageOps.exif_transpose(original))
+
+    for name, edge in sizes:
+        # Each size is resized from the previous, larger one
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        entry = {'width': image.width, 'height': image.height}
+        for ext, fmt, options in DERIVATIVE_FORMATS:
+            filename = f"{name}.{ext}"
+            image.save(os.path.join(output_dir, filename), fmt, **options)
+            entry[ext] = f"/uploads/derivatives/{stem}/{filename}"
+        derivatives[name] = entry
+
+    return derivatives
+
+class DerivativePipeline:
+    """
+    Worker pool that creates image derivatives after the upload request
+    has returned, with queue depth and throughput counters.
+    """
+
+    def __init__(self, max_workers=2, enabled=True):
+        """
+        Initialize the pipeline.
+
+        Args:
+            max_workers (int): Number of worker threads
+            enabled (bool): When False submitted jobs are dropped
+        """
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self._executor = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._images = 0
+        self._peak_depth = 0
+        self._busy_seconds = 0.0
+        self._recent = deque()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='derivatives'
+                )
+            return self._executor
+
+    def submit(self, app, fn, *args):
+        """
+        Queue fn(*args) to run in a worker inside an application context.
+
+        Args:
+            app: Flask application
+            fn (callable): Job returning the number of images processed
+            args: Arguments for fn
+
+        Returns:
+            Future: The queued job, or None if the pipeline is disabled
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._submitted += 1
+            depth = self._submitted - self._completed - self._failed
+            self._peak_depth = max(self._peak_depth, depth)
+
+        return self._get_executor().submit(self._run, app, fn, *args)
+
+    def _run(self, app, fn, *args):
+        started = time.monotonic()
+        images = 0
+        failed = False
+        try:
+            with app.app_context():
+                try:
+                    images = fn(*args) or 0
+                except Exception as e:
+                    db.session.rollback()
+                    failed = True
+                    logger.error(f"Image derivative job {fn.__name__}{args} failed: {str(e)}")
+                finally:
+                    db.session.remove()
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._images += images
+                self._busy_seconds += finished - started
+                self._recent.append(finished)
+                while self._recent and self._recent[0] < finished - THROUGHPUT_WINDOW:
+                    self._recent.popleft()
+
+    def stats(self):
+        """
+        Report pipeline counters.
+
+        Returns:
+            dict: Queue depth, job counts, throughput and average job time
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+            finished = self._completed + self._failed
+            return {
+                'enabled': self.enabled,
+                'workers': self.max_workers,
+                'queue_depth': self._submitted - finished,
+                'peak_queue_depth': self._peak_depth,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'images_processed': self._images,
+                'jobs_per_second': len(self._recent) / THROUGHPUT_WINDOW,
+                'avg_job_seconds': self._busy_seconds / finished if finished else 0.0
+            }
+
+    def wait(self):
+        """Wait for queued jobs to finish and stop the workers."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Pipeline used by the upload endpoints, configured by init_derivative_pipeline()
+derivative_pipeline = DerivativePipeline(enabled=False)
+
+def process_item_images(item_id):
+    """
+    Create derivatives for every image of an item that has none yet,
+    then bump the item's updated_at so cached listings and ETags refresh.
+    Images without a perceptual hash are hashed for duplicate detection,
+    and images without colours are analyzed for colour search.
+    Must be called inside an application context.
+
+    Args:
+        item_id (str): Item ID
+
+    Returns:
+        int: Number of images processed
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    processed = 0
+    hashed = []
+    colored = False
+    for image in ItemImage.query.filter_by(item_id=item_id).all():
+        if image.phash is None:
+            try:
+                image.phash = format_hash(dhash(upload_file(upload_folder, image.file_path)))
+                hashed.append(image)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not hash image {image.id}: {str(e)}")
+
+        if image.colors is None:
+            try:
+                result = analyze_colors(upload_file(upload_folder, image.file_path))
+                image.colors = result['colors']
+                image.color_histogram = result['histogram']
+                if image.is_primary:
+                    set_item_colors(item_id, result['colors'])
+                colored = True
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not analyze colours of image {image.id}: {str(e)}")
+
+        if image.derivatives:
+            continue
+
+        # Deduplicated uploads share their derivatives
+        existing = ItemImage.query.filter(
+            ItemImage.file_path == image.file_path,
+            ItemImage.derivatives.isnot(None)
+        ).first()
+        try:
+            if existing:
+                image.derivatives = existing.derivatives
+            else:
+                image.derivatives = generate_derivatives(upload_folder, image.file_path)
+            processed += 1
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not create derivatives for image {image.id}: {str(e)}")
+
+    if not processed and not hashed and not colored:
+        return 0
+
+    item = db.session.get(Item, item_id)
+    if item is None:
+        db.session.rollback()
+        return 0
+    if processed or colored:
+        item.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    if current_app.config.get('DUPLICATE_INDEX_ENABLED'):
+        for image in hashed:
+            duplicate_index.add('item', image.id, parse_hash(image.phash))
+    if processed or colored:
+        notify_items_changed(current_app._get_current_object(), item)
+    return processed
+
+def process_profile_image(user_id, file_path):
+    """
+    Create derivatives for a user's profile image.
+    Must be called inside an application context.
+
+    Args:
+        user_id (str): User ID
+        file_path (str): Profile image the job was queued for
+
+    Returns:
+        int: Number of images processed
+    """
+    # Skip if the user uploaded another image in the meantime
+    user = db.session.get(User, user_id)
+    if user is None or user.profile_image != file_path:
+        return 0
+
+    user.profile_image_derivatives = generate_derivatives(
+        current_app.config['UPLOAD_FOLDER'], file_path, sizes=PROFILE_DERIVATIVE_SIZES
+    )
+    db.session.commit()
+    return 1
+
+def init_derivative_pipeline(app):
+    """
+    Configure the derivative pipeline from the app config.
+
+    Args:
+        app: Flask application
+    """
+    derivative_pipeline.max_workers = app.config.get('IMAGE_PIPELINE_WORKERS', 2)
+    derivative_pipeline.enabled = app.config.get('IMAGE_PIPELINE_ENABLED', True)
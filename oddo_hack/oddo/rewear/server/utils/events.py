@@ -0,0 +1,20 @@
+# File: rewear/server/utils/events.py
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after a commit that may change which items are publicly visible
+# (created, approved/rejected, featured, swapped).
+# Receivers get the Flask app as sender and the changed Item objects as 'items'.
+items_changed = _signals.signal('items-changed')
+
+def notify_items_changed(app, *items):
+    """
+    Notify receivers that the given items were changed and committed.
+
+    Args:
+        app: Flask application sending the signal
+        items: Item objects that changed
+    """
+    items_changed.send(app, items=[item for item in items if item is not None])
@@ -0,0 +1,109 @@
+# File: rewear/server/utils/export.py
+
+import csv
+import io
+import json
+from sqlalchemy import select
+from config.database import db
+from models.user import User
+from models.item import Item
+from models.swap import Swap
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# Exported columns per table; password hashes are never exported
+EXPORT_TABLES = {
+    'items': (Item, (
+        'id', 'title', 'description', 'category', 'size', 'condition', 'tags',
+        'status', 'is_featured', 'owner_id', 'created_at', 'updated_at'
+    )),
+    'users': (User, (
+        'id', 'username', 'email', 'gender', 'profile_image', 'city', 'address',
+        'bio', 'swap_preference', 'status', 'role', 'created_at', 'updated_at'
+    )),
+    'swaps': (Swap, (
+        'id', 'requester_id', 'provider_id', 'requester_item_id', 'provider_item_id',
+        'status', 'created_at', 'updated_at'
+    ))
+}
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def _csv_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def _iter_partitions(table, status=None, batch_size=1000):
+    """Yield lists of row tuples from a server-side cursor"""
+    model, columns = EXPORT_TABLES[table]
+    stmt = select(*(getattr(model, column) for column in columns))
+    if status:
+        stmt = stmt.where(model.status == status)
+
+    # stream_results keeps rows on the server, yield_per bounds the client buffer
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def export_rows(table, fmt, status=None, batch_size=1000):
+    """
+    Stream a table as NDJSON or CSV text chunks, one chunk per batch of rows.
+    Memory use does not depend on the size of the table.
+    Must be iterated inside an application context.
+
+    Args:
+        table (str): One of EXPORT_TABLES
+        fmt (str): 'ndjson' or 'csv'
+        status (str): Only export rows with this status
+        batch_size (int): Rows fetched per round trip and per chunk
+
+    Yields:
+        str: Encoded rows
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    columns = EXPORT_TABLES[table][1]
+    exported = 0
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+
+        for partition in _iter_partitions(table, status, batch_size):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in partition)
+            exported += len(partition)
+            yield buffer.getvalue()
+    else:
+        encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False)
+        for partition in _iter_partitions(table, status, batch_size):
+            exported += len(partition)
+            yield ''.join(
+                encoder.encode(dict(zip(columns, row))) + '\n'
+                for row in partition
+            )
+
+    logger.info(f"Exported {exported} rows from {table} as {fmt}")
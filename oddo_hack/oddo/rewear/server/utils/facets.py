@@ -0,0 +1,218 @@
+# File: rewear/server/utils/facets.py
+
+from collections import Counter
+from sqlalchemy import event, func, update, insert, delete, inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
+from config.database import db
+from models.item import Item
+from models.facet_count import FacetCount
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Item columns exposed as catalog facets
+FACETS = ('category', 'size', 'condition')
+
+# live: grouped query over items, materialized: item_facet_counts table
+FACET_MODES = ('live', 'materialized')
+
+def _group_counts(rows):
+    """Turn (facet, value, count) rows into the facets response structure"""
+    facets = {facet: [] for facet in FACETS}
+    for facet, value, count in rows:
+        if count > 0:
+            facets[facet].append({'value': value, 'count': count})
+    for values in facets.values():
+        values.sort(key=lambda entry: (-entry['count'], entry['value']))
+    return facets
+
+def compute_facets(query):
+    """
+    Count approved items per category, size and condition with a single
+    grouped query.
+
+    Args:
+        query: Filtered Item query
+
+    Returns:
+        dict: Facet name -> list of {'value', 'count'}, plus 'total'
+    """
+    rows = query.with_entities(
+        Item.category, Item.size, Item.condition, func.count()
+    ).group_by(Item.category, Item.size, Item.condition).order_by(None).all()
+
+    totals = {facet: Counter() for facet in FACETS}
+    total = 0
+    for category, size, condition, count in rows:
+        totals['category'][category] += count
+        totals['size'][size] += count
+        totals['condition'][condition] += count
+        total += count
+
+    facets = _group_counts(
+        (facet, value, count)
+        for facet, counter in totals.items()
+        for value, count in counter.items()
+    )
+    facets['total'] = total
+    return facets
+
+def materialized_facets():
+    """
+    Read the facet counts maintained in item_facet_counts.
+
+    Returns:
+        dict: Facet name -> list of {'value', 'count'}, plus 'total'
+    """
+    rows = db.session.query(FacetCount.facet, FacetCount.value, FacetCount.count).all()
+    facets = _group_counts(rows)
+    facets['total'] = sum(entry['count'] for entry in facets['category'])
+    return facets
+
+def facet_deltas(changes):
+    """
+    Compute counter changes for items entering or leaving the catalog.
+
+    Args:
+        changes (iterable): (category, size, condition, delta) tuples
+
+    Returns:
+        Counter: (facet, value) -> change in count
+    """
+    deltas = Counter()
+    for category, size, condition, delta in changes:
+        for facet, value in zip(FACETS, (category, size, condition)):
+            deltas[(facet, value)] += delta
+    return deltas
+
+def apply_facet_deltas(connection, deltas):
+    """
+    Apply counter changes to item_facet_counts on the given connection,
+    inside the caller's transaction. Counters are upserted, so two
+    transactions creating the same counter do not conflict.
+
+    Args:
+        connection: SQLAlchemy connection
+        deltas (Counter): (facet, value) -> change in count
+    """
+    table = FacetCount.__table__
+    for (facet, value), delta in sorted(deltas.items()):
+        if not delta or value is None:
+            continue
+        if connection.dialect.name == 'mysql':
+            statement = mysql_insert(table).values(facet=facet, value=value, count=delta)
+            connection.execute(statement.on_duplicate_key_update(count=table.c.count + delta))
+        else:
+            _update_or_insert(connection, table, facet, value, delta)
+
+def _update_or_insert(connection, table, facet, value, delta):
+    """Portable upsert: the insert runs in a savepoint and a lost race retries the update"""
+    increment = (
+        update(table)
+        .where(table.c.facet == facet, table.c.value == value)
+        .values(count=table.c.count + delta)
+    )
+    if connection.execute(increment).rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(table).values(facet=facet, value=value, count=delta))
+    except IntegrityError:
+        # Created by a concurrent transaction since the update
+        connection.execute(increment)
+
+def _committed_values(item):
+    """Get the status and facet values of an item before its pending changes"""
+    state = inspect(item)
+    values = {}
+    for attr in ('status',) + FACETS:
+        history = state.attrs[attr].history
+        values[attr] = history.deleted[0] if history.deleted else getattr(item, attr)
+    return values
+
+def _catalog_changes(old, new):
+    """
+    Get the counter changes for an item moving from old to new values.
+
+    Args:
+        old (dict): Committed status and facet values, or None for new items
+        new (dict): Pending status and facet values, or None for deleted items
+
+    Returns:
+        list: (category, size, condition, delta) tuples
+    """
+    changes = []
+    if old == new:
+        return changes
+    if old and old['status'] == 'approved':
+        changes.append((old['category'], old['size'], old['condition'], -1))
+    if new and new['status'] == 'approved':
+        changes.append((new['category'], new['size'], new['condition'], 1))
+    return changes
+
+def _current_values(item):
+    """Get the status and facet values of an item including pending changes"""
+    return {attr: getattr(item, attr) for attr in ('status',) + FACETS}
+
+def _before_flush(session, flush_context, instances):
+    """Keep item_facet_counts in step with item changes in the same transaction"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Item):
+            changes.extend(_catalog_changes(None, _current_values(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Item) and session.is_modified(obj):
+            changes.extend(_catalog_changes(_committed_values(obj), _current_values(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            changes.extend(_catalog_changes(_committed_values(obj), None))
+
+    if changes:
+        apply_facet_deltas(session.connection(), facet_deltas(changes))
+
+def rebuild_facet_counts():
+    """
+    Recompute item_facet_counts from the items table.
+    Must be called inside an application context.
+
+    Returns:
+        dict: The recomputed facets
+    """
+    facets = compute_facets(Item.query.filter_by(status='approved'))
+    table = FacetCount.__table__
+
+    db.session.execute(delete(table))
+    rows = [
+        {'facet': facet, 'value': entry['value'], 'count': entry['count']}
+        for facet in FACETS
+        for entry in facets[facet]
+    ]
+    if rows:
+        db.session.execute(insert(table), rows)
+    db.session.commit()
+
+    logger.info(f"Facet counts rebuilt for {facets['total']} approved items")
+    return facets
+
+def init_facet_counts(app):
+    """
+    Maintain item_facet_counts on every flush that changes items, and
+    seed the counters from the items table when they are empty, e.g. on
+    a database created before the table existed.
+
+    Args:
+        app: Flask application
+    """
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+
+    with app.app_context():
+        if db.session.query(FacetCount.facet).first() is not None:
+            return
+        try:
+            rebuild_facet_counts()
+        except IntegrityError:
+            # Another worker seeded the counters at the same time
+            db.session.rollback()
+            logger.info("Facet counts were seeded by another process")
@@ -0,0 +1,198 @@
+# File: rewear/server/utils/filename_metadata.py
+
+import hashlib
+import json
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Terms looked for in catalog filenames, e.g.
+# "men-s-black-oversized-t-shirt-555522-1707221351-1.webp". Terms may be
+# several words, separated by spaces or hyphens. Fields are reported in
+# this order.
+DEFAULT_VOCABULARIES = {
+    'gender': ['men', 'women'],
+    'color': ['black', 'white', 'blue', 'red', 'green', 'yellow', 'purple',
+              'brown', 'grey', 'gray', 'pink', 'orange', 'beige', 'tan', 'navy'],
+    'fit': ['oversized', 'slim', 'regular', 'relaxed', 'loose', 'super loose'],
+    'product_type': ['t-shirt', 'shirt', 'joggers', 'pants', 'jeans', 'cargo',
+                     'boxer', 'watch', 'sunglasses', 'shoes', 'backpack']
+}
+
+# Fields only matched by the first word of a filename
+DEFAULT_LEADING_FIELDS = ('gender',)
+
+# Words that may follow a term and are then kept in the value,
+# e.g. "slim-fit" gives fit "slim fit"
+DEFAULT_SUFFIXES = {'fit': 'fit'}
+
+# Trailing words made of digits, e.g. "-555522-1707221351-1"
+_NUMERIC_TAIL = re.compile(r'(?:-[0-9]*)+$')
+
+class FilenameMetadataExtractor:
+    """
+    Extract gender, colour, fit and product type from catalog filenames.
+
+    The vocabularies are compiled once into a table from a term's first
+    word to the terms starting with it, longest first, so a filename is
+    matched in a single pass over its hyphen-separated words. For each
+    field the earliest term wins, and at the same word the longest one
+    ("t-shirt" over "shirt", "super loose" over "loose"). Results are
+    cached by filename without its trailing numbers.
+    """
+
+    def __init__(self, vocabularies=None, leading_fields=DEFAULT_LEADING_FIELDS, suffixes=DEFAULT_SUFFIXES,
+                 cache_size=65536):
+        """
+        Compile the vocabularies.
+
+        Args:
+            vocabularies (dict): Field name -> list of terms, defaults to DEFAULT_VOCABULARIES
+            leading_fields (tuple): Fields only matched at the first word
+            suffixes (dict): Field name -> word kept in the value when it follows a term
+            cache_size (int): Filename stems whose matches are kept
+        """
+        self.vocabularies = {
+            field: list(terms) for field, terms in (vocabularies or DEFAULT_VOCABULARIES).items()
+        }
+        self.leading_fields = tuple(leading_fields)
+        self.suffixes = dict(suffixes)
+        self.fields = tuple(self.vocabularies)
+        self.cache_size = cache_size
+        self._cache = {}
+
+        # First word -> ((following words, field index, value), ...)
+        table = {}
+        numeric_terms = False
+        for index, field in enumerate(self.fields):
+            suffix = self.suffixes.get(field)
+            for term in self.vocabularies[field]:
+                value = term.lower()
+                words = value.replace('-', ' ').split()
+                if not words:
+                    continue
+                table.setdefault(words[0], []).append((tuple(words[1:]), index, value))
+                if suffix:
+                    table[words[0]].append((tuple(words[1:]) + (suffix,), index, f"{value} {suffix}"))
+                numeric_terms = numeric_terms or any(re.fullmatch('[0-9]+', word) for word in words)
+
+        # Stable sort: of two terms spelling the same words, the first one wins
+        self._table = {
+            word: tuple(sorted(candidates, key=lambda candidate: -len(candidate[0])))
+            for word, candidates in table.items()
+        }
+        self._leading = tuple(field in self.leading_fields for field in self.fields)
+
+        # Trailing numbers can only be skipped if no term contains one
+        self._skip_numeric_tail = not numeric_terms
+
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [self.vocabularies, self.leading_fields, self.suffixes], sort_keys=True
+        ).encode('utf-8')).hexdigest()[:16]
+
+    def extract(self, filename):
+        """
+        Extract metadata from one filename.
+
+        Args:
+            filename (str): Name of the image file
+
+        Returns:
+            dict: 'original_name' and the fields found, in field order
+        """
+        # Same as os.path.splitext: leading dots do not start an extension
+        dot = filename.rfind('.')
+        if dot > len(filename) - len(filename.lstrip('.')):
+            name = filename[:dot].lower()
+        else:
+            name = filename.lower()
+
+        # Catalog names end in product ids and timestamps that never match
+        # a term, so names differing only there share one cache entry
+        key = name
+        if self._skip_numeric_tail:
+            tail = _NUMERIC_TAIL.search(name)
+            if tail:
+                key = name[:tail.start()]
+        fields = self._cache.get(key)
+        if fields is None:
+            fields = self._match(key.split('-'))
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = fields
+
+        metadata = {'original_name': filename}
+        metadata.update(fields)
+        return metadata
+
+    def _match(self, words):
+        """
+        Match the words of a filename against the compiled table.
+
+        Returns:
+            tuple: (field, value) pairs in field order
+        """
+        table = self._table
+        leading = self._leading
+        found = [None] * len(self.fields)
+        missing = len(found)
+
+        for position, word in enumerate(words):
+            candidates = table.get(word)
+            if candidates is None:
+                continue
+
+            for following, index, value in candidates:
+                if found[index] is not None or (position and leading[index]):
+                    continue
+                if following and tuple(words[position + 1:position + 1 + len(following)]) != following:
+                    continue
+                found[index] = value
+                missing -= 1
+            if not missing:
+                break
+
+        return tuple((field, value) for field, value in zip(self.fields, found) if value is not None)
+
+    def extract_batch(self, filenames):
+        """
+        Extract metadata from many filenames.
+
+        Args:
+            filenames (iterable): Names of image files
+
+        Returns:
+            list: extract() result of each filename, in order
+        """
+        extract = self.extract
+        return [extract(filename) for filename in filenames]
+
+
+_default_extractor = FilenameMetadataExtractor()
+
+def get_metadata_extractor():
+    """Get the extractor used by ImageProcessor, see init_metadata_extractor()"""
+    return _default_extractor
+
+def init_metadata_extractor(app):
+    """
+    Build the filename metadata extractor from the app config.
+    IMAGE_METADATA_VOCABULARY_FILE may name a JSON file mapping fields to
+    lists of terms; the fields it lists replace the default vocabularies
+    and new fields are added after them.
+
+    Args:
+        app: Flask application
+    """
+    global _default_extractor
+
+    path = app.config.get('IMAGE_METADATA_VOCABULARY_FILE')
+    if not path:
+        return
+
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+    vocabularies = dict(DEFAULT_VOCABULARIES, **overrides)
+    _default_extractor = FilenameMetadataExtractor(vocabularies)
+    logger.info(f"Loaded filename metadata vocabularies from {path}")
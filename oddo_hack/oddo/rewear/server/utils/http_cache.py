@@ -0,0 +1,85 @@
+# File: rewear/server/utils/http_cache.py
+
+import hashlib
+from flask import request, make_response
+
+def compute_etag(*parts):
+    """
+    Build a strong ETag value from ids and timestamps.
+
+    Args:
+        parts: Values identifying one version of a resource, e.g. ids
+            and updated_at timestamps (datetimes are rendered with isoformat)
+
+    Returns:
+        str: ETag value without quotes
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if hasattr(part, 'isoformat'):
+            part = part.isoformat()
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+def listing_etag(name, items, pagination=None):
+    """
+    Build an ETag for a serialized item listing.
+
+    Covers the ids and updated_at of every item, the owner details
+    embedded in each item, and the pagination block.
+
+    Args:
+        name (str): Name of the listing
+        items (list): Item dictionaries as returned by Item.to_dict()
+        pagination (dict): Pagination block of the response, if any
+
+    Returns:
+        str: ETag value without quotes
+    """
+    parts = [name]
+    for item in items:
+        parts.append(item['id'])
+        parts.append(item['updated_at'])
+        owner = item.get('owner')
+        if owner:
+            parts.extend((owner['id'], owner['username'], owner['profile_image'], owner['city']))
+    if pagination:
+        parts.extend(f"{key}={value}" for key, value in sorted(pagination.items()))
+    return compute_etag(*parts)
+
+def not_modified(etag, private=False):
+    """
+    Return a 304 response if the request's If-None-Match matches etag.
+
+    Args:
+        etag (str): Current ETag of the resource
+        private (bool): Whether the resource is specific to the current user
+
+    Returns:
+        Response: 304 response, or None if the client copy is stale
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = make_response('', 304)
+    return add_etag(response, etag, private=private)
+
+def add_etag(response, etag, private=False):
+    """
+    Attach an ETag and revalidation headers to a response.
+
+    Args:
+        response: Flask response
+        etag (str): ETag value
+        private (bool): Whether the resource is specific to the current user
+
+    Returns:
+        Response: The same response
+    """
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Authorization')
+    return response
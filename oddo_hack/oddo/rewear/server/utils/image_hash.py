@@ -0,0 +1,534 @@
+# File: rewear/server/utils/image_hash.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps
+from config.database import db
+from models.item import Item, ItemImage
+from models.catalog_image_hash import CatalogImageHash
+from utils.static_files import CATALOG_FOLDER
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Kinds of hashed images
+HASH_KINDS = ('item', 'catalog')
+
+# Largest Hamming radius accepted by queries
+MAX_RADIUS = 10
+
+# Number of set bits in every byte value
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def dhash(path):
+    """
+    Compute the 64-bit difference hash of an image: the image is shrunk
+    to 9x8 grey pixels and each bit tells whether a pixel is brighter
+    than its right neighbour. Re-encoded, resized or slightly edited
+    copies of a photo get hashes a few bits apart.
+
+    Args:
+        path (str): Image file
+
+    Returns:
+        int: Hash in [0, 2**64)
+    """
+    with Image.open(path) as image:
+        # Let the JPEG decoder downscale, the hash only needs 9x8 pixels
+        image.draft('L', (64, 64))
+        pixels = ImageOps.exif_transpose(image).convert('L').resize((9, 8), Image.LANCZOS)
+        pixels = np.asarray(pixels, dtype=np.int16)
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def format_hash(value):
+    """Render a hash as the 16-digit hex string stored in the database"""
+    return f"{value:016x}"
+
+def parse_hash(value):
+    """Parse a hash stored by format_hash()"""
+    return int(value, 16)
+
+def hash_files(paths, max_workers=4):
+    """
+    Hash image files concurrently; Pillow decodes outside the GIL.
+
+    Args:
+        paths (list): Image files
+        max_workers (int): Worker threads
+
+    Returns:
+        list: Hash of each file, or None where the file could not be read
+    """
+    def safe_hash(path):
+        try:
+            return dhash(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not hash image {path}: {str(e)}")
+            return None
+
+    if max_workers <= 1 or len(paths) <= 1:
+        return [safe_hash(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-hash') as executor:
+        return list(executor.map(safe_hash, paths))
+
+class DuplicateIndex:
+    """
+    Multi-index hash table over 64-bit image hashes for near-duplicate
+    lookups by Hamming distance.
+
+    Each hash is split into four 16-bit chunks with one table per chunk.
+    Two hashes within distance r agree within r // 4 bits on at least
+    one chunk, so a query only probes the chunk values within that
+    distance and checks the full distance of the few candidates found.
+
+    The tables are sorted arrays with a bucket offset per chunk value.
+    Hashes added after a build go to a small pending list that is
+    scanned linearly and merged once it grows.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self, merge_threshold=4096):
+        """
+        Initialize an empty index.
+
+        Args:
+            merge_threshold (int): Pending hashes that trigger a rebuild of the tables
+        """
+        self.merge_threshold = merge_threshold
+        self._lock = threading.RLock()
+        self._probe_masks = {}
+        self._queries = 0
+        self._query_seconds = 0.0
+        self._reset()
+
+    def _reset(self, capacity=0):
+        capacity = max(capacity, 16)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._kinds = np.zeros(capacity, dtype=np.int8)  # row -> HASH_KINDS index
+        self._keys = []            # row -> image id or catalog path
+        self._rows = {}            # (kind, key) -> row
+        self._orders = []          # per chunk: rows sorted by chunk value
+        self._offsets = []         # per chunk: start of each chunk value in the order
+        self._indexed = 0          # rows covered by the tables, later rows are pending
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _masks(self, distance):
+        """All 16-bit masks with at most distance bits set."""
+        masks = self._probe_masks.get(distance)
+        if masks is None:
+            values = np.arange(1 << self.CHUNK_BITS, dtype=np.int64)
+            weights = _POPCOUNT[values & 0xFF] + _POPCOUNT[values >> 8]
+            masks = values[weights <= distance]
+            self._probe_masks[distance] = masks
+        return masks
+
+    def _build_tables(self):
+        n = len(self._keys)
+        mask = np.uint64((1 << self.CHUNK_BITS) - 1)
+        self._orders, self._offsets = [], []
+        for chunk in range(self.CHUNKS):
+            values = ((self._hashes[:n] >> np.uint64(chunk * self.CHUNK_BITS)) & mask).astype(np.int64)
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            counts = np.bincount(values, minlength=1 << self.CHUNK_BITS)
+            offsets = np.zeros((1 << self.CHUNK_BITS) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            self._orders.append(order)
+            self._offsets.append(offsets)
+        self._indexed = n
+
+    def build(self, entries):
+        """
+        Replace the index contents.
+
+        Args:
+            entries (iterable): (kind, key, hash) tuples
+        """
+        entries = list(entries)
+        with self._lock:
+            self._reset(len(entries))
+            for row, (kind, key, value) in enumerate(entries):
+                previous = self._rows.get((kind, key))
+                if previous is not None:
+                    # Keys listed twice keep their last hash
+                    self._alive[previous] = False
+                self._hashes[row] = value
+                self._alive[row] = True
+                self._kinds[row] = HASH_KINDS.index(kind)
+                self._keys.append(key)
+                self._rows[(kind, key)] = row
+            self._build_tables()
+
+    def _grow(self, capacity):
+        old = len(self._hashes)
+        if capacity <= old:
+            return
+        extra = max(capacity, old * 2) - old
+        self._hashes = np.concatenate([self._hashes, np.zeros(extra, dtype=np.uint64)])
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._kinds = np.concatenate([self._kinds, np.zeros(extra, dtype=np.int8)])
+
+    def add(self, kind, key, value):
+        """
+        Add or replace the hash of an image.
+
+        Args:
+            kind (str): One of HASH_KINDS
+            key (str): Item image ID or catalog path
+            value (int): Hash
+        """
+        with self._lock:
+            self.remove(kind, key)
+            row = len(self._keys)
+            self._grow(row + 1)
+            self._hashes[row] = value
+            self._alive[row] = True
+            self._kinds[row] = HASH_KINDS.index(kind)
+            self._keys.append(key)
+            self._rows[(kind, key)] = row
+            if row + 1 - self._indexed >= self.merge_threshold:
+                self._compact()
+
+    def remove(self, kind, key):
+        """
+        Remove the hash of an image.
+
+        Args:
+            kind (str): One of HASH_KINDS
+            key (str): Item image ID or catalog path
+
+        Returns:
+            bool: True if the image was in the index
+        """
+        with self._lock:
+            row = self._rows.pop((kind, key), None)
+            if row is None:
+                return False
+            self._alive[row] = False
+            return True
+
+    def _compact(self):
+        """Drop removed rows and rebuild the tables over every hash."""
+        alive = np.flatnonzero(self._alive[:len(self._keys)])
+        n = len(alive)
+        hashes, kinds = self._hashes[alive], self._kinds[alive]
+        keys = [self._keys[row] for row in alive.tolist()]
+        self._reset(n)
+        self._hashes[:n], self._kinds[:n], self._alive[:n] = hashes, kinds, True
+        self._keys = keys
+        self._rows = {
+            (HASH_KINDS[kind], key): row
+            for row, (kind, key) in enumerate(zip(kinds.tolist(), keys))
+        }
+        self._build_tables()
+
+    def query(self, value, radius=6, limit=50):
+        """
+        Find images whose hash is within radius bits of value.
+
+        Args:
+            value (int): Hash to look up
+            radius (int): Maximum Hamming distance, at most MAX_RADIUS
+            limit (int): Maximum number of matches
+
+        Returns:
+            list: (kind, key, distance) tuples, closest first
+        """
+        radius = max(0, min(radius, MAX_RADIUS))
+        started = time.perf_counter()
+        query = np.uint64(value)
+        masks = self._masks(radius // self.CHUNKS)
+
+        with self._lock:
+            parts = []
+            for chunk, (order, offsets) in enumerate(zip(self._orders, self._offsets)):
+                probes = ((value >> (chunk * self.CHUNK_BITS)) & 0xFFFF) ^ masks
+                starts = offsets[probes]
+                lengths = offsets[probes + 1] - starts
+                # Positions of every row in the probed buckets, gathered in one go
+                skips = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+                parts.append(order[np.arange(len(skips)) + skips])
+            # Hashes added since the last build are compared directly
+            parts.append(np.arange(self._indexed, len(self._keys), dtype=np.int32))
+
+            # Rows can sit in several probed buckets; only the few close
+            # ones are deduplicated
+            candidates = np.concatenate(parts)
+            distances = _POPCOUNT[
+                (self._hashes[candidates] ^ query).view(np.uint8)
+            ].reshape(-1, 8).sum(axis=1)
+            close = (distances <= radius) & self._alive[candidates]
+            candidates, first = np.unique(candidates[close], return_index=True)
+            distances = distances[close][first]
+            order = np.argsort(distances, kind='stable')[:limit]
+            matches = [
+                (HASH_KINDS[self._kinds[row]], self._keys[row], int(distance))
+                for row, distance in zip(candidates[order].tolist(), distances[order].tolist())
+            ]
+            self._queries += 1
+            self._query_seconds += time.perf_counter() - started
+        return matches
+
+    def stats(self):
+        """
+        Report index size and query time.
+
+        Returns:
+            dict: Hash counts per kind, pending hashes, memory use and average query time
+        """
+        with self._lock:
+            n = len(self._keys)
+            alive_kinds = self._kinds[:n][self._alive[:n]]
+            return {
+                'images': len(self._rows),
+                'by_kind': {
+                    kind: int(np.count_nonzero(alive_kinds == index))
+                    for index, kind in enumerate(HASH_KINDS)
+                },
+                'pending': n - self._indexed,
+                'bytes': int(self._hashes.nbytes + sum(order.nbytes for order in self._orders)
+                             + sum(offsets.nbytes for offsets in self._offsets)),
+                'queries': self._queries,
+                'avg_query_seconds': self._query_seconds / self._queries if self._queries else 0.0
+            }
+
+
+# Process-wide duplicate index, populated by init_duplicate_index()
+duplicate_index = DuplicateIndex()
+
+CATALOG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+def upload_file(upload_folder, file_path):
+    """Path on disk of a /uploads/... URL path"""
+    return os.path.join(upload_folder, file_path.split('/uploads/', 1)[-1].lstrip('/'))
+
+def build_duplicate_index(batch_size=10000):
+    """
+    Rebuild the duplicate index from the hashes stored for item images
+    and catalog images.
+    Must be called inside an application context.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Returns:
+        int: Number of indexed images
+    """
+    def entries():
+        rows = db.session.query(ItemImage.id, ItemImage.phash).filter(
+            ItemImage.phash.isnot(None)
+        ).execution_options(yield_per=batch_size)
+        for image_id, phash in rows:
+            yield 'item', image_id, parse_hash(phash)
+
+        rows = db.session.query(CatalogImageHash.path, CatalogImageHash.phash).execution_options(
+            yield_per=batch_size
+        )
+        for path, phash in rows:
+            yield 'catalog', path, parse_hash(phash)
+
+    duplicate_index.build(entries())
+    logger.info(f"Duplicate index built with {len(duplicate_index)} images")
+    return len(duplicate_index)
+
+def hash_item_images(upload_folder, batch_size=500, max_workers=4):
+    """
+    Hash item images that have no hash yet and add them to the index.
+    Must be called inside an application context.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        batch_size (int): Images per transaction
+        max_workers (int): Worker threads
+
+    Returns:
+        int: Number of images hashed
+    """
+    hashed = 0
+    last_id = ''
+    while True:
+        images = ItemImage.query.filter(
+            ItemImage.phash.is_(None), ItemImage.id > last_id
+        ).order_by(ItemImage.id).limit(batch_size).all()
+        if not images:
+            break
+        last_id = images[-1].id
+
+        values = hash_files([upload_file(upload_folder, image.file_path) for image in images], max_workers)
+        for image, value in zip(images, values):
+            if value is not None:
+                image.phash = format_hash(value)
+                hashed += 1
+        db.session.commit()
+
+        for image, value in zip(images, values):
+            if value is not None:
+                duplicate_index.add('item', image.id, value)
+
+    logger.info(f"Hashed {hashed} item images")
+    return hashed
+
+def hash_catalog_images(upload_folder, batch_size=500, max_workers=4):
+    """
+    Hash new and changed catalog images and forget deleted ones. Files
+    whose size and modification time are unchanged are not read again.
+    Must be called inside an application context.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        batch_size (int): Images per transaction
+        max_workers (int): Worker threads
+
+    Returns:
+        dict: Counts of hashed, unchanged and removed images
+    """
+    known = {
+        path: (file_size, mtime_ns)
+        for path, file_size, mtime_ns in db.session.query(
+            CatalogImageHash.path, CatalogImageHash.file_size, CatalogImageHash.mtime_ns
+        )
+    }
+
+    changed = []
+    seen = set()
+    for root, dirs, files in os.walk(os.path.join(upload_folder, CATALOG_FOLDER)):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for filename in files:
+            if not filename.lower().endswith(CATALOG_EXTENSIONS):
+                continue
+            full_path = os.path.join(root, filename)
+            path = os.path.relpath(full_path, upload_folder).replace(os.sep, '/')
+            stat = os.stat(full_path)
+            seen.add(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append((path, full_path, stat.st_size, stat.st_mtime_ns))
+
+    hashed = 0
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        values = hash_files([full_path for _, full_path, _, _ in batch], max_workers)
+        for (path, _, file_size, mtime_ns), value in zip(batch, values):
+            if value is None:
+                continue
+            # Colours are analyzed again for changed files
+            db.session.merge(CatalogImageHash(
+                path=path, phash=format_hash(value), file_size=file_size, mtime_ns=mtime_ns,
+                dominant_color=None, colors=None
+            ))
+            hashed += 1
+        db.session.commit()
+
+        for (path, _, _, _), value in zip(batch, values):
+            if value is not None:
+                duplicate_index.add('catalog', path, value)
+
+    removed = [path for path in known if path not in seen]
+    for start in range(0, len(removed), batch_size):
+        batch = removed[start:start + batch_size]
+        CatalogImageHash.query.filter(CatalogImageHash.path.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        for path in batch:
+            duplicate_index.remove('catalog', path)
+
+    logger.info(f"Hashed {hashed} catalog images, removed {len(removed)}")
+    return {'hashed': hashed, 'unchanged': len(seen) - len(changed), 'removed': len(removed)}
+
+def _exact_matches(value, radius=0, limit=50):
+    """Images with exactly the same hash, looked up in the database"""
+    phash = format_hash(value)
+    matches = [
+        ('item', image_id, 0) for (image_id,) in
+        db.session.query(ItemImage.id).filter(ItemImage.phash == phash).limit(limit)
+    ]
+    matches.extend(
+        ('catalog', path, 0) for (path,) in
+        db.session.query(CatalogImageHash.path).filter(CatalogImageHash.phash == phash).limit(limit)
+    )
+    return matches[:limit]
+
+def find_duplicates(images, radius=6, limit=20, use_index=True):
+    """
+    Find near-duplicates of item images among other items and the catalog.
+    Must be called inside an application context.
+
+    Without the index only identical hashes are found.
+
+    Args:
+        images (list): ItemImage objects to look up
+        radius (int): Maximum Hamming distance
+        limit (int): Maximum matches per image
+        use_index (bool): Whether the duplicate index is populated
+
+    Returns:
+        list: One entry per image with matches, each with the image and
+            its matches closest first
+    """
+    lookup = duplicate_index.query if use_index else _exact_matches
+    found = []
+    for image in images:
+        if image.phash is None:
+            continue
+        # Extra matches make up for the image's own item, dropped below
+        matches = lookup(parse_hash(image.phash), radius=radius, limit=limit + 8)
+        found.append((image, matches))
+
+    image_ids = {key for _, matches in found for kind, key, _ in matches if kind == 'item'}
+    matched_images = {}
+    if image_ids:
+        rows = db.session.query(
+            ItemImage.id, ItemImage.item_id, ItemImage.file_path, Item.title, Item.status, Item.owner_id
+        ).join(Item, Item.id == ItemImage.item_id).filter(ItemImage.id.in_(image_ids))
+        matched_images = {row.id: row for row in rows}
+
+    # Images deleted with their items are dropped from the index lazily
+    for image_id in image_ids - matched_images.keys():
+        duplicate_index.remove('item', image_id)
+
+    results = []
+    for image, matches in found:
+        entries = []
+        for kind, key, distance in matches:
+            if kind == 'catalog':
+                entries.append({'kind': kind, 'path': key, 'url': f"/uploads/{key}", 'distance': distance})
+                continue
+            row = matched_images.get(key)
+            if row is None or row.item_id == image.item_id:
+                continue
+            entries.append({
+                'kind': kind,
+                'image_id': row.id,
+                'item_id': row.item_id,
+                'item_title': row.title,
+                'item_status': row.status,
+                'owner_id': row.owner_id,
+                'file_path': row.file_path,
+                'distance': distance
+            })
+        if entries:
+            image_data = image.to_dict(include_phash=True)
+            image_data['item_id'] = image.item_id
+            results.append({'image': image_data, 'matches': entries[:limit]})
+    return results
+
+def init_duplicate_index(app):
+    """
+    Build the duplicate index if DUPLICATE_INDEX_ENABLED is set. Item
+    images are added as the derivative pipeline hashes them.
+
+    Args:
+        app: Flask application
+    """
+    if not app.config.get('DUPLICATE_INDEX_ENABLED'):
+        return
+
+    with app.app_context():
+        build_duplicate_index()
@@ -0,0 +1,327 @@
+# File: rewear/server/utils/image_index.py
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import quote
+from utils.static_files import CATALOG_URL
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Version of the file format; files of other versions are refused
+INDEX_FORMAT_VERSION = 1
+
+# Filenames are stored as an interned stem plus what follows it, e.g.
+# "men-s-black-oversized-t-shirt" + "-555522-1707221351-1.webp"; the
+# stem is shared by every photo and size of a product
+_TAIL_CHARACTERS = '-0123456789'
+
+_SCHEMA = """
+CREATE TABLE info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    name_id INTEGER NOT NULL,
+    image_count INTEGER NOT NULL,
+    total_images INTEGER NOT NULL
+);
+CREATE TABLE metadata (
+    id INTEGER PRIMARY KEY,
+    fields TEXT NOT NULL
+);
+CREATE TABLE images (
+    category_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    stem_id INTEGER NOT NULL,
+    tail TEXT NOT NULL,
+    metadata_id INTEGER NOT NULL,
+    PRIMARY KEY (category_id, position)
+) WITHOUT ROWID;
+"""
+
+def export_image_index(processor, output_file):
+    """
+    Write the image_data of an ImageProcessor to a compact SQLite index.
+
+    Category names and filename stems are stored once in a string table
+    and identical metadata once in a metadata table, so an image row is
+    four small values. Image paths and URLs are not stored, they are
+    rebuilt from the base directory and the category. Images are
+    clustered by category, so ImageIndexReader can read one category
+    without touching the rest. The file is replaced atomically.
+
+    Args:
+        processor (ImageProcessor): Scanned processor
+        output_file (str): Path of the index file
+
+    Returns:
+        int: Number of images written
+    """
+    categories = processor.get_categories()
+    strings = {}
+    metadata_ids = {}
+
+    def intern(value, table):
+        interned = table.get(value)
+        if interned is None:
+            interned = table[value] = len(table) + 1
+        return interned
+
+    category_ids = {category['path']: index for index, category in enumerate(categories, 1)}
+    category_rows = [
+        (
+            index,
+            category_ids.get(category['parent']),
+            intern(category['name'], strings),
+            category['image_count'],
+            category['total_images']
+        )
+        for index, category in enumerate(categories, 1)
+    ]
+
+    def image_rows():
+        for index, category in enumerate(categories, 1):
+            for position, image in enumerate(processor.get_images_by_category(category['path'])):
+                filename = image['filename']
+                dot = filename.rfind('.')
+                stem = filename[:dot if dot > 0 else len(filename)].rstrip(_TAIL_CHARACTERS)
+
+                # original_name is the filename unless the scan was edited
+                metadata = image['metadata']
+                if metadata.get('original_name') == filename:
+                    fields = tuple(item for item in metadata.items() if item[0] != 'original_name')
+                else:
+                    fields = tuple(metadata.items())
+
+                yield index, position, intern(stem, strings), filename[len(stem):], intern(fields, metadata_ids)
+
+    folder = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.image-index-', suffix='.sqlite')
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(tmp_path)
+        try:
+            # A partial file is never renamed into place, so no journal is needed
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.executescript(_SCHEMA)
+            connection.executemany('INSERT INTO categories VALUES (?, ?, ?, ?, ?)', category_rows)
+            connection.executemany('INSERT INTO images VALUES (?, ?, ?, ?, ?)', image_rows())
+            connection.executemany(
+                'INSERT INTO strings VALUES (?, ?)', ((i, value) for value, i in strings.items())
+            )
+            connection.executemany(
+                'INSERT INTO metadata VALUES (?, ?)',
+                ((i, json.dumps(fields, separators=(',', ':'))) for fields, i in metadata_ids.items())
+            )
+            total = sum(category['image_count'] for category in categories)
+            connection.executemany('INSERT INTO info VALUES (?, ?)', [
+                ('version', str(INDEX_FORMAT_VERSION)),
+                ('base_directory', os.fspath(processor.base_directory)),
+                ('images', str(total))
+            ])
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    logger.info(f"Exported {total} images in {len(categories)} categories to {output_file}")
+    return total
+
+class ImageIndexReader:
+    """
+    Read-only view of an index written by export_image_index().
+
+    Opening reads the category table only; the images of a category are
+    read on demand with one range scan, so opening and reading a single
+    category cost the same whatever the size of the index. The file is
+    memory-mapped by SQLite, so processes opening the same index share
+    its pages. Methods mirror the read side of ImageProcessor.
+    """
+
+    def __init__(self, index_file, mmap_size=256 * 1024 * 1024):
+        """
+        Open an index file.
+
+        Args:
+            index_file (str): Path of the index
+            mmap_size (int): Bytes of the file SQLite may memory-map
+
+        Raises:
+            ValueError: If the file is not an index of this format version
+            sqlite3.Error: If the file cannot be opened
+        """
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._metadata = {}
+        self._connection = sqlite3.connect(
+            f"file:{quote(os.path.abspath(index_file))}?mode=ro", uri=True, check_same_thread=False
+        )
+        try:
+            self._connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+            info = dict(self._connection.execute('SELECT key, value FROM info'))
+            if info.get('version') != str(INDEX_FORMAT_VERSION):
+                raise ValueError(f"Unsupported image index version: {info.get('version')}")
+            self.base_directory = info['base_directory']
+            self.total_images = int(info['images'])
+
+            self._categories = []
+            self._category_ids = {}
+            paths = {}
+            rows = self._connection.execute(
+                'SELECT c.id, c.parent_id, s.value, c.image_count, c.total_images '
+                'FROM categories c JOIN strings s ON s.id = c.name_id ORDER BY c.id'
+            )
+            for category_id, parent_id, name, image_count, total_images in rows:
+                parent = paths.get(parent_id)
+                path = paths[category_id] = f"{parent}/{name}" if parent is not None else name
+                self._categories.append({
+                    'path': path,
+                    'name': name,
+                    'parent': parent,
+                    'image_count': image_count,
+                    'total_images': total_images
+                })
+                self._category_ids[path] = category_id
+            self._by_path = {category['path']: category for category in self._categories}
+        except (sqlite3.Error, ValueError, KeyError):
+            self._connection.close()
+            raise
+
+    def close(self):
+        """Close the index file"""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_categories(self):
+        """
+        Get the flat list of categories, see ImageProcessor.get_categories().
+
+        Returns:
+            list: Category dictionaries with path, name, parent and image counts
+        """
+        return self._categories
+
+    def get_category(self, category_path):
+        """
+        Get one category with its image counts.
+
+        Args:
+            category_path (str): Path to the category
+
+        Returns:
+            dict: Category dictionary, or None if not found
+        """
+        return self._by_path.get(category_path)
+
+    def get_images_by_category(self, category_path):
+        """
+        Read the images of one category.
+
+        Args:
+            category_path (str): Path to the category
+
+        Returns:
+            list: Image dictionaries as in ImageProcessor.get_images_by_category()
+        """
+        category_id = self._category_ids.get(category_path)
+        if category_id is None or not self._by_path[category_path]['image_count']:
+            return []
+
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT s.value, i.tail, i.metadata_id FROM images i JOIN strings s ON s.id = i.stem_id '
+                'WHERE i.category_id = ? ORDER BY i.position', (category_id,)
+            ).fetchall()
+            missing = {metadata_id for _, _, metadata_id in rows} - self._metadata.keys()
+            self._load_metadata(missing)
+        return self._build_images(category_path, rows)
+
+    def load_image_data(self):
+        """
+        Read the whole index back into the nested layout of
+        ImageProcessor.image_data.
+
+        Returns:
+            dict: Hierarchical structure of categories and images
+        """
+        image_data = {}
+        nodes = {}
+        for category in self._categories:
+            parent = nodes[category['parent']] if category['parent'] is not None else image_data
+            node = parent[category['name']] = nodes[category['path']] = {}
+            # '_images' comes before the subcategories, as in a scan
+            if category['image_count']:
+                node['_images'] = None
+
+        paths = {category_id: path for path, category_id in self._category_ids.items()}
+        with self._lock:
+            for metadata_id, fields in self._connection.execute('SELECT id, fields FROM metadata'):
+                self._metadata[metadata_id] = tuple(tuple(pair) for pair in json.loads(fields))
+            rows = self._connection.execute(
+                'SELECT i.category_id, s.value, i.tail, i.metadata_id FROM images i '
+                'JOIN strings s ON s.id = i.stem_id ORDER BY i.category_id, i.position'
+            )
+            current_id = None
+            batch = []
+            for category_id, stem, tail, metadata_id in rows:
+                if category_id != current_id:
+                    if batch:
+                        nodes[paths[current_id]]['_images'] = self._build_images(paths[current_id], batch)
+                    current_id = category_id
+                    batch = []
+                batch.append((stem, tail, metadata_id))
+            if batch:
+                nodes[paths[current_id]]['_images'] = self._build_images(paths[current_id], batch)
+        return image_data
+
+    def _load_metadata(self, metadata_ids):
+        # Called with the lock held
+        if not metadata_ids:
+            return
+        metadata_ids = sorted(metadata_ids)
+        for start in range(0, len(metadata_ids), 500):
+            chunk = metadata_ids[start:start + 500]
+            rows = self._connection.execute(
+                f"SELECT id, fields FROM metadata WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for metadata_id, fields in rows:
+                self._metadata[metadata_id] = tuple(tuple(pair) for pair in json.loads(fields))
+
+    def _build_images(self, category_path, rows):
+        # Same fields as ImageProcessor._add_to_structure()
+        path_prefix = os.path.join(self.base_directory, *category_path.split('/'), '').replace('\\', '/')
+        url_prefix = f"{CATALOG_URL}{category_path}/"
+        metadata = self._metadata
+        images = []
+        for stem, tail, metadata_id in rows:
+            filename = stem + tail
+            image_metadata = {'original_name': filename}
+            image_metadata.update(metadata[metadata_id])
+            filename_url = filename.replace('\\', '/')
+            images.append({
+                'filename': filename,
+                'path': path_prefix + filename_url,
+                'url': url_prefix + filename_url,
+                'metadata': image_metadata
+            })
+        return images
@@ -2,7 +2,11 @@
 
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from utils.filename_metadata import get_metadata_extractor
+from utils.image_index import export_image_index, ImageIndexReader
+from utils.static_files import CATALOG_URL
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,26 +17,39 @@ class ImageProcessor:
     and generate metadata for use in the web application.
     """
     
-    def __init__(self, base_directory):
+    def __init__(self, base_directory, metadata_extractor=None):
         """
         Initialize with the base directory containing the image folder structure.
         
         Args:
             base_directory (str): Path to the base directory (e.g., "Bewakoof/")
+            metadata_extractor (FilenameMetadataExtractor): Defaults to the app's extractor
         """
         self.base_directory = Path(base_directory)
+        self.metadata_extractor = metadata_extractor or get_metadata_extractor()
+        self._indexed_data = None
         self.image_data = {}
         self.supported_extensions = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
+        self._image_suffixes = tuple(self.supported_extensions)
         
         # Ensure the directory exists
         if not os.path.exists(self.base_directory):
             logger.error(f"Base directory not found: {self.base_directory}")
             raise FileNotFoundError(f"Base directory not found: {self.base_directory}")
     
-    def scan_directory(self):
+    def scan_directory(self, max_workers=1):
         """
         Scan the directory structure and build metadata for all images.
         
+        With max_workers > 1, the top-level category subtrees (split one
+        level further if there are fewer of them than workers) are listed
+        on a thread pool. The result is the same as a serial scan: every
+        directory is visited in os.walk order and subtrees are merged in
+        that order.
+        
+        Args:
+            max_workers (int): Threads listing subtrees concurrently
+        
         Returns:
             dict: Hierarchical structure of categories and images
         """
@@ -42,26 +59,16 @@ class ImageProcessor:
             # Initialize the data structure
             self.image_data = {}
             
-            # Walk through the directory structure
-            for root, dirs, files in os.walk(self.base_directory):
-                # Skip hidden directories
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                
-                # Skip if no image files in this directory
-                image_files = [f for f in files if self._is_image_file(f)]
-                if not image_files:
-                    continue
-                
-                # Get relative path from base directory
-                rel_path = os.path.relpath(root, self.base_directory)
-                if rel_path == '.':
-                    continue  # Skip the base directory itself
-                
-                # Parse the path to create category hierarchy
-                path_parts = rel_path.split(os.sep)
-                
-                # Build the nested dictionary structure
-                self._add_to_structure(path_parts, image_files, root)
+            base = os.fspath(self.base_directory)
+            if max_workers > 1:
+                directories = self._walk_parallel(base, max_workers)
+            else:
+                directories = self._walk(base, ())
+            
+            for path_parts, full_path, image_files in directories:
+                # Skip the base directory itself and directories without images
+                if path_parts and image_files:
+                    self._add_to_structure(path_parts, image_files, full_path)
             
             logger.info(f"Scan completed. Found {self._count_images(self.image_data)} images.")
             return self.image_data
@@ -70,6 +77,113 @@ class ImageProcessor:
             logger.error(f"Error scanning directory: {str(e)}")
             raise
     
+    def _list_directory(self, path):
+        """
+        List one directory with the rules of the original os.walk scan:
+        hidden and symlinked folders are not descended into and only
+        image files are kept.
+        
+        Args:
+            path (str): Directory to list
+            
+        Returns:
+            tuple: (list of subdirectory names, list of image filenames), in directory order
+            
+        Raises:
+            OSError: If the directory cannot be read
+        """
+        subdirs = []
+        image_files = []
+        is_image = self._is_image_file
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                
+                if is_dir:
+                    if not entry.name.startswith('.') and not entry.is_symlink():
+                        subdirs.append(entry.name)
+                elif is_image(entry.name):
+                    image_files.append(entry.name)
+        return subdirs, image_files
+    
+    def _walk(self, path, path_parts):
+        """
+        Walk a subtree top-down in os.walk order.
+        
+        Args:
+            path (str): Root of the subtree
+            path_parts (tuple): Category path of the root below the base directory
+            
+        Returns:
+            list: (path_parts, full_path, image_files) for every directory
+        """
+        directories = []
+        stack = [(path, path_parts)]
+        while stack:
+            path, path_parts = stack.pop()
+            try:
+                subdirs, image_files = self._list_directory(path)
+            except OSError as e:
+                # os.walk skips unreadable directories as well
+                logger.warning(f"Could not list directory {path}: {str(e)}")
+                continue
+            directories.append((path_parts, path, image_files))
+            stack.extend(
+                (os.path.join(path, name), path_parts + (name,)) for name in reversed(subdirs)
+            )
+        return directories
+    
+    def _walk_parallel(self, base, max_workers):
+        """
+        Walk the tree with subtrees listed on a thread pool.
+        
+        Args:
+            base (str): Base directory
+            max_workers (int): Worker threads
+            
+        Returns:
+            list: Same as _walk(base, ())
+        """
+        # Directories listed up front and subtrees left to the pool, in
+        # os.walk order. The subtrees are the top-level categories, or the
+        # level below them if there are fewer categories than workers.
+        plan = [(None, base, ())]
+        for depth in range(2):
+            expanded = []
+            for listed, path, path_parts in plan:
+                if listed is None and len(path_parts) == depth:
+                    try:
+                        subdirs, image_files = self._list_directory(path)
+                    except OSError as e:
+                        logger.warning(f"Could not list directory {path}: {str(e)}")
+                        continue
+                    expanded.append(((path_parts, path, image_files), path, path_parts))
+                    expanded.extend(
+                        (None, os.path.join(path, name), path_parts + (name,)) for name in subdirs
+                    )
+                else:
+                    expanded.append((listed, path, path_parts))
+            plan = expanded
+            if sum(1 for listed, _, _ in plan if listed is None) >= max_workers:
+                break
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-scan') as executor:
+            walks = [
+                executor.submit(self._walk, path, path_parts) if listed is None else None
+                for listed, path, path_parts in plan
+            ]
+            
+            directories = []
+            for (listed, _, _), walk in zip(plan, walks):
+                if walk is None:
+                    directories.append(listed)
+                else:
+                    directories.extend(walk.result())
+            return directories
+    
     def _add_to_structure(self, path_parts, image_files, full_path):
         """
         Add images to the hierarchical structure.
@@ -83,27 +197,28 @@ class ImageProcessor:
         current = self.image_data
         
         # Build the nested structure
-        for i, part in enumerate(path_parts):
+        for part in path_parts:
             if part not in current:
                 current[part] = {}
             
             current = current[part]
         
+        # The directory and URL prefixes are the same for every image. URLs
+        # are below the catalog folder, as media.serve_upload expects.
+        path_prefix = os.path.join(full_path, '').replace('\\', '/')
+        url_prefix = CATALOG_URL + '/'.join(path_parts) + '/'
+        metadata = self.metadata_extractor.extract_batch(image_files)
+        
         # Add images to the current level
-        current['_images'] = []
-        for image in image_files:
-            if self._is_image_file(image):
-                image_url = os.path.join(full_path, image).replace('\\', '/')
-                
-                # Extract metadata from filename
-                metadata = self._extract_metadata_from_filename(image)
-                
-                current['_images'].append({
-                    'filename': image,
-                    'path': image_url,
-                    'url': f'/uploads/{os.path.relpath(image_url, self.base_directory).replace("\\", "/")}',
-                    'metadata': metadata
-                })
+        current['_images'] = [
+            {
+                'filename': image,
+                'path': path_prefix + image.replace('\\', '/'),
+                'url': url_prefix + image.replace('\\', '/'),
+                'metadata': image_metadata
+            }
+            for image, image_metadata in zip(image_files, metadata)
+        ]
     
     def _is_image_file(self, filename):
         """
@@ -115,14 +230,15 @@ class ImageProcessor:
         Returns:
             bool: True if the file is an image, False otherwise
         """
-        _, ext = os.path.splitext(filename.lower())
-        return ext in self.supported_extensions
+        # Same as os.path.splitext: leading dots do not start an extension
+        return filename.lower().endswith(self._image_suffixes) and '.' in filename.lstrip('.')
     
     def _extract_metadata_from_filename(self, filename):
         """
         Extract structured metadata from the filename.
         For example: "men-s-black-oversized-t-shirt-555522-1707221351-1.webp"
-        might extract gender, color, fit, type, etc.
+        gives gender, color, fit and product type, see
+        utils/filename_metadata.py for the vocabularies.
         
         Args:
             filename (str): Name of the image file
@@ -130,62 +246,7 @@ class ImageProcessor:
         Returns:
             dict: Extracted metadata
         """
-        # Remove extension
-        name = os.path.splitext(filename)[0]
-        
-        # Split by hyphens
-        parts = name.split('-')
-        
-        metadata = {
-            'original_name': filename
-        }
-        
-        # Try to extract common patterns
-        try:
-            # Check if it starts with gender
-            if parts[0].lower() in ['men', 'women']:
-                metadata['gender'] = parts[0].lower()
-            
-            # Look for colors (this is a simple approach, could be improved)
-            colors = ['black', 'white', 'blue', 'red', 'green', 'yellow', 'purple', 
-                    'brown', 'grey', 'gray', 'pink', 'orange', 'beige', 'tan', 'navy']
-            
-            for part in parts:
-                if part.lower() in colors:
-                    metadata['color'] = part.lower()
-                    break
-            
-            # Look for fit types
-            fits = ['oversized', 'slim', 'regular', 'relaxed', 'loose', 'super loose']
-            for i, part in enumerate(parts):
-                if part.lower() in fits:
-                    metadata['fit'] = part.lower()
-                    # If "fit" is followed by "fit", combine them
-                    if i+1 < len(parts) and parts[i+1].lower() == 'fit':
-                        metadata['fit'] = f"{part.lower()} fit"
-                    break
-            
-            # Extract product type
-            product_types = ['t-shirt', 'shirt', 'joggers', 'pants', 'jeans', 'cargo', 
-                           'boxer', 'watch', 'sunglasses', 'shoes', 'backpack']
-            
-            for i, part in enumerate(parts):
-                # Check if this part combined with the next forms a product type
-                if i < len(parts) - 1:
-                    combined = f"{part.lower()}-{parts[i+1].lower()}"
-                    if combined in product_types:
-                        metadata['product_type'] = combined
-                        break
-                
-                # Check single part
-                if part.lower() in product_types:
-                    metadata['product_type'] = part.lower()
-                    break
-        
-        except Exception as e:
-            logger.warning(f"Error extracting metadata from filename {filename}: {str(e)}")
-        
-        return metadata
+        return self.metadata_extractor.extract(filename)
     
     def _count_images(self, data):
         """
@@ -221,35 +282,98 @@ class ImageProcessor:
             logger.error(f"Error exporting data to JSON: {str(e)}")
             return False
     
+    def export_index(self, output_file):
+        """
+        Export the image data to a compact SQLite index, which can be
+        opened lazily with ImageIndexReader or read back with load_index().
+        Much smaller and faster to write than export_to_json().
+        
+        Args:
+            output_file (str): Path to the index file
+            
+        Returns:
+            int: Number of images exported
+        """
+        return export_image_index(self, output_file)
+    
+    def load_index(self, index_file):
+        """
+        Replace the image data with an index written by export_index().
+        
+        Args:
+            index_file (str): Path to the index file
+            
+        Returns:
+            dict: Hierarchical structure of categories and images
+        """
+        with ImageIndexReader(index_file) as reader:
+            self.image_data = reader.load_image_data()
+        return self.image_data
+    
+    def _index_paths(self):
+        """
+        Build the flat path index, the category list and the image counts
+        of image_data. They are rebuilt whenever image_data is replaced.
+        """
+        if self._indexed_data is self.image_data:
+            return
+        
+        image_data = self.image_data
+        path_index = {}
+        categories = []
+        
+        def visit(data, current_path):
+            # Returns the number of images below data, descendants included
+            total = len(data.get('_images', ()))
+            for key, value in data.items():
+                if key != '_images' and isinstance(value, dict):
+                    new_path = current_path + [key]
+                    path = '/'.join(new_path)
+                    category = {
+                        'path': path,
+                        'name': key,
+                        'parent': '/'.join(current_path) if current_path else None
+                    }
+                    categories.append(category)
+                    path_index[path] = value
+                    
+                    category_total = visit(value, new_path)
+                    category['image_count'] = len(value.get('_images', ()))
+                    category['total_images'] = category_total
+                    total += category_total
+            return total
+        
+        visit(image_data, [])
+        self._path_index = path_index
+        self._categories = categories
+        self._category_counts = {category['path']: category for category in categories}
+        self._filter_index = {}
+        self._indexed_data = image_data
+    
     def get_categories(self):
         """
         Get a flat list of all categories.
         
         Returns:
-            list: List of category dictionaries with path and name
+            list: Category dictionaries with path, name, parent, the number
+                of images in the category and the total with its descendants.
+                The list is shared, treat it as read-only.
         """
-        categories = []
-        self._extract_categories(self.image_data, [], categories)
-        return categories
+        self._index_paths()
+        return self._categories
     
-    def _extract_categories(self, data, current_path, result):
+    def get_category(self, category_path):
         """
-        Extract categories recursively.
+        Get one category with its image counts.
         
         Args:
-            data (dict): Current level of the hierarchical data
-            current_path (list): Current path in the hierarchy
-            result (list): List to store the results
+            category_path (str): Path to the category
+            
+        Returns:
+            dict: Category dictionary as in get_categories(), or None if not found
         """
-        for key, value in data.items():
-            if key != '_images' and isinstance(value, dict):
-                new_path = current_path + [key]
-                result.append({
-                    'path': '/'.join(new_path),
-                    'name': key,
-                    'parent': '/'.join(current_path) if current_path else None
-                })
-                self._extract_categories(value, new_path, result)
+        self._index_paths()
+        return self._category_counts.get(category_path)
     
     def get_images_by_category(self, category_path):
         """
@@ -261,19 +385,82 @@ class ImageProcessor:
         Returns:
             list: List of image dictionaries in the category
         """
-        if not category_path:
-            return []
+        self._index_paths()
+        node = self._path_index.get(category_path)
+        if node is None:
+            return []  # Category not found
         
-        # Split the path into parts
-        parts = category_path.split('/')
+        # Return images if available
+        return node.get('_images', [])
+    
+    def find_images(self, category_path, filters=None, offset=0, limit=None, after=None, filenames=None):
+        """
+        Get one page of a category's images, optionally filtered on the
+        metadata extracted from their filenames.
         
-        # Navigate to the specified category
-        current = self.image_data
-        for part in parts:
-            if part in current:
-                current = current[part]
-            else:
-                return []  # Category not found
+        Args:
+            category_path (str): Path to the category
+            filters (dict): Metadata field -> value, e.g. {'color': 'black'}; all must match
+            offset (int): Number of matching images to skip
+            limit (int): Page size, or None for all remaining images
+            after (str): Filename of the last image of the previous page;
+                the page starts after it if it is still at offset - 1
+            filenames (set): Only images with these filenames, or None for all
+            
+        Returns:
+            tuple: (list of image dictionaries, total number of matching images,
+                offset of the first image returned)
+        """
+        images = self.get_images_by_category(category_path)
         
-        # Return images if available
-        return current.get('_images', [])
\ No newline at end of file
+        if filters or filenames is not None:
+            positions = self._filter_positions(category_path, images, filters) if filters else range(len(images))
+            if filenames is not None:
+                positions = [position for position in positions if images[position]['filename'] in filenames]
+            total = len(positions)
+        else:
+            positions = None
+            total = len(images)
+        
+        def image_at(position):
+            return images[positions[position] if positions is not None else position]
+        
+        # Images added or removed since the previous page shift the offset;
+        # resume after the last image shown if it can still be found
+        if after is not None and not (0 < offset <= total and image_at(offset - 1)['filename'] == after):
+            for position in range(total):
+                if image_at(position)['filename'] == after:
+                    offset = position + 1
+                    break
+        
+        offset = max(offset, 0)
+        end = total if limit is None else min(offset + limit, total)
+        if positions is None:
+            return images[offset:end], total, offset
+        return [images[position] for position in positions[offset:end]], total, offset
+    
+    def _filter_positions(self, category_path, images, filters):
+        """
+        Positions of the images of a category matching every filter. The
+        positions of each value of a field are indexed on first use.
+        """
+        category_index = self._filter_index.setdefault(category_path, {})
+        matches = []
+        for field, value in filters.items():
+            field_index = category_index.get(field)
+            if field_index is None:
+                field_index = {}
+                for position, image in enumerate(images):
+                    field_value = image['metadata'].get(field)
+                    if field_value is not None:
+                        field_index.setdefault(field_value, []).append(position)
+                category_index[field] = field_index
+            matches.append(field_index.get(value.lower(), []))
+        
+        # Intersect starting from the shortest list, keeping its order
+        matches.sort(key=len)
+        positions = matches[0]
+        for other in matches[1:]:
+            other = set(other)
+            positions = [position for position in positions if position in other]
+        return positions
\ No newline at end of file
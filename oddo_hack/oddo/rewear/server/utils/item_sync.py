@@ -0,0 +1,152 @@
+# File: rewear/server/utils/item_sync.py
+
+import threading
+import time
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows updated this long before the last seen change are read again, for
+# transactions that committed after a later change was already seen
+OVERLAP_SECONDS = 30
+
+# Rows fetched per query when filling in missing items
+RECONCILE_BATCH_SIZE = 500
+
+def items_version():
+    """
+    Number of approved items and the latest update of any item, which
+    every visible change moves. Both come from indexes (idx_status,
+    idx_updated_at).
+    Must be called inside an application context.
+
+    Returns:
+        tuple: (approved count, latest updated_at or None)
+    """
+    from config.database import db
+    from models.item import Item
+
+    count = db.session.query(db.func.count(Item.id)).filter(Item.status == 'approved').scalar()
+    latest = db.session.query(db.func.max(Item.updated_at)).scalar()
+    return count, latest
+
+class ItemSync:
+    """
+    Keeps a process-local index of approved items in step with changes
+    committed by other worker processes, which the items_changed signal
+    never reaches.
+
+    A check runs at most every interval seconds and costs one COUNT and
+    one MAX query. When the version moved, only the rows updated since
+    the last seen change are read and applied; the approved ids are
+    compared with the index only if its size no longer matches the
+    count, e.g. after rows were deleted.
+    """
+
+    def __init__(self, name, columns, upsert, remove, keys):
+        """
+        Initialize the sync state.
+
+        Args:
+            name (str): Index name for log messages
+            columns (tuple): Names of the Item columns read for upsert
+            upsert (callable): upsert(row) with a row of (id, *columns)
+            remove (callable): remove(item_id)
+            keys (callable): keys() returning the indexed item IDs
+        """
+        self.name = name
+        self.columns = columns
+        self._upsert = upsert
+        self._remove = remove
+        self._keys = keys
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    def mark_built(self, version):
+        """
+        Record the version a full build was made from.
+
+        Args:
+            version (tuple): items_version() read before the build's rows
+        """
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def revalidate(self, interval):
+        """
+        Apply changes committed by other processes. Only one thread
+        checks, the others keep using the current index.
+        Must be called inside an application context.
+
+        Args:
+            interval (float): Seconds between checks
+
+        Returns:
+            int: Number of rows applied
+        """
+        if time.monotonic() - self._checked_at < interval:
+            return 0
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            self._checked_at = time.monotonic()
+            version = items_version()
+            if version == self._version:
+                return 0
+
+            applied = self._apply_changes(self._version[1] if self._version else None)
+            # Counted again, as local changes may have landed meanwhile
+            if len(self._keys()) != items_version()[0]:
+                applied += self._reconcile()
+
+            # Changes committed after the version was read move it again
+            self._version = version
+            if applied:
+                logger.info(f"{self.name} synced {applied} changed items")
+            return applied
+        finally:
+            self._lock.release()
+
+    def _apply_changes(self, since):
+        from config.database import db
+        from models.item import Item
+
+        query = db.session.query(Item.id, Item.status, *(getattr(Item, name) for name in self.columns))
+        if since is not None:
+            query = query.filter(Item.updated_at >= since - timedelta(seconds=OVERLAP_SECONDS))
+
+        applied = 0
+        for item_id, status, *values in query.execution_options(yield_per=RECONCILE_BATCH_SIZE):
+            if status == 'approved':
+                self._upsert((item_id, *values))
+            else:
+                self._remove(item_id)
+            applied += 1
+        return applied
+
+    def _reconcile(self):
+        """Drop deleted items and add approved ones the index is missing"""
+        from config.database import db
+        from models.item import Item
+
+        approved = {
+            item_id for (item_id,) in db.session.query(Item.id).filter(
+                Item.status == 'approved'
+            ).execution_options(yield_per=10 * RECONCILE_BATCH_SIZE)
+        }
+        indexed = set(self._keys())
+
+        for item_id in indexed - approved:
+            self._remove(item_id)
+
+        missing = sorted(approved - indexed)
+        for start in range(0, len(missing), RECONCILE_BATCH_SIZE):
+            rows = db.session.query(Item.id, *(getattr(Item, name) for name in self.columns)).filter(
+                Item.id.in_(missing[start:start + RECONCILE_BATCH_SIZE])
+            )
+            for row in rows:
+                self._upsert(tuple(row))
+
+        return len(indexed - approved) + len(missing)
@@ -0,0 +1,116 @@
+# File: rewear/server/utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(created_at, item_id):
+    """
+    Encode a (created_at, id) position into an opaque cursor string.
+
+    Args:
+        created_at (datetime): Creation timestamp of the last row on the page
+        item_id (str): ID of the last row on the page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps([created_at.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Args:
+        cursor (str): Opaque cursor string
+
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), str(item_id)
+    except Exception:
+        raise InvalidCursorError('Invalid cursor')
+
+def encode_offset_cursor(offset, key, params=None):
+    """
+    Encode a position in an in-memory list into an opaque cursor string.
+
+    Args:
+        offset (int): Position of the first row of the next page
+        key (str): Key of the last row on the page, to resume after it if rows moved
+        params (dict): Page size and filters of the listing, which the
+            next page must keep
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps([offset, key, params or {}], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_offset_cursor(cursor):
+    """
+    Decode a cursor produced by encode_offset_cursor().
+
+    Args:
+        cursor (str): Opaque cursor string
+
+    Returns:
+        tuple: (offset, key, params)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset, key, params = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(offset, int) or offset < 0 or not isinstance(params, dict):
+            raise ValueError(offset)
+        return offset, str(key), params
+    except Exception:
+        raise InvalidCursorError('Invalid cursor')
+
+def keyset_paginate(query, model, cursor, limit):
+    """
+    Page through a query newest-first using (created_at, id) as the key.
+
+    Unlike query.paginate(), this does not use OFFSET and does not run a
+    COUNT(*), so every page costs the same regardless of its depth.
+
+    Args:
+        query: SQLAlchemy query over model, without ordering applied
+        model: Mapped class with created_at and id columns
+        cursor (str): Cursor from a previous page, or empty for the first page
+        limit (int): Page size
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    limit = max(limit, 1)
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < last_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return rows, next_cursor
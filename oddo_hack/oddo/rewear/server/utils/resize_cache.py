@@ -0,0 +1,272 @@
+# File: rewear/server/utils/resize_cache.py
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from PIL import Image, ImageOps
+from utils.cache import SingleFlight
+from utils.derivatives import to_rgb
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Output formats with their Pillow save options and MIME types
+RESIZE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}, 'image/webp'),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}, 'image/jpeg'),
+    'png': ('PNG', {'optimize': True}, 'image/png')
+}
+
+# Sizes a requested width or height is rounded up to; the derivative
+# sizes are among them
+RESIZE_SIZES = (80, 160, 320, 480, 640, 960, 1280, 1920)
+
+# Resize timings kept for the latency percentiles
+LATENCY_WINDOW = 1000
+
+def bucket_size(value, sizes=RESIZE_SIZES):
+    """
+    Round a requested dimension up to the nearest allowed size. Larger
+    requests get the largest size, so each image has at most one variant
+    per allowed size, format and dimension.
+
+    Args:
+        value (int): Requested width or height, or None
+        sizes (tuple): Allowed sizes
+
+    Returns:
+        int: Allowed size, or None if value is None
+    """
+    if value is None:
+        return None
+    for size in sorted(sizes):
+        if value <= size:
+            return size
+    return max(sizes)
+
+def resize_image(source, target, width, height, fmt):
+    """
+    Write a copy of an image that fits in width x height, keeping its
+    aspect ratio. Images are never enlarged and EXIF orientation is
+    applied to the pixels.
+
+    Args:
+        source (str): Path of the original
+        target (str): Path to write the copy to
+        width (int): Maximum width, or None
+        height (int): Maximum height, or None
+        fmt (str): One of RESIZE_FORMATS
+    """
+    pil_format, options, _ = RESIZE_FORMATS[fmt]
+    box = (width or 1 << 16, height or 1 << 16)
+
+    with Image.open(source) as original:
+        # Let the JPEG decoder downscale while decoding large photos
+        original.draft('RGB', box)
+        image = ImageOps.exif_transpose(original)
+        if fmt == 'jpeg':
+            image = to_rgb(image)
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+        image.thumbnail(box, Image.LANCZOS)
+        image.save(target, pil_format, **options)
+
+class ResizeCache:
+    """
+    Size-bounded disk cache of resized images with LRU eviction.
+
+    The LRU order lives in memory and is rebuilt from file access times
+    on startup; hits touch the file so the order survives restarts.
+    Concurrent misses for the same variant run a single resize.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Folder holding the resized files
+            max_bytes (int): Total size the folder is kept under
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flight = SingleFlight()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._errors = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def load(self):
+        """Index the files already in the cache folder, oldest access first."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    found.append((stat.st_atime, entry.name, stat.st_size))
+        found.sort()
+
+        with self._lock:
+            self._entries = OrderedDict((name, size) for _, name, size in found)
+            self._bytes = sum(size for _, _, size in found)
+            self._evict()
+
+    @staticmethod
+    def variant_name(source, width, height, fmt):
+        """
+        Cache file name of a variant. The source's size and modification
+        time are part of the name, so replaced originals get new variants.
+
+        Args:
+            source (str): Path of the original
+            width (int): Maximum width, or None
+            height (int): Maximum height, or None
+            fmt (str): One of RESIZE_FORMATS
+
+        Returns:
+            str: File name
+        """
+        stat = os.stat(source)
+        key = f"{source}\x1f{stat.st_size}\x1f{stat.st_mtime_ns}\x1f{width}\x1f{height}"
+        return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.{fmt}"
+
+    def get(self, source, width, height, fmt):
+        """
+        Return the path of a resized variant, creating it on a miss.
+
+        Args:
+            source (str): Path of the original
+            width (int): Maximum width, or None
+            height (int): Maximum height, or None
+            fmt (str): One of RESIZE_FORMATS
+
+        Returns:
+            str: Path of the cached file
+        """
+        name = self.variant_name(source, width, height, fmt)
+        path = os.path.join(self.cache_dir, name)
+
+        with self._lock:
+            hit = name in self._entries
+            if hit:
+                self._entries.move_to_end(name)
+
+        if hit:
+            try:
+                # Only the access time, the modification time backs the ETag
+                stat = os.stat(path)
+                os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            except FileNotFoundError:
+                # Removed behind our back, resize again
+                with self._lock:
+                    size = self._entries.pop(name, None)
+                    if size is not None:
+                        self._bytes -= size
+                hit = False
+
+        with self._lock:
+            if hit:
+                self._hits += 1
+                return path
+            self._misses += 1
+
+        _, shared = self._flight.do(name, lambda: self._create(source, width, height, fmt, name))
+        if shared:
+            with self._lock:
+                self._coalesced += 1
+        return path
+
+    def _create(self, source, width, height, fmt, name):
+        started = time.monotonic()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.', suffix=f".{fmt}")
+        os.close(fd)
+        try:
+            resize_image(source, tmp_path, width, height, fmt)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, os.path.join(self.cache_dir, name))
+        except BaseException:
+            os.remove(tmp_path)
+            with self._lock:
+                self._errors += 1
+            raise
+
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+            previous = self._entries.pop(name, None)
+            if previous is not None:
+                self._bytes -= previous
+            self._entries[name] = size
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        # Called with the lock held
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError as e:
+                logger.warning(f"Could not evict resized image {name}: {str(e)}")
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Size, hits, misses, hit ratio, evictions and resize latency
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            latencies = sorted(self._latencies)
+            stats = {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'errors': self._errors
+            }
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+        stats['resize_seconds'] = {
+            'avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'max': latencies[-1] if latencies else 0.0
+        }
+        return stats
+
+
+# Cache used by GET /api/images/resize, configured by init_resize_cache()
+resize_cache = ResizeCache()
+
+def init_resize_cache(app):
+    """
+    Configure the resize cache from the app config and index its folder.
+
+    Args:
+        app: Flask application
+    """
+    resize_cache.cache_dir = app.config.get('RESIZE_CACHE_DIR') or os.path.join(
+        app.config['UPLOAD_FOLDER'], 'cache', 'resized'
+    )
+    resize_cache.max_bytes = app.config.get('RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    resize_cache.load()
@@ -0,0 +1,393 @@
+# File: rewear/server/utils/scan_index.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from utils.image_processor import ImageProcessor
+from utils.filename_metadata import get_metadata_extractor
+from utils.static_files import CATALOG_FOLDER, CATALOG_URL
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Version of the on-disk format; files of other versions are ignored
+INDEX_VERSION = 1
+
+# Directories modified this recently may change again within the same
+# mtime tick, so they are listed again on the next refresh
+RACY_SECONDS = 2
+
+class _Directory:
+    """A scanned directory: its mtime, visible subdirectories and images"""
+
+    __slots__ = ('mtime_ns', 'subdirs', 'images')
+
+    def __init__(self, mtime_ns, subdirs, images):
+        self.mtime_ns = mtime_ns
+        self.subdirs = subdirs
+        self.images = images
+
+class ScanIndex:
+    """
+    Process-wide index of the catalog image tree behind /api/images.
+
+    Every directory is kept with its modification time, its subdirectories
+    and its image entries. Adding, removing or renaming a file or folder
+    changes the mtime of the directory holding it, so a refresh stats each
+    known directory and lists again only those whose mtime changed; an
+    unchanged subtree costs one stat per directory. Refreshes run at most
+    every revalidate_interval seconds and requests in between are answered
+    from the last snapshot. The index is saved to disk, so after a restart
+    the tree is only revalidated instead of scanned.
+
+    The snapshot is an ImageProcessor whose image_data is exactly what
+    scan_directory() would have produced.
+    """
+
+    def __init__(self, base_directory=None, index_file=None, revalidate_interval=5.0, max_workers=1):
+        """
+        Initialize an empty index.
+
+        Args:
+            base_directory (str): Catalog folder, e.g. UPLOAD_FOLDER/Bewakoof
+            index_file (str): File the index is saved to, or None to keep it in memory
+            revalidate_interval (float): Seconds between mtime checks
+            max_workers (int): Threads checking directories concurrently
+        """
+        self.base_directory = base_directory
+        self.index_file = index_file
+        self.revalidate_interval = revalidate_interval
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._dirs = {}              # path relative to the base ('' for the base) -> _Directory
+        self._snapshot = None        # ImageProcessor holding the current tree
+        self._checked_at = None
+        self._refreshes = 0
+        self._rescanned = 0
+        self._last_refresh = 0.0
+        self._loaded = False
+        self._saving = False
+        self._save_pending = False
+
+    def load(self):
+        """
+        Load the index saved by a previous process. Directories are
+        revalidated by the first refresh, so a stale file is harmless.
+
+        Returns:
+            bool: Whether a saved index was loaded
+        """
+        if not self.index_file or not os.path.exists(self.index_file):
+            return False
+
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load scan index {self.index_file}: {str(e)}")
+            return False
+
+        # Metadata parsed with other vocabularies is not reused
+        base = os.fspath(Path(self.base_directory))
+        if (saved.get('version') != INDEX_VERSION
+                or saved.get('base_directory') != base
+                or saved.get('metadata_vocabularies') != get_metadata_extractor().fingerprint):
+            return False
+
+        dirs = {}
+        for rel, (mtime_ns, subdirs, images) in saved['directories'].items():
+            path = os.path.join(base, rel) if rel else base
+            dirs[rel] = _Directory(mtime_ns, subdirs, [
+                self._image_entry(path, rel, filename, metadata) for filename, metadata in images
+            ])
+
+        with self._lock:
+            self._dirs = dirs
+            self._loaded = True
+        logger.info(f"Loaded scan index of {len(dirs)} directories from {self.index_file}")
+        return True
+
+    def save(self):
+        """Write the index to index_file, replacing it atomically"""
+        if not self.index_file:
+            return
+
+        with self._lock:
+            directories = {
+                rel: [entry.mtime_ns, entry.subdirs, [[image['filename'], image['metadata']] for image in entry.images]]
+                for rel, entry in self._dirs.items()
+            }
+        saved = {
+            'version': INDEX_VERSION,
+            'base_directory': os.fspath(Path(self.base_directory)),
+            'metadata_vocabularies': get_metadata_extractor().fingerprint,
+            'directories': directories
+        }
+
+        folder = os.path.dirname(self.index_file)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.scan-index-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(saved, f, separators=(',', ':'))
+                os.replace(tmp_path, self.index_file)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not save scan index {self.index_file}: {str(e)}")
+
+    def _schedule_save(self):
+        """Save the index on a background thread, coalescing saves requested meanwhile"""
+        if not self.index_file:
+            return
+        with self._lock:
+            if self._saving:
+                self._save_pending = True
+                return
+            self._saving = True
+        threading.Thread(target=self._save_worker, name='scan-index-save', daemon=True).start()
+
+    def _save_worker(self):
+        while True:
+            self.save()
+            with self._lock:
+                if not self._save_pending:
+                    self._saving = False
+                    return
+                self._save_pending = False
+
+    def refresh(self):
+        """
+        Revalidate every directory now and rescan the ones that changed.
+
+        Returns:
+            ImageProcessor: Snapshot of the tree
+
+        Raises:
+            FileNotFoundError: If the base directory does not exist
+        """
+        with self._lock:
+            snapshot, rescanned = self._refresh()
+        if rescanned:
+            self._schedule_save()
+        return snapshot
+
+    def _refresh(self):
+        # Called with the lock held
+        started = time.monotonic()
+        processor = ImageProcessor(self.base_directory)
+        dirs, rescanned = self._revalidate(processor)
+
+        if rescanned or self._snapshot is None or len(dirs) != len(self._dirs):
+            processor.image_data = self._build_tree(dirs)
+            self._dirs = dirs
+            # Build the path index now rather than on the first request
+            processor.get_categories()
+            self._snapshot = processor
+
+        self._checked_at = time.monotonic()
+        self._refreshes += 1
+        self._rescanned += rescanned
+        self._last_refresh = self._checked_at - started
+
+        if rescanned:
+            logger.info(f"Scan index refreshed: {rescanned} directories listed in {self._last_refresh:.3f}s")
+        return self._snapshot, rescanned
+
+    def _revalidate(self, processor):
+        """
+        Check the tree one level at a time, reusing every directory whose
+        mtime is unchanged. With max_workers > 1 the directories of a level
+        are checked on a thread pool, which hides stat and listing latency
+        on network disks. The order of the tree comes from each directory's
+        subdirs, so the result does not depend on the order of the checks.
+
+        Returns:
+            tuple: (dict of directories, number of directories listed again)
+        """
+        base = os.fspath(processor.base_directory)
+        racy_before = time.time_ns() - RACY_SECONDS * 1_000_000_000
+
+        def check(rel):
+            path = os.path.join(base, rel) if rel else base
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return None, False  # Removed since its parent was listed
+
+            previous = self._dirs.get(rel)
+            if previous is not None and previous.mtime_ns == mtime_ns:
+                return previous, False
+            # A change within the same mtime tick would go unnoticed
+            return self._list_directory(
+                processor, path, rel, previous, mtime_ns if mtime_ns < racy_before else None
+            ), True
+
+        dirs = {}
+        rescanned = 0
+        level = ['']
+        executor = None
+        if self.max_workers > 1:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-scan')
+        try:
+            while level:
+                if executor is not None and len(level) > 1:
+                    results = executor.map(check, level)
+                else:
+                    results = map(check, level)
+
+                next_level = []
+                for rel, (entry, listed) in zip(level, results):
+                    if entry is None:
+                        continue
+                    dirs[rel] = entry
+                    rescanned += listed
+                    next_level.extend(os.path.join(rel, name) for name in entry.subdirs)
+                level = next_level
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return dirs, rescanned
+
+    def _list_directory(self, processor, path, rel, previous, mtime_ns):
+        try:
+            subdirs, image_files = processor._list_directory(path)
+        except OSError as e:
+            logger.warning(f"Could not list {path}: {str(e)}")
+            return _Directory(None, [], [])
+
+        # Entries of files seen before are reused, only new files are parsed
+        known = {image['filename']: image for image in previous.images} if previous else {}
+        images = []
+        for filename in image_files:
+            image = known.get(filename)
+            if image is None:
+                image = self._image_entry(
+                    path, rel, filename, processor._extract_metadata_from_filename(filename)
+                )
+            images.append(image)
+        return _Directory(mtime_ns, subdirs, images)
+
+    @staticmethod
+    def _image_entry(path, rel, filename, metadata):
+        # Same fields as ImageProcessor._add_to_structure()
+        filename_url = filename.replace('\\', '/')
+        return {
+            'filename': filename,
+            'path': os.path.join(path, filename_url).replace('\\', '/'),
+            'url': f"{CATALOG_URL}{rel.replace(os.sep, '/')}/{filename_url}",
+            'metadata': metadata
+        }
+
+    @staticmethod
+    def _build_tree(dirs):
+        """Nest the directories into the image_data layout of ImageProcessor"""
+        data = {}
+        stack = [('', ())]
+        while stack:
+            rel, parts = stack.pop()
+            entry = dirs.get(rel)
+            if entry is None:
+                continue
+
+            # Images directly in the base directory are not listed
+            if parts and entry.images:
+                current = data
+                for part in parts:
+                    current = current.setdefault(part, {})
+                current['_images'] = list(entry.images)
+
+            stack.extend(
+                (os.path.join(rel, name), parts + (name,)) for name in reversed(entry.subdirs)
+            )
+        return data
+
+    def _current(self):
+        """Return the snapshot, revalidating first if it is due"""
+        if self._snapshot is None:
+            return self.refresh()
+
+        if time.monotonic() - self._checked_at >= self.revalidate_interval:
+            # Only one request revalidates, the others use the last snapshot
+            if self._lock.acquire(blocking=False):
+                try:
+                    snapshot, rescanned = self._refresh()
+                finally:
+                    self._lock.release()
+                if rescanned:
+                    self._schedule_save()
+                return snapshot
+        return self._snapshot
+
+    def get_processor(self):
+        """
+        Get an ImageProcessor holding the current scan.
+
+        Returns:
+            ImageProcessor: Snapshot; treat its image_data as read-only
+        """
+        return self._current()
+
+    def get_categories(self):
+        """
+        Get the flat list of categories, see ImageProcessor.get_categories().
+
+        Returns:
+            list: Category dictionaries with path, name, parent and image counts
+        """
+        return self._current().get_categories()
+
+    def get_images_by_category(self, category_path):
+        """
+        Get the images of a category, see ImageProcessor.get_images_by_category().
+
+        Args:
+            category_path (str): Path to the category
+
+        Returns:
+            list: Image dictionaries in the category
+        """
+        return self._current().get_images_by_category(category_path)
+
+    def stats(self):
+        """
+        Report index counters.
+
+        Returns:
+            dict: Size, refreshes and directories rescanned
+        """
+        with self._lock:
+            return {
+                'directories': len(self._dirs),
+                'images': sum(len(entry.images) for entry in self._dirs.values()),
+                'loaded_from_disk': self._loaded,
+                'refreshes': self._refreshes,
+                'rescanned_directories': self._rescanned,
+                'last_refresh_seconds': self._last_refresh,
+                'revalidate_interval': self.revalidate_interval
+            }
+
+
+# Index used by the /api/images endpoints, configured by init_scan_index()
+scan_index = ScanIndex()
+
+def init_scan_index(app):
+    """
+    Configure the scan index from the app config and load the saved copy.
+
+    Args:
+        app: Flask application
+    """
+    scan_index.base_directory = os.path.join(app.config['UPLOAD_FOLDER'], CATALOG_FOLDER)
+    scan_index.index_file = app.config.get('SCAN_INDEX_FILE') or os.path.join(
+        app.config['UPLOAD_FOLDER'], 'cache', 'scan_index.json'
+    )
+    scan_index.revalidate_interval = app.config.get('SCAN_INDEX_REVALIDATE_SECONDS', 5)
+    scan_index.max_workers = app.config.get('IMAGE_SCAN_WORKERS', 1)
+    scan_index.load()
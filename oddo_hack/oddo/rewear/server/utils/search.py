@@ -0,0 +1,108 @@
+# File: rewear/server/utils/search.py
+
+import threading
+from sqlalchemy import inspect
+from sqlalchemy.dialects.mysql import match
+from config.database import db
+from models.item import Item
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Supported values for the 'search_mode' query parameter.
+# 'index' is served from utils.search_index when SEARCH_INDEX_ENABLED is set;
+# against the database it behaves like 'natural'.
+SEARCH_MODES = ('natural', 'boolean', 'like', 'index')
+
+# Default innodb_ft_min_token_size; shorter words are not in the FULLTEXT index
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+# Columns covered by the idx_search FULLTEXT index in database/schema.sql
+FULLTEXT_COLUMNS = ('title', 'description', 'tags')
+
+_fulltext_support = {}
+_fulltext_lock = threading.Lock()
+
+def fulltext_available(engine=None):
+    """
+    Check whether the items table has a usable FULLTEXT index.
+
+    The result is cached per engine, since it only changes with a schema
+    migration. Non-MySQL databases (e.g. SQLite) always report False.
+
+    Args:
+        engine: SQLAlchemy engine, defaults to the Flask-SQLAlchemy engine
+
+    Returns:
+        bool: True if MATCH ... AGAINST can be used on items
+    """
+    engine = engine or db.engine
+    key = str(engine.url)
+
+    if key in _fulltext_support:
+        return _fulltext_support[key]
+
+    with _fulltext_lock:
+        if key not in _fulltext_support:
+            available = False
+            if engine.dialect.name == 'mysql':
+                try:
+                    for index in inspect(engine).get_indexes(Item.__tablename__):
+                        prefix = index.get('dialect_options', {}).get('mysql_prefix')
+                        if prefix == 'FULLTEXT' and tuple(index['column_names']) == FULLTEXT_COLUMNS:
+                            available = True
+                            break
+                except Exception as e:
+                    logger.warning(f"Could not inspect FULLTEXT indexes: {str(e)}")
+
+            if not available:
+                logger.info("FULLTEXT search unavailable, using LIKE search")
+            _fulltext_support[key] = available
+
+    return _fulltext_support[key]
+
+def apply_item_search(query, search, mode=None):
+    """
+    Filter an Item query by a search term.
+
+    'natural' and 'boolean' use MATCH ... AGAINST on the idx_search
+    FULLTEXT index and return a relevance expression for ordering.
+    They fall back to the LIKE search when the database has no FULLTEXT
+    index, or when every word is shorter than the indexed minimum.
+
+    Args:
+        query: SQLAlchemy query over Item
+        search (str): Search term from the request
+        mode (str): One of SEARCH_MODES, defaults to 'natural'
+
+    Returns:
+        tuple: (query, relevance) where relevance is None for LIKE searches
+    """
+    mode = mode or 'natural'
+    if mode == 'index':
+        mode = 'natural'
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Invalid search mode: {mode}")
+
+    words = search.split()
+    use_fulltext = (
+        mode != 'like'
+        and any(len(word.strip('+-<>()~*"')) >= FULLTEXT_MIN_TOKEN_SIZE for word in words)
+        and fulltext_available()
+    )
+
+    if use_fulltext:
+        relevance = match(Item.title, Item.description, Item.tags, against=search)
+        if mode == 'boolean':
+            relevance = relevance.in_boolean_mode()
+        else:
+            relevance = relevance.in_natural_language_mode()
+        return query.filter(relevance), relevance
+
+    search_term = f"%{search}%"
+    query = query.filter(
+        (Item.title.like(search_term)) |
+        (Item.description.like(search_term)) |
+        (Item.tags.like(search_term))
+    )
+    return query, None
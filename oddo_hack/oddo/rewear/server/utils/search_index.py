@@ -0,0 +1,426 @@
+# File: rewear/server/utils/search_index.py
+
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+from utils.item_sync import ItemSync, items_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    """
+    Split text into lowercase alphanumeric tokens.
+
+    Args:
+        text (str): Text to tokenize, may be None
+
+    Returns:
+        list: List of tokens
+    """
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+class InvertedIndex:
+    """
+    In-memory inverted index over item title, description and tags,
+    ranked with BM25.
+
+    Documents are numbered in insertion order. Each term maps to a
+    posting list of two parallel arrays (document numbers and term
+    frequencies), so a posting costs 8 bytes instead of a Python object
+    and can be scored with NumPy without copying. Removed documents are
+    tombstoned and purged from the posting lists once they make up a
+    large enough share of the index.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, compact_ratio=0.25):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalization
+            compact_ratio (float): Share of dead documents that triggers compaction
+        """
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._term_ids = {}          # term -> term id
+        self._postings = []          # term id -> (array docnos, array tfs)
+        self._df = array('I')        # term id -> live document frequency
+        self._doc_keys = []          # docno -> item id (None once removed)
+        self._doc_category = array('I')  # docno -> category id
+        self._category_ids = {None: 0}   # category -> category id
+        self._alive = bytearray()    # docno -> 1 while the document is live
+        self._doc_len = array('I')   # docno -> token count
+        self._doc_terms = []         # docno -> array of term ids (None once removed)
+        self._docno = {}             # item id -> docno
+        self._live_docs = 0
+        self._total_len = 0
+        self._dead_docs = 0
+
+    def __len__(self):
+        return self._live_docs
+
+    def __contains__(self, key):
+        return key in self._docno
+
+    def keys(self):
+        """Item IDs in the index"""
+        with self._lock:
+            return list(self._docno)
+
+    def add(self, key, text, category=None):
+        """
+        Add or replace a document.
+
+        Args:
+            key (str): Item ID
+            text (str): Searchable text
+            category (str): Category used for filtering
+        """
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+
+        with self._lock:
+            if key in self._docno:
+                self._remove_locked(key)
+
+            docno = len(self._doc_keys)
+            term_ids = array('I')
+            for term, tf in counts.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = len(self._postings)
+                    self._term_ids[term] = term_id
+                    self._postings.append((array('I'), array('I')))
+                    self._df.append(0)
+                docnos, tfs = self._postings[term_id]
+                docnos.append(docno)
+                tfs.append(tf)
+                self._df[term_id] += 1
+                term_ids.append(term_id)
+
+            category_id = self._category_ids.setdefault(category, len(self._category_ids))
+
+            self._doc_keys.append(key)
+            self._doc_category.append(category_id)
+            self._alive.append(1)
+            self._doc_len.append(len(tokens))
+            self._doc_terms.append(term_ids)
+            self._docno[key] = docno
+            self._live_docs += 1
+            self._total_len += len(tokens)
+
+    def remove(self, key):
+        """
+        Remove a document if present.
+
+        Args:
+            key (str): Item ID
+
+        Returns:
+            bool: True if the document was in the index
+        """
+        with self._lock:
+            if key not in self._docno:
+                return False
+            self._remove_locked(key)
+            if self._dead_docs > self.compact_ratio * max(len(self._doc_keys), 1):
+                self._compact_locked()
+            return True
+
+    def _remove_locked(self, key):
+        docno = self._docno.pop(key)
+        for term_id in self._doc_terms[docno]:
+            self._df[term_id] -= 1
+        self._total_len -= self._doc_len[docno]
+        self._doc_keys[docno] = None
+        self._doc_terms[docno] = None
+        self._alive[docno] = 0
+        self._live_docs -= 1
+        self._dead_docs += 1
+
+    def _compact_locked(self):
+        """Drop tombstoned documents and renumber the remaining ones."""
+        remap = array('i', [-1]) * len(self._doc_keys)
+        doc_keys, doc_category, doc_len, doc_terms = [], array('I'), array('I'), []
+        for docno, key in enumerate(self._doc_keys):
+            if key is None:
+                continue
+            remap[docno] = len(doc_keys)
+            doc_keys.append(key)
+            doc_category.append(self._doc_category[docno])
+            doc_len.append(self._doc_len[docno])
+            doc_terms.append(self._doc_terms[docno])
+
+        remap = np.frombuffer(remap, dtype=np.int32)
+        postings = []
+        for docnos, tfs in self._postings:
+            new_docnos = remap[np.frombuffer(docnos, dtype=np.uint32)]
+            keep = new_docnos >= 0
+            postings.append((
+                array('I', new_docnos[keep].astype(np.uint32).tobytes()),
+                array('I', np.frombuffer(tfs, dtype=np.uint32)[keep].tobytes())
+            ))
+
+        self._postings = postings
+        self._doc_keys = doc_keys
+        self._doc_category = doc_category
+        self._doc_len = doc_len
+        self._doc_terms = doc_terms
+        self._alive = bytearray(b'\x01') * len(doc_keys)
+        self._docno = {key: docno for docno, key in enumerate(doc_keys)}
+        self._dead_docs = 0
+
+    def search(self, query, category=None, offset=0, limit=None):
+        """
+        Rank documents matching any query term with BM25.
+
+        Args:
+            query (str): Free-text query
+            category (str): Only return documents in this category
+            offset (int): Number of ranked results to skip
+            limit (int): Maximum number of results, or None for all
+
+        Returns:
+            tuple: (results, total) where results is a list of (item_id, score)
+                tuples, best first with ties favouring newer documents, and
+                total is the number of matching documents
+        """
+        terms = set(tokenize(query))
+
+        with self._lock:
+            if not self._live_docs:
+                return [], 0
+
+            category_id = None
+            if category is not None:
+                category_id = self._category_ids.get(category)
+                if category_id is None:
+                    return [], 0
+
+            term_ids = [self._term_ids[term] for term in terms
+                        if term in self._term_ids and self._df[self._term_ids[term]]]
+            if not term_ids:
+                return [], 0
+
+            docnos, scores = self._score_locked(term_ids, category_id)
+            total = len(docnos)
+
+            # Only fully sort the part of the ranking that is returned
+            end = total if limit is None else min(offset + limit, total)
+            if end <= offset:
+                return [], total
+            if end < total:
+                top = np.argpartition(-scores, end - 1)[:end]
+                docnos, scores = docnos[top], scores[top]
+            order = np.lexsort((-docnos.astype(np.int64), -scores))[offset:end]
+
+            doc_keys = self._doc_keys
+            return [(doc_keys[docno], float(score))
+                    for docno, score in zip(docnos[order].tolist(), scores[order].tolist())], total
+
+    def _score_locked(self, term_ids, category_id):
+        """
+        Compute BM25 scores for every live document containing a term.
+        NumPy views over the index arrays only live inside this call, so
+        they never block a later append from resizing the arrays.
+
+        Returns:
+            tuple: (docnos, scores) arrays of matching documents
+        """
+        n = self._live_docs
+        avgdl = self._total_len / n or 1.0
+        k1, b = self.k1, self.b
+        size = len(self._doc_keys)
+
+        doc_len = np.frombuffer(self._doc_len, dtype=np.uint32, count=size)
+        alive = np.frombuffer(self._alive, dtype=np.uint8, count=size)
+        scores = np.zeros(size, dtype=np.float64)
+
+        for term_id in term_ids:
+            df = self._df[term_id]
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            docnos, tfs = self._postings[term_id]
+            docnos = np.frombuffer(docnos, dtype=np.uint32)
+            tfs = np.frombuffer(tfs, dtype=np.uint32).astype(np.float64)
+            norm = k1 * (1 - b + b * doc_len[docnos] / avgdl)
+            scores[docnos] += idf * tfs * (k1 + 1) / (tfs + norm)
+
+        mask = (scores > 0) & (alive == 1)
+        if category_id is not None:
+            mask &= np.frombuffer(self._doc_category, dtype=np.uint32, count=size) == category_id
+
+        matches = np.flatnonzero(mask)
+        return matches, scores[matches]
+
+    def clear(self):
+        """Remove every document."""
+        with self._lock:
+            self._reset()
+
+    def replace(self, other):
+        """
+        Take over the documents of another index in one step, so searches
+        never see a partly built index.
+
+        Args:
+            other (InvertedIndex): Index built aside, not used afterwards
+        """
+        with self._lock, other._lock:
+            for name in ('_term_ids', '_postings', '_df', '_doc_keys', '_doc_category', '_category_ids',
+                         '_alive', '_doc_len', '_doc_terms', '_docno', '_live_docs', '_total_len',
+                         '_dead_docs'):
+                setattr(self, name, getattr(other, name))
+
+    def stats(self):
+        """
+        Report index size.
+
+        Returns:
+            dict: Document, term and posting counts and approximate memory use
+        """
+        with self._lock:
+            postings = sum(len(docnos) for docnos, _ in self._postings)
+            posting_bytes = sum(
+                docnos.buffer_info()[1] * docnos.itemsize + tfs.buffer_info()[1] * tfs.itemsize
+                for docnos, tfs in self._postings
+            )
+            doc_term_bytes = sum(
+                terms.buffer_info()[1] * terms.itemsize
+                for terms in self._doc_terms if terms is not None
+            )
+            return {
+                'documents': self._live_docs,
+                'dead_documents': self._dead_docs,
+                'terms': len(self._term_ids),
+                'postings': postings,
+                'posting_bytes': posting_bytes,
+                'approx_bytes': (
+                    posting_bytes + doc_term_bytes
+                    + sys.getsizeof(self._term_ids) + sys.getsizeof(self._docno)
+                    + self._doc_len.buffer_info()[1] * self._doc_len.itemsize
+                    + self._doc_category.buffer_info()[1] * self._doc_category.itemsize
+                    + len(self._alive)
+                )
+            }
+
+
+# Process-wide index of approved items, populated by init_search_index()
+search_index = InvertedIndex()
+
+def item_search_text(title, description, tags):
+    """Build the text indexed for an item"""
+    return ' '.join(part for part in (title, description, tags) if part)
+
+def index_item(item):
+    """
+    Add an approved item to the index, or remove it if it is no longer visible.
+
+    Args:
+        item: Item object
+    """
+    if item.status == 'approved':
+        search_index.add(
+            item.id,
+            item_search_text(item.title, item.description, item.tags),
+            item.category
+        )
+    else:
+        search_index.remove(item.id)
+
+def _upsert_row(row):
+    item_id, title, description, tags, category = row
+    search_index.add(item_id, item_search_text(title, description, tags), category)
+
+# items_changed only reaches receivers in the process that committed the
+# change; changes from other processes are read by revalidate_search_index()
+_sync = ItemSync(
+    'Search index', ('title', 'description', 'tags', 'category'),
+    _upsert_row, search_index.remove, search_index.keys
+)
+
+def build_search_index(batch_size=1000):
+    """
+    Rebuild the index from the approved rows of the items table.
+    Must be called inside an application context.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Returns:
+        int: Number of indexed items
+    """
+    from config.database import db
+    from models.item import Item
+
+    # Read before the rows, so a change committed meanwhile is synced afterwards
+    version = items_version()
+
+    rows = db.session.query(
+        Item.id, Item.title, Item.description, Item.tags, Item.category
+    ).filter(
+        Item.status == 'approved'
+    ).order_by(Item.created_at).execution_options(yield_per=batch_size)
+
+    # Built aside and swapped in, searches keep using the old index meanwhile
+    index = InvertedIndex(search_index.k1, search_index.b, search_index.compact_ratio)
+    for item_id, title, description, tags, category in rows:
+        index.add(item_id, item_search_text(title, description, tags), category)
+    search_index.replace(index)
+
+    _sync.mark_built(version)
+    logger.info(f"Search index built with {len(search_index)} items")
+    return len(search_index)
+
+def revalidate_search_index(interval):
+    """
+    Apply items changed by other processes to the index. Only the rows
+    updated since the last seen change are read, see ItemSync.
+    Must be called inside an application context.
+
+    Args:
+        interval (float): Seconds between checks
+
+    Returns:
+        int: Number of items updated in the index
+    """
+    return _sync.revalidate(interval)
+
+def _on_items_changed(sender, items=(), **extra):
+    for item in items:
+        try:
+            index_item(item)
+        except Exception as e:
+            logger.error(f"Error updating search index for item {item.id}: {str(e)}")
+
+def init_search_index(app):
+    """
+    Build the search index and keep it in sync with item changes,
+    if SEARCH_INDEX_ENABLED is set. Changes made by other worker
+    processes are picked up by revalidate_search_index().
+
+    Args:
+        app: Flask application
+    """
+    if not app.config.get('SEARCH_INDEX_ENABLED'):
+        return
+
+    from utils.events import items_changed
+
+    with app.app_context():
+        build_search_index()
+
+    items_changed.connect(_on_items_changed, weak=False)
@@ -0,0 +1,158 @@
+# File: rewear/server/utils/serializers.py
+
+from collections import defaultdict
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from models.user import User
+from models.item import Item, ItemImage
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Named field sets that can be used in a fields= parameter
+FIELD_SETS = {
+    'card': (
+        'id', 'title', 'category', 'size', 'condition', 'status',
+        'is_featured', 'created_at', 'updated_at', 'primary_image'
+    )
+}
+
+# Fields every projection carries, needed for ETags and cursors
+REQUIRED_FIELDS = ('id', 'updated_at')
+
+# 'images' limited to the primary image
+PRIMARY_IMAGE = 'primary_image'
+
+# Columns always loaded: keys, ordering and relationship lookups
+_BASE_COLUMNS = ('id', 'owner_id', 'created_at', 'updated_at')
+
+class InvalidFieldsError(ValueError):
+    """Raised when a fields parameter names an unknown field"""
+
+def parse_fields(value):
+    """
+    Parse a comma-separated fields parameter.
+
+    Accepts item fields (see Item.FIELDS), 'owner', 'primary_image' and
+    the names of FIELD_SETS, e.g. 'card,owner'.
+
+    Args:
+        value (str): Raw parameter value, may be None
+
+    Returns:
+        frozenset: Requested fields, or None for the full representation
+
+    Raises:
+        InvalidFieldsError: If a field is unknown
+    """
+    if not value or not value.strip():
+        return None
+
+    allowed = set(Item.FIELDS) | {'owner', PRIMARY_IMAGE}
+    fields = set(REQUIRED_FIELDS)
+    for name in value.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name in FIELD_SETS:
+            fields.update(FIELD_SETS[name])
+        elif name in allowed:
+            fields.add(name)
+        else:
+            raise InvalidFieldsError(name)
+
+    # All images take precedence over the primary image only
+    if 'images' in fields:
+        fields.discard(PRIMARY_IMAGE)
+    return frozenset(fields)
+
+def item_load_options(fields):
+    """
+    Get query options that load only the columns needed for fields,
+    so that e.g. the description TEXT column is not read for cards.
+
+    Args:
+        fields (frozenset): Result of parse_fields(), or None
+
+    Returns:
+        list: Options for query.options()
+    """
+    if fields is None:
+        return []
+    columns = set(_BASE_COLUMNS)
+    columns.update(
+        field for field in fields
+        if field in Item.FIELDS and field != 'images'
+    )
+    return [load_only(*(getattr(Item, column) for column in sorted(columns)))]
+
+def preload_item_relations(items, include_owner=False, include_images=True,
+                           primary_image_only=False):
+    """
+    Load images (and optionally owners) for a list of items with one
+    query per relationship, and attach them to the items so that
+    Item.to_dict() does not trigger any further lazy loads.
+
+    Args:
+        items (list): Item objects, typically one page of a listing
+        include_owner (bool): Whether owners should be loaded as well
+        include_images (bool): Whether images should be loaded
+        primary_image_only (bool): Load only the primary image of each item
+
+    Returns:
+        list: The same items, with relationships populated
+    """
+    if not items:
+        return items
+
+    if include_images:
+        images_by_item = defaultdict(list)
+        item_ids = [item.id for item in items]
+        images = ItemImage.query.filter(ItemImage.item_id.in_(item_ids))
+        if primary_image_only:
+            images = images.filter(ItemImage.is_primary == True)
+        for image in images.all():
+            images_by_item[image.item_id].append(image)
+
+        for item in items:
+            set_committed_value(item, 'images', images_by_item.get(item.id, []))
+
+    if include_owner:
+        owner_ids = {item.owner_id for item in items}
+        owners = {user.id: user for user in User.query.filter(User.id.in_(owner_ids)).all()}
+        for item in items:
+            set_committed_value(item, 'owner', owners.get(item.owner_id))
+
+    return items
+
+def serialize_items(items, include_owner=False, fields=None):
+    """
+    Serialize a list of items with a constant number of queries.
+
+    Without fields, produces exactly the same dictionaries as calling
+    item.to_dict(include_owner) on every item.
+
+    Args:
+        items (list): Item objects to serialize
+        include_owner (bool): Whether to include owner details
+        fields (frozenset): Projection from parse_fields(); when given it
+            replaces include_owner with 'owner' in fields
+
+    Returns:
+        list: List of item dictionaries, in the same order as items
+    """
+    if fields is None:
+        preload_item_relations(items, include_owner=include_owner)
+        return [item.to_dict(include_owner=include_owner) for item in items]
+
+    include_owner = 'owner' in fields
+    with_images = 'images' in fields or PRIMARY_IMAGE in fields
+    preload_item_relations(
+        items, include_owner=include_owner, include_images=with_images,
+        primary_image_only=PRIMARY_IMAGE in fields
+    )
+
+    item_fields = set(fields)
+    if with_images:
+        item_fields.add('images')
+    return [item.to_dict(include_owner=include_owner, fields=item_fields) for item in items]
@@ -0,0 +1,433 @@
+# File: rewear/server/utils/similarity.py
+
+import math
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+from models.item import ITEM_CATEGORIES, ITEM_SIZES, ITEM_CONDITIONS
+from utils.tags import parse_tags
+from utils.item_sync import ItemSync, items_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _bucket(value, size):
+    """Map a string to a stable bucket in [0, size)"""
+    return zlib.crc32(value.encode('utf-8')) % size
+
+def _vocabulary(values):
+    """Map known values, lowercased, to their one-hot column"""
+    return {value.lower(): column for column, value in enumerate(values)}
+
+class SimilarityIndex:
+    """
+    Content-based nearest neighbours for approved items.
+
+    Every item is encoded as a fixed-width float32 vector with one block
+    per attribute: one-hot category, size and condition over the values
+    the item form offers, with one overflow column for any other value,
+    plus TF-IDF weighted tags hashed into buckets. Each block is L2-normalized and
+    scaled by the square root of its weight, so the dot product of two
+    vectors is the weighted sum of the per-attribute cosine similarities.
+    The top-k neighbours of every item are precomputed with blocked
+    matrix products and kept up to date as items are added or removed.
+
+    The category weight is larger than all other weights combined, so
+    an item whose category holds at least k other items always has its
+    neighbours inside that category; those items are only compared
+    within their category, which keeps the build far below N^2.
+    """
+
+    # Exact value -> column maps; the column after the last is for unknown values
+    VOCABULARIES = {
+        'category': _vocabulary(category for category, _ in ITEM_CATEGORIES),
+        'size': _vocabulary(ITEM_SIZES),
+        'condition': _vocabulary(ITEM_CONDITIONS),
+    }
+
+    # Block layout: (name, dimensions, weight)
+    BLOCKS = (
+        ('category', len(VOCABULARIES['category']) + 1, 0.55),
+        ('tags', 64, 0.30),
+        ('size', len(VOCABULARIES['size']) + 1, 0.10),
+        ('condition', len(VOCABULARIES['condition']) + 1, 0.05),
+    )
+
+    def __init__(self, k=8, block_cells=1 << 24):
+        """
+        Initialize an empty index.
+
+        Args:
+            k (int): Neighbours kept per item
+            block_cells (int): Maximum size of one block of the score matrix,
+                which bounds the memory used while building
+        """
+        self.k = k
+        self.block_cells = block_cells
+        self.dim = sum(dims for _, dims, _ in self.BLOCKS)
+        self._lock = threading.RLock()
+        self._offsets = {}
+        offset = 0
+        for name, dims, weight in self.BLOCKS:
+            self._offsets[name] = (offset, dims, math.sqrt(weight))
+            offset += dims
+        self._reset(0)
+
+    def _reset(self, capacity):
+        capacity = max(capacity, 16)
+        self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._groups = np.full(capacity, -1, dtype=np.int32)  # category group per row
+        self._group_ids = {}     # lowercased category -> group
+        self._neighbors = np.full((capacity, self.k), -1, dtype=np.int32)
+        self._scores = np.full((capacity, self.k), -np.inf, dtype=np.float32)
+        self._keys = []          # row -> item id (None for free rows)
+        self._rows = {}          # item id -> row
+        self._free_rows = []
+        self._idf = {}
+        self._default_idf = 1.0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def keys(self):
+        """Item IDs in the index"""
+        with self._lock:
+            return list(self._rows)
+
+    def _group(self, category):
+        if not category:
+            return -1
+        return self._group_ids.setdefault(category.lower(), len(self._group_ids))
+
+    def _encode(self, category, size, condition, tags):
+        vector = np.zeros(self.dim, dtype=np.float32)
+
+        for name, value in (('category', category), ('size', size), ('condition', condition)):
+            if value:
+                offset, dims, scale = self._offsets[name]
+                vector[offset + self.VOCABULARIES[name].get(value.lower(), dims - 1)] = scale
+
+        tag_list = parse_tags(tags)
+        if tag_list:
+            offset, dims, scale = self._offsets['tags']
+            block = vector[offset:offset + dims]
+            for tag, tf in Counter(tag_list).items():
+                block[_bucket(tag, dims)] += tf * self._idf.get(tag, self._default_idf)
+            norm = np.linalg.norm(block)
+            if norm:
+                block *= scale / norm
+
+        return vector
+
+    def _grow(self, capacity):
+        old = len(self._alive)
+        if capacity <= old:
+            return
+        capacity = max(capacity, old * 2)
+        self._vectors = np.vstack([self._vectors, np.zeros((capacity - old, self.dim), dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - old, dtype=bool)])
+        self._groups = np.concatenate([self._groups, np.full(capacity - old, -1, dtype=np.int32)])
+        self._neighbors = np.vstack([self._neighbors, np.full((capacity - old, self.k), -1, dtype=np.int32)])
+        self._scores = np.vstack([self._scores, np.full((capacity - old, self.k), -np.inf, dtype=np.float32)])
+
+    def _top_k(self, scores):
+        """Return (rows, scores) of the k best columns of each score row, best first."""
+        k = min(self.k, scores.shape[1])
+        if k == 0:
+            return (np.full((scores.shape[0], self.k), -1, dtype=np.int32),
+                    np.full((scores.shape[0], self.k), -np.inf, dtype=np.float32))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top[~np.isfinite(top_scores)] = -1
+
+        rows = np.full((scores.shape[0], self.k), -1, dtype=np.int32)
+        values = np.full((scores.shape[0], self.k), -np.inf, dtype=np.float32)
+        rows[:, :k] = top
+        values[:, :k] = top_scores
+        return rows, values
+
+    def _refresh_rows(self, rows):
+        """Recompute the neighbour lists of the given rows."""
+        n = len(self._keys)
+        alive = self._alive[:n]
+        groups = self._groups[:n]
+        rows = np.asarray(rows, dtype=np.int64)
+
+        for group in np.unique(groups[rows]).tolist():
+            group_rows = rows[groups[rows] == group]
+            candidates = np.flatnonzero(alive & (groups == group)) if group >= 0 else None
+            if candidates is None or len(candidates) <= self.k:
+                # Too few items in the category: compare against everything
+                candidates = np.arange(n)
+            self._refresh_against(group_rows, candidates)
+
+    def _refresh_against(self, rows, candidates):
+        candidate_vectors = self._vectors[candidates]
+        dead = ~self._alive[candidates]
+        step = max(1, self.block_cells // max(len(candidates), 1))
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            scores = self._vectors[block] @ candidate_vectors.T
+            scores[:, dead] = -np.inf
+            # Exclude each row from its own neighbours
+            self_columns = np.searchsorted(candidates, block)
+            in_candidates = (self_columns < len(candidates)) & (
+                candidates[np.minimum(self_columns, len(candidates) - 1)] == block
+            )
+            scores[np.flatnonzero(in_candidates), self_columns[in_candidates]] = -np.inf
+            top, values = self._top_k(scores)
+            top[top >= 0] = candidates[top[top >= 0]]
+            self._neighbors[block], self._scores[block] = top, values
+
+    def build(self, items):
+        """
+        Replace the index contents and precompute all neighbour lists.
+
+        Args:
+            items (list): (item_id, category, size, condition, tags) tuples
+        """
+        items = list(items)
+        document_frequency = Counter()
+        for _, _, _, _, tags in items:
+            document_frequency.update(set(parse_tags(tags)))
+
+        with self._lock:
+            self._reset(len(items))
+            total = len(items)
+            self._idf = {
+                tag: math.log((1 + total) / (1 + df)) + 1
+                for tag, df in document_frequency.items()
+            }
+            self._default_idf = math.log(1 + total) + 1
+
+            for row, (item_id, category, size, condition, tags) in enumerate(items):
+                self._vectors[row] = self._encode(category, size, condition, tags)
+                self._groups[row] = self._group(category)
+                self._alive[row] = True
+                self._keys.append(item_id)
+                self._rows[item_id] = row
+
+            self._refresh_rows(list(range(total)))
+
+    def upsert(self, item_id, category, size, condition, tags):
+        """
+        Add or update an item and fix up the neighbour lists it affects.
+
+        Args:
+            item_id (str): Item ID
+            category (str): Item category
+            size (str): Item size
+            condition (str): Item condition
+            tags (str): Comma-separated tags
+        """
+        vector = self._encode(category, size, condition, tags)
+
+        with self._lock:
+            stale = []
+            if item_id in self._rows:
+                row = self._rows[item_id]
+                stale = self._rows_pointing_to(row)
+            elif self._free_rows:
+                row = self._free_rows.pop()
+                self._keys[row] = item_id
+                self._rows[item_id] = row
+            else:
+                row = len(self._keys)
+                self._grow(row + 1)
+                self._keys.append(item_id)
+                self._rows[item_id] = row
+
+            self._vectors[row] = vector
+            self._groups[row] = self._group(category)
+            self._alive[row] = True
+
+            n = len(self._keys)
+            scores = self._vectors[:n] @ vector
+            scores[~self._alive[:n]] = -np.inf
+            scores[row] = -np.inf
+            self._neighbors[row], self._scores[row] = self._top_k(scores[np.newaxis, :])
+
+            # Rows whose neighbours pointed at the old vector are recomputed;
+            # every other row only needs the new item inserted if it ranks
+            stale_set = set(stale)
+            better = np.flatnonzero(scores > self._scores[:n, -1])
+            for other in better.tolist():
+                if other not in stale_set:
+                    self._insert_neighbor(other, row, scores[other])
+            if stale:
+                self._refresh_rows(stale)
+
+    def _insert_neighbor(self, row, neighbor, score):
+        neighbors, scores = self._neighbors[row], self._scores[row]
+        position = int(np.searchsorted(-scores, -score, side='right'))
+        neighbors[position + 1:] = neighbors[position:-1].copy()
+        scores[position + 1:] = scores[position:-1].copy()
+        neighbors[position] = neighbor
+        scores[position] = score
+
+    def _rows_pointing_to(self, row):
+        n = len(self._keys)
+        return np.flatnonzero((self._neighbors[:n] == row).any(axis=1)).tolist()
+
+    def remove(self, item_id):
+        """
+        Remove an item and recompute the neighbour lists that contained it.
+
+        Args:
+            item_id (str): Item ID
+
+        Returns:
+            bool: True if the item was in the index
+        """
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return False
+
+            self._alive[row] = False
+            self._groups[row] = -1
+            self._vectors[row] = 0
+            self._neighbors[row] = -1
+            self._scores[row] = -np.inf
+            self._keys[row] = None
+            self._free_rows.append(row)
+
+            stale = self._rows_pointing_to(row)
+            if stale:
+                self._refresh_rows(stale)
+            return True
+
+    def neighbors(self, item_id, limit=None):
+        """
+        Get the precomputed most similar items.
+
+        Args:
+            item_id (str): Item ID
+            limit (int): Maximum number of neighbours, defaults to k
+
+        Returns:
+            list: Item IDs, most similar first, or None if the item is not indexed
+        """
+        with self._lock:
+            row = self._rows.get(item_id)
+            if row is None:
+                return None
+            keys = self._keys
+            result = [keys[other] for other in self._neighbors[row].tolist() if other >= 0]
+        return result[:limit] if limit else result
+
+    def stats(self):
+        """
+        Report index size.
+
+        Returns:
+            dict: Item count, vector dimensions, neighbours per item and memory use
+        """
+        with self._lock:
+            return {
+                'items': len(self._rows),
+                'dimensions': self.dim,
+                'k': self.k,
+                'bytes': int(self._vectors.nbytes + self._neighbors.nbytes + self._scores.nbytes)
+            }
+
+
+# Process-wide similarity index, populated by init_similarity_index()
+similarity_index = SimilarityIndex()
+
+# items_changed only reaches receivers in the process that committed the
+# change; changes from other processes are read by revalidate_similarity_index()
+_sync = ItemSync(
+    'Similarity index', ('category', 'size', 'condition', 'tags'),
+    lambda row: similarity_index.upsert(*row), similarity_index.remove, similarity_index.keys
+)
+
+def index_item_similarity(item):
+    """
+    Add an approved item to the similarity index, or remove it if it is no longer visible.
+
+    Args:
+        item: Item object
+    """
+    if item.status == 'approved':
+        similarity_index.upsert(item.id, item.category, item.size, item.condition, item.tags)
+    else:
+        similarity_index.remove(item.id)
+
+def build_similarity_index(batch_size=1000):
+    """
+    Rebuild the similarity index from the approved rows of the items table.
+    Must be called inside an application context.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Returns:
+        int: Number of indexed items
+    """
+    from config.database import db
+    from models.item import Item
+
+    # Read before the rows, so a change committed meanwhile is synced afterwards
+    version = items_version()
+
+    rows = db.session.query(
+        Item.id, Item.category, Item.size, Item.condition, Item.tags
+    ).filter(
+        Item.status == 'approved'
+    ).execution_options(yield_per=batch_size)
+
+    similarity_index.build(tuple(row) for row in rows)
+    _sync.mark_built(version)
+    logger.info(f"Similarity index built with {len(similarity_index)} items")
+    return len(similarity_index)
+
+def revalidate_similarity_index(interval):
+    """
+    Apply items changed by other processes to the index. Only the rows
+    updated since the last seen change are read, see ItemSync.
+    Must be called inside an application context.
+
+    Args:
+        interval (float): Seconds between checks
+
+    Returns:
+        int: Number of items updated in the index
+    """
+    return _sync.revalidate(interval)
+
+def _on_items_changed(sender, items=(), **extra):
+    for item in items:
+        try:
+            index_item_similarity(item)
+        except Exception as e:
+            logger.error(f"Error updating similarity index for item {item.id}: {str(e)}")
+
+def init_similarity_index(app):
+    """
+    Build the similarity index and keep it in sync with item changes,
+    if SIMILARITY_INDEX_ENABLED is set. Changes made by other worker
+    processes are picked up by revalidate_similarity_index().
+
+    Args:
+        app: Flask application
+    """
+    if not app.config.get('SIMILARITY_INDEX_ENABLED'):
+        return
+
+    from utils.events import items_changed
+
+    similarity_index.k = app.config.get('SIMILARITY_TOP_K', similarity_index.k)
+
+    with app.app_context():
+        build_similarity_index()
+
+    items_changed.connect(_on_items_changed, weak=False)
@@ -0,0 +1,161 @@
+# File: rewear/server/utils/static_files.py
+
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+from flask import send_from_directory, make_response
+from werkzeug.security import safe_join
+
+UPLOAD_SERVE_MODES = ('sendfile', 'x-accel')
+
+# Folders whose file names are unique to their content, so a URL never
+# changes meaning: content hashes, upload UUIDs and derivatives of those
+IMMUTABLE_FOLDERS = ('items', 'profile_images', 'derivatives')
+
+# Folder below UPLOAD_FOLDER holding the scanned catalog images, and the
+# URL prefix of its files
+CATALOG_FOLDER = 'Bewakoof'
+CATALOG_URL = f"/uploads/{CATALOG_FOLDER}/"
+
+# The only folders served below /uploads/. Everything else in
+# UPLOAD_FOLDER (partial uploads, the resize cache, scan indexes and
+# exports) is private.
+MEDIA_FOLDERS = IMMUTABLE_FOLDERS + (CATALOG_FOLDER,)
+
+# One year, the longest max-age caches are expected to honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def _top_folder(path):
+    return path.split('/', 1)[0]
+
+def resolve_upload(upload_folder, path):
+    """
+    Map a URL path below /uploads/ to a file on disk.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        path (str): Path below /uploads/, e.g. items/<sha256>.jpg
+
+    Returns:
+        str: Absolute file path, or None if the file may not be served
+    """
+    # Paths such as items/../tmp/x would pass the folder check below
+    if posixpath.normpath(path) != path or _top_folder(path) not in MEDIA_FOLDERS:
+        return None
+    full_path = safe_join(upload_folder, path)
+    if full_path is None or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+def is_immutable(path):
+    """Whether the file at a path below /uploads/ can never change"""
+    return _top_folder(path) in IMMUTABLE_FOLDERS
+
+def send_upload(upload_folder, path, mode='sendfile', accel_prefix='/internal-uploads/', max_age=3600):
+    """
+    Build the response for an uploaded file.
+
+    In 'sendfile' mode the file is sent by Flask with conditional=True,
+    which answers Range, If-Modified-Since and If-None-Match requests and
+    lets the WSGI server use its zero-copy file wrapper. In 'x-accel' mode
+    the response only carries an X-Accel-Redirect header and nginx sends
+    the file from the internal location written by nginx_config().
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        path (str): Path below /uploads/, already checked with resolve_upload()
+        mode (str): One of UPLOAD_SERVE_MODES
+        accel_prefix (str): Internal nginx location of the uploads folder
+        max_age (int): Cache lifetime in seconds of files that may change
+
+    Returns:
+        Response: File response with caching headers
+    """
+    immutable = is_immutable(path)
+
+    if mode == 'x-accel':
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(path)}"
+        response.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    else:
+        response = send_from_directory(
+            upload_folder, path, conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if immutable else max_age
+        )
+
+    return set_cache_headers(response, immutable, max_age)
+
+def set_cache_headers(response, immutable, max_age=3600):
+    """
+    Mark a file response as publicly cacheable.
+
+    Args:
+        response: Flask response
+        immutable (bool): Whether the content behind the URL can never change
+        max_age (int): Cache lifetime in seconds if it can
+
+    Returns:
+        Response: The same response
+    """
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = max_age
+    return response
+
+def nginx_config(upload_folder, upstream, accel_prefix='/internal-uploads/', direct=True):
+    """
+    Render nginx location blocks for serving /uploads in front of the app.
+
+    Args:
+        upload_folder (str): Path of the uploads folder as seen by nginx
+        upstream (str): Address of the Flask app, e.g. http://server:5000
+        accel_prefix (str): Internal location used by X-Accel-Redirect
+        direct (bool): Serve immutable folders without asking the app
+
+    Returns:
+        str: Configuration to include in a server block
+    """
+    root = upload_folder.rstrip('/')
+    prefix = f"/{accel_prefix.strip('/')}/"
+    lines = [
+        '# Generated by "flask uploads-nginx-config"; include in the server block.',
+        '# Run the app with UPLOADS_SERVE_MODE=x-accel and',
+        f'# UPLOADS_ACCEL_PREFIX={prefix}',
+        ''
+    ]
+
+    if direct:
+        folders = '|'.join(IMMUTABLE_FOLDERS)
+        lines += [
+            '# Content-unique files never change and are served by nginx directly',
+            f'location ~ ^/uploads/((?:{folders})/.+)$ {{',
+            f'    alias {root}/$1;',
+            '    sendfile on;',
+            '    tcp_nopush on;',
+            '    open_file_cache max=10000 inactive=60s;',
+            f'    add_header Cache-Control "public, max-age={IMMUTABLE_MAX_AGE}, immutable";',
+            '}',
+            ''
+        ]
+
+    lines += [
+        '# Other uploads are checked by the app, which answers with X-Accel-Redirect',
+        'location /uploads/ {',
+        f'    proxy_pass {upstream.rstrip("/")};',
+        '    proxy_set_header Host $host;',
+        '}',
+        '',
+        f'location {prefix} {{',
+        '    internal;',
+        f'    alias {root}/;',
+        '    sendfile on;',
+        '    tcp_nopush on;',
+        '    open_file_cache max=10000 inactive=60s;',
+        '}',
+        ''
+    ]
+    return '\n'.join(lines)
@@ -0,0 +1,365 @@
+# File: rewear/server/utils/storage.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import IntegrityError
+from config.database import db
+from models.stored_file import StoredFile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Read size while streaming an upload through the hash
+HASH_CHUNK_SIZE = 1 << 20
+
+# Extensions that name the same kind of file
+_EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+# Formats whose metadata strip_metadata() removes; GIFs carry no EXIF
+# and re-saving would drop their animation
+_STRIPPED_FORMATS = ('JPEG', 'PNG')
+
+# EXIF tag of the orientation the camera was held in
+EXIF_ORIENTATION = 0x0112
+
+# Image.info keys of XMP packets, which can repeat the EXIF GPS position
+_XMP_KEYS = ('xmp', 'XML:com.adobe.xmp')
+
+# An upload named by the SHA-256 of its content: its URL path, the file
+# it is stored as, and the temporary file holding it until add_references()
+# moves it there
+StoredUpload = namedtuple('StoredUpload', ['path', 'digest', 'size', 'file', 'pending'])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(max_workers=4):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage')
+        return _pool
+
+def normalize_extension(ext):
+    """Lowercase an extension and map aliases such as jpeg to jpg"""
+    ext = ext.lower().lstrip('.')
+    return _EXTENSION_ALIASES.get(ext, ext)
+
+def strip_metadata(path):
+    """
+    Remove EXIF (camera details, GPS position) and XMP metadata from an
+    image file in place. The EXIF orientation is applied to the pixels
+    first so the image still displays upright, and the colour profile is
+    kept. JPEGs that need no rotation keep their quantization tables, so
+    they are not recompressed at a lower quality.
+
+    Files without metadata and files that are not a readable JPEG or
+    PNG are left untouched.
+
+    Args:
+        path (str): Image file
+
+    Returns:
+        bool: True if the file was rewritten
+    """
+    try:
+        with Image.open(path) as image:
+            if image.format not in _STRIPPED_FORMATS:
+                return False
+            exif = image.getexif()
+            if not exif and not any(key in image.info for key in _XMP_KEYS):
+                return False
+
+            options = {}
+            if 'icc_profile' in image.info:
+                options['icc_profile'] = image.info['icc_profile']
+            if 'dpi' in image.info:
+                options['dpi'] = image.info['dpi']
+            if image.format == 'PNG' and 'transparency' in image.info:
+                options['transparency'] = image.info['transparency']
+
+            rotated = exif.get(EXIF_ORIENTATION, 1) != 1
+            upright = ImageOps.exif_transpose(image) if rotated else image
+            if image.format == 'JPEG':
+                if rotated:
+                    options['quality'] = 95
+                else:
+                    options.update(quality='keep', subsampling='keep')
+                options['progressive'] = 'progressive' in image.info
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                upright.save(tmp_path, image.format, **options)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not strip metadata from {path}: {str(e)}")
+        return False
+
+    os.replace(tmp_path, path)
+    return True
+
+def _hash_file(path):
+    """SHA-256 hex digest and size of a file"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def store_stream(stream, upload_folder, folder, ext):
+    """
+    Stream a file to a temporary file while hashing it. Its final name is
+    uploads/<folder>/<sha256>.<ext>, so identical content always ends up
+    at the same path and repeated uploads are stored once. The file is
+    moved there by add_references(), under the lock of its stored_files
+    row, so it cannot be deleted between the check for an existing copy
+    and the new reference; discard_uploads() removes it if the
+    transaction rolls back instead.
+
+    Image metadata is stripped before the file is named, see
+    strip_metadata(), so the stored original carries no location.
+
+    Args:
+        stream: Binary file object to read
+        upload_folder (str): UPLOAD_FOLDER of the app
+        folder (str): Sub-folder, e.g. 'items' or 'profile_images'
+        ext (str): File extension
+
+    Returns:
+        StoredUpload: URL path, digest and size of the stored file
+    """
+    ext = normalize_extension(ext)
+    target_dir = os.path.join(upload_folder, folder)
+    tmp_dir = os.path.join(upload_folder, 'tmp')
+    os.makedirs(target_dir, exist_ok=True)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        digest = digest.hexdigest()
+        if strip_metadata(tmp_path):
+            digest, size = _hash_file(tmp_path)
+
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    filename = f"{digest}.{ext}"
+    return StoredUpload(
+        f"/uploads/{folder}/{filename}", digest, size,
+        os.path.join(target_dir, filename), tmp_path
+    )
+
+def store_uploads(files, upload_folder, folder, max_workers=4):
+    """
+    Store several uploads concurrently.
+
+    Args:
+        files (list): (stream, ext) tuples
+        upload_folder (str): UPLOAD_FOLDER of the app
+        folder (str): Sub-folder, e.g. 'items'
+        max_workers (int): Size of the shared writer pool, used on first call
+
+    Returns:
+        list: StoredUpload for each file, in the same order
+
+    Raises:
+        Exception: The first failure, after the temporary files of the
+            other uploads were removed
+    """
+    if len(files) == 1:
+        stream, ext = files[0]
+        return [store_stream(stream, upload_folder, folder, ext)]
+
+    pool = _get_pool(max_workers)
+    futures = [
+        pool.submit(store_stream, stream, upload_folder, folder, ext)
+        for stream, ext in files
+    ]
+
+    # Every write is waited for, so none is left behind when one fails
+    stored = []
+    error = None
+    for future in futures:
+        try:
+            stored.append(future.result())
+        except Exception as e:
+            error = error or e
+
+    if error is not None:
+        # Nothing references them yet, so only the temporary files exist
+        _remove_pending(stored)
+        raise error
+    return stored
+
+def _lock_row(upload):
+    """
+    Lock the stored_files row of an upload in the current transaction,
+    creating it without references if it does not exist.
+
+    Returns:
+        int: Reference count of the row
+    """
+    table = StoredFile.__table__
+    locked = select(table.c.ref_count).where(table.c.path == upload.path).with_for_update()
+    ref_count = db.session.execute(locked).scalar()
+    if ref_count is not None:
+        return ref_count
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(
+                path=upload.path, digest=upload.digest, size=upload.size, ref_count=0
+            ))
+        return 0
+    except IntegrityError:
+        # Inserted concurrently by another request
+        return db.session.execute(locked).scalar()
+
+def _remove_pending(uploads):
+    for upload in uploads:
+        if upload.pending and os.path.exists(upload.pending):
+            os.remove(upload.pending)
+
+def add_references(uploads):
+    """
+    Count references to stored uploads in the current transaction and
+    move their files into place. Each row stays locked until the caller
+    commits, so delete_file() cannot remove a file that just gained a
+    reference.
+
+    Args:
+        uploads (iterable): StoredUpload objects, one per referencing row
+    """
+    table = StoredFile.__table__
+    by_path = {}
+    for upload in uploads:
+        by_path.setdefault(upload.path, []).append(upload)
+
+    # Rows are locked in path order, so concurrent requests cannot deadlock
+    for path in sorted(by_path):
+        group = by_path[path]
+        _lock_row(group[0])
+
+        pending = [upload for upload in group if upload.pending and os.path.exists(upload.pending)]
+        if pending and not os.path.exists(group[0].file):
+            os.replace(pending.pop().pending, group[0].file)
+        _remove_pending(pending)
+
+        db.session.execute(
+            update(table).where(table.c.path == path)
+            .values(ref_count=table.c.ref_count + len(group))
+        )
+
+def discard_uploads(upload_folder, uploads):
+    """
+    Clean up after a transaction that stored uploads rolled back:
+    temporary files are removed, and files that add_references() moved
+    into place are deleted unless something else references them.
+    Commits one short transaction per file.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        uploads (iterable): StoredUpload objects of the rolled back transaction
+    """
+    uploads = list(uploads)
+    _remove_pending(uploads)
+    for upload in {upload.path: upload for upload in uploads}.values():
+        try:
+            if _lock_row(upload) == 0:
+                _delete_locked(upload_folder, upload.path)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not discard stored file {upload.path}: {str(e)}")
+
+def release_file(path):
+    """
+    Drop one reference to a stored upload in the current transaction.
+
+    Files saved before content-addressed storage have no row and are
+    left alone.
+
+    Args:
+        path (str): URL path of the file
+
+    Returns:
+        bool: True if this was the last reference; the caller should call
+            delete_file(path) after committing. The row is kept with no
+            references until then.
+    """
+    table = StoredFile.__table__
+    result = db.session.execute(
+        update(table).where(table.c.path == path, table.c.ref_count > 0)
+        .values(ref_count=table.c.ref_count - 1)
+    )
+    if not result.rowcount:
+        return False
+    ref_count = db.session.execute(select(table.c.ref_count).where(table.c.path == path)).scalar()
+    return ref_count == 0
+
+def delete_file(upload_folder, path):
+    """
+    Remove an unreferenced upload from disk, unless it has been
+    referenced again since it was released. The file is removed while
+    its stored_files row is locked, so a concurrent add_references()
+    either runs first and keeps it or runs after and stores it again.
+    Commits the current transaction.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        path (str): URL path of the file
+    """
+    table = StoredFile.__table__
+    ref_count = db.session.execute(
+        select(table.c.ref_count).where(table.c.path == path).with_for_update()
+    ).scalar()
+    # No row: stored before reference counting, or already deleted
+    if ref_count == 0:
+        _delete_locked(upload_folder, path)
+    db.session.commit()
+
+def _delete_locked(upload_folder, path):
+    """Remove a file and its derivatives, and its row, which the caller has locked"""
+    table = StoredFile.__table__
+    db.session.execute(delete(table).where(table.c.path == path))
+    relative = path.split('/uploads/', 1)[-1]
+    try:
+        os.remove(os.path.join(upload_folder, relative))
+    except FileNotFoundError:
+        pass  # Never moved into place
+    except OSError as e:
+        logger.warning(f"Could not delete stored file {path}: {str(e)}")
+
+    # Resized copies made by the derivative pipeline
+    shutil.rmtree(
+        os.path.join(upload_folder, 'derivatives', os.path.splitext(relative)[0]),
+        ignore_errors=True
+    )
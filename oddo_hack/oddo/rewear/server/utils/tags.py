@@ -0,0 +1,168 @@
+# File: rewear/server/utils/tags.py
+
+from sqlalchemy import select, delete, insert
+from sqlalchemy.exc import IntegrityError
+from config.database import db
+from models.item import Item
+from models.tag import Tag, item_tags
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Matches the length of tags.name
+MAX_TAG_LENGTH = 50
+
+def normalize_tag(tag):
+    """
+    Normalize a single tag: lowercase, trimmed, inner whitespace collapsed.
+
+    Args:
+        tag (str): Raw tag
+
+    Returns:
+        str: Normalized tag, or an empty string
+    """
+    return ' '.join(tag.lower().split())[:MAX_TAG_LENGTH]
+
+def parse_tags(tags):
+    """
+    Split a comma-separated tag string into unique normalized tags.
+
+    Args:
+        tags (str): Tag string as stored on Item, may be None
+
+    Returns:
+        list: Normalized tags in their original order, without duplicates
+    """
+    if not tags:
+        return []
+    result = []
+    for tag in tags.split(','):
+        tag = normalize_tag(tag)
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+def get_tag_ids(names, create=True):
+    """
+    Look up tag ids by name, creating missing tags if requested.
+
+    Args:
+        names (iterable): Normalized tag names
+        create (bool): Whether to insert tags that do not exist yet
+
+    Returns:
+        dict: Tag name -> tag id
+    """
+    names = set(names)
+    if not names:
+        return {}
+
+    tag_ids = dict(db.session.execute(
+        select(Tag.name, Tag.id).where(Tag.name.in_(names))
+    ).all())
+
+    if create:
+        for name in names - tag_ids.keys():
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(Tag).values(name=name))
+            except IntegrityError:
+                # Created concurrently by another request
+                pass
+        missing = names - tag_ids.keys()
+        if missing:
+            tag_ids.update(db.session.execute(
+                select(Tag.name, Tag.id).where(Tag.name.in_(missing))
+            ).all())
+
+    return tag_ids
+
+def set_items_tags(tags_by_item):
+    """
+    Replace the normalized tags of several items in the current transaction.
+
+    Args:
+        tags_by_item (dict): Item ID -> comma-separated tag string
+    """
+    if not tags_by_item:
+        return
+
+    parsed = {item_id: parse_tags(tags) for item_id, tags in tags_by_item.items()}
+    tag_ids = get_tag_ids(name for names in parsed.values() for name in names)
+
+    db.session.execute(delete(item_tags).where(item_tags.c.item_id.in_(list(parsed))))
+
+    rows = [
+        {'item_id': item_id, 'tag_id': tag_ids[name]}
+        for item_id, names in parsed.items()
+        for name in names
+    ]
+    if rows:
+        db.session.execute(insert(item_tags), rows)
+
+def set_item_tags(item_id, tags):
+    """
+    Replace the normalized tags of one item in the current transaction.
+
+    Args:
+        item_id (str): Item ID
+        tags (str): Comma-separated tag string
+    """
+    set_items_tags({item_id: tags})
+
+def filter_by_tags(query, tags):
+    """
+    Restrict an Item query to items carrying every given tag.
+    Uses the item_tags (tag_id, item_id) index instead of LIKE scans.
+
+    Args:
+        query: SQLAlchemy query over Item
+        tags (list): Tag names
+
+    Returns:
+        query: Filtered query
+    """
+    for tag in tags:
+        tag = normalize_tag(tag)
+        if not tag:
+            continue
+        query = query.filter(Item.id.in_(
+            select(item_tags.c.item_id)
+            .join(Tag, Tag.id == item_tags.c.tag_id)
+            .where(Tag.name == tag)
+        ))
+    return query
+
+def backfill_item_tags(batch_size=500):
+    """
+    Populate item_tags from the tags column of every item.
+    Safe to run repeatedly; each batch is committed separately.
+
+    Args:
+        batch_size (int): Items per transaction
+
+    Returns:
+        int: Number of items processed
+    """
+    processed = 0
+    last_id = ''
+
+    while True:
+        batch = db.session.execute(
+            select(Item.id, Item.tags)
+            .where(Item.id > last_id)
+            .order_by(Item.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+
+        set_items_tags({item_id: tags for item_id, tags in batch})
+        db.session.commit()
+
+        processed += len(batch)
+        last_id = batch[-1][0]
+        logger.info(f"Backfilled tags for {processed} items")
+
+    return processed
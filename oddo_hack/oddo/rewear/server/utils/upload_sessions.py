@@ -0,0 +1,221 @@
+# File: rewear/server/utils/upload_sessions.py
+
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from config.database import db
+from models.upload_session import UploadSession
+from utils.storage import store_stream, add_references, release_file, delete_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes copied from the request body per write
+COPY_BUFFER_SIZE = 64 * 1024
+
+class UploadSessionError(ValueError):
+    """Raised when a chunk or upload session cannot be accepted"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def part_path(upload_folder, upload_id):
+    """Path of the partial file of an upload session"""
+    return os.path.join(upload_folder, 'tmp', 'sessions', f"{upload_id}.part")
+
+def create_part_file(upload_folder, upload_id):
+    """Create the empty partial file of a new upload session"""
+    path = part_path(upload_folder, upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+def _check_offset(upload, offset):
+    if upload.status != 'open':
+        raise UploadSessionError('Upload is already complete', 409)
+    if offset != upload.received:
+        raise UploadSessionError(f"Expected offset {upload.received}", 409)
+
+def receive_chunk(upload_folder, upload, stream, offset):
+    """
+    Stream a chunk from the request body into a file of its own, without
+    buffering it in memory. This runs before the session row is locked,
+    so a slow client does not hold the lock for the whole transfer;
+    append_chunk() then adds the file to the upload.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        upload (UploadSession): Session, not locked
+        stream: Binary request body
+        offset (int): Byte offset of the chunk
+
+    Returns:
+        str: Path of the chunk file, to remove once it is appended
+
+    Raises:
+        UploadSessionError: If the session or offset does not accept the chunk
+    """
+    _check_offset(upload, offset)
+
+    fd, path = tempfile.mkstemp(
+        dir=os.path.dirname(part_path(upload_folder, upload.id)),
+        prefix=f"{upload.id}-", suffix='.chunk'
+    )
+    try:
+        written = 0
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if offset + written > upload.total_size:
+                    raise UploadSessionError('Chunk goes past the declared size')
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path
+
+def append_chunk(upload_folder, upload, chunk_path, offset):
+    """
+    Write a received chunk at offset into the partial file. The offset is
+    checked again, since another chunk may have been appended while this
+    one was received; data after the offset left by an interrupted
+    request is discarded.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        upload (UploadSession): Session, locked by the caller
+        chunk_path (str): File returned by receive_chunk()
+        offset (int): Byte offset of the chunk
+
+    Returns:
+        int: Number of bytes written
+
+    Raises:
+        UploadSessionError: If the session or offset does not accept the chunk
+    """
+    _check_offset(upload, offset)
+
+    with open(part_path(upload_folder, upload.id), 'r+b') as part, open(chunk_path, 'rb') as chunk:
+        part.seek(offset)
+        part.truncate()
+        shutil.copyfileobj(chunk, part, COPY_BUFFER_SIZE)
+        upload.received = part.tell()
+
+    return upload.received - offset
+
+def finalize_upload(upload_folder, upload):
+    """
+    Move a fully received upload into content-addressed storage.
+    The session holds one reference to the stored file until it is used
+    by an item or expires.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        upload (UploadSession): Session, locked by the caller
+
+    Returns:
+        StoredUpload: Stored file, to discard if the transaction rolls back,
+            or None if the upload was already finalized
+
+    Raises:
+        UploadSessionError: If bytes are missing
+    """
+    if upload.status != 'open':
+        return None
+    if upload.received != upload.total_size:
+        raise UploadSessionError(
+            f"Received {upload.received} of {upload.total_size} bytes", 409
+        )
+
+    path = part_path(upload_folder, upload.id)
+    with open(path, 'rb') as part:
+        stored = store_stream(part, upload_folder, 'items', upload.filename.rsplit('.', 1)[1])
+    add_references([stored])
+
+    upload.file_path = stored.path
+    upload.status = 'complete'
+    os.remove(path)
+    return stored
+
+def claim_uploads(user_id, upload_ids):
+    """
+    Take completed uploads of a user for use as item images, in the
+    current transaction. The session's reference to each stored file
+    passes to the item image.
+
+    Args:
+        user_id (str): User creating the item
+        upload_ids (list): Upload session IDs
+
+    Returns:
+        list: File paths in the order of upload_ids
+
+    Raises:
+        UploadSessionError: If an upload is unknown, not complete or already used
+    """
+    if not upload_ids:
+        return []
+
+    uploads = {
+        upload.id: upload for upload in UploadSession.query.filter(
+            UploadSession.id.in_(upload_ids),
+            UploadSession.user_id == user_id
+        ).with_for_update().all()
+    }
+
+    paths = []
+    for upload_id in upload_ids:
+        upload = uploads.get(upload_id)
+        if upload is None:
+            raise UploadSessionError(f"Upload not found: {upload_id}", 404)
+        if upload.status == 'used':
+            raise UploadSessionError(f"Upload is already used: {upload_id}", 409)
+        if upload.status != 'complete':
+            raise UploadSessionError(f"Upload is not complete: {upload_id}")
+        upload.status = 'used'
+        paths.append(upload.file_path)
+
+    return paths
+
+def cleanup_upload_sessions(upload_folder, max_age_hours=24):
+    """
+    Delete upload sessions that were not used in time, with their
+    partial files and stored-file references.
+    Must be called inside an application context.
+
+    Args:
+        upload_folder (str): UPLOAD_FOLDER of the app
+        max_age_hours (int): Age after which unused sessions expire
+
+    Returns:
+        int: Number of sessions removed
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    removed = 0
+    unreferenced = []
+
+    expired = UploadSession.query.filter(
+        UploadSession.updated_at < cutoff
+    ).with_for_update().all()
+    for upload in expired:
+        if upload.status == 'open':
+            try:
+                os.remove(part_path(upload_folder, upload.id))
+            except OSError:
+                pass
+        elif upload.status == 'complete' and release_file(upload.file_path):
+            unreferenced.append(upload.file_path)
+        db.session.delete(upload)
+        removed += 1
+
+    db.session.commit()
+    for path in unreferenced:
+        delete_file(upload_folder, path)
+
+    logger.info(f"Removed {removed} expired upload sessions")
+    return removed
@@ -37,6 +37,8 @@ Write-Host "Setting up database..." -ForegroundColor Yellow
 # This assumes MySQL is installed and configured
 # You may need to modify these commands based on your MySQL setup
 # mysql -u root -p < ..\database\schema.sql
+# Existing databases also need the scripts in ..\database\migrations, which
+# init_db.py applies on start
 
 # Return to root directory
 Set-Location -Path ..\..\